@@ -0,0 +1,298 @@
+# benchmarks.py - Seeded Benchmark Suite for Each Generation Stage
+
+import os
+import sys
+import copy
+import json
+import time
+import random
+import platform
+import datetime
+import logging
+import argparse
+import statistics
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import utils
+    import event_store
+    import personas
+    import population
+    import simulation
+    import event_generator
+except ImportError as e:
+    logging.error("Error importing modules in benchmarks.py: %s. Ensure config.py, utils.py, event_store.py, personas.py, population.py, simulation.py, and event_generator.py exist.", e)
+    raise
+
+# Fixed window, so inputs do not drift with the wall clock
+BENCHMARK_START_DATE = datetime.datetime(2020, 1, 1)
+_SAMPLE_CATEGORY = "Electronics"
+
+
+class Benchmark:
+    """
+    One timed stage.
+
+    `prepare(number)` builds the argument tuples for `number` calls outside the
+    timed region (e.g. fresh copies of a profile for calls that mutate it);
+    `func(*args)` is timed over all of them.
+    """
+
+    __slots__ = ("name", "func", "prepare", "number")
+
+    def __init__(self, name, func, prepare=None, number=1000):
+        self.name = name
+        self.func = func
+        self.prepare = prepare or (lambda number: [()] * number)
+        self.number = number
+
+
+def _reseed(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def run_benchmark(benchmark, repeat=None, seed=None, scale=1.0):
+    """
+    Times one benchmark: `repeat` rounds of `number` calls, generators reseeded
+    before each round so every round sees the same draws.
+
+    Returns:
+        dict: Per-call seconds (min/median/mean over rounds), calls per round and ops/s.
+    """
+    repeat = repeat or config.BENCHMARK_REPEAT
+    seed = config.BENCHMARK_SEED if seed is None else seed
+    number = max(1, int(benchmark.number * scale))
+    per_call = []
+    for _ in range(repeat):
+        _reseed(seed)
+        calls = benchmark.prepare(number)
+        func = benchmark.func
+        start = time.perf_counter()
+        for args in calls:
+            func(*args)
+        per_call.append((time.perf_counter() - start) / len(calls))
+    best = min(per_call)
+    return {
+        "per_call_seconds_min": best,
+        "per_call_seconds_median": statistics.median(per_call),
+        "per_call_seconds_mean": statistics.fmean(per_call),
+        "number": number,
+        "repeat": repeat,
+        "ops_per_second": 1.0 / best if best > 0 else None,
+    }
+
+
+# --- Fixtures ---
+
+def _warm_profile(days=90):
+    """A profile simulated for `days` (state kept) with items in the cart, so every event type has something to act on."""
+    _reseed(config.BENCHMARK_SEED)
+    profile = personas.create_base_profile(1, BENCHMARK_START_DATE)
+    profile = simulation.simulate_activity(profile, end_date=BENCHMARK_START_DATE + datetime.timedelta(days=days), finalize=False)
+    state = profile["_internal_state"]
+    timestamp = state.current_timestamp
+    for _ in range(3):
+        event_generator.generate_event_details("add_to_cart", profile, timestamp)
+    return profile
+
+
+def _profile_copies(profile, number):
+    """Independent copies of a warm profile (without its activity log) for calls that mutate state."""
+    skeleton = {k: v for k, v in profile.items() if k != "activity_log"}
+    copies = []
+    for _ in range(number):
+        clone = copy.deepcopy(skeleton)
+        clone["activity_log"] = event_store.EventStore()
+        copies.append(clone)
+    return copies
+
+
+def _simulated_profile(activity_level, days):
+    profile = personas.create_base_profile(1, BENCHMARK_START_DATE)
+    profile["_internal_state"].behavioral_params["activity_level"] = activity_level
+    return profile, BENCHMARK_START_DATE + datetime.timedelta(days=days)
+
+
+def build_suite():
+    """Returns the list of benchmarks, one or more per generation stage."""
+    logging_level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING) # Simulation logs per profile at INFO
+    warm = _warm_profile()
+    logging.getLogger().setLevel(logging_level)
+    state = warm["_internal_state"]
+    timestamp = state.current_timestamp
+
+    suite = [
+        # Base profiles
+        Benchmark("personas.create_base_profile", personas.create_base_profile,
+                  lambda n: [(i, BENCHMARK_START_DATE) for i in range(n)], number=200),
+        Benchmark("population.sample_population[1000]", population.sample_population,
+                  lambda n: [(1, 1000, BENCHMARK_START_DATE)] * n, number=5),
+        # Event selection
+        Benchmark("simulation.determine_next_event_type", simulation.determine_next_event_type,
+                  lambda n: [(state,)] * n, number=5000),
+    ]
+
+    # Event details, per event type (each call gets its own copy of the warm profile)
+    event_types = list(config.BASE_EVENT_WEIGHTS) + ["reorder_item"]
+    for event_type in event_types:
+        suite.append(Benchmark(
+            f"event_generator.generate_event_details[{event_type}]", event_generator.generate_event_details,
+            lambda n, event_type=event_type: [(event_type, p, timestamp) for p in _profile_copies(warm, n)], number=100))
+
+    # Samplers, prices and names
+    sampler = utils.WeightedSampler.from_dict({ls["name"]: ls.get("weight", 1) for ls in config.LIFE_STAGES})
+    suite += [
+        Benchmark("utils.WeightedSampler.draw", sampler.draw, number=20000),
+        Benchmark("utils.WeightedSampler.draw_indices[10000]", sampler.draw_indices, lambda n: [(10000,)] * n, number=50),
+        Benchmark("utils.WeightedSampler.sample[3]", sampler.sample, lambda n: [(3,)] * n, number=5000),
+        Benchmark("utils.sample_from_distribution", utils.sample_from_distribution,
+                  lambda n: [(config.INCOME_DISTRIBUTION,)] * n, number=5000),
+        Benchmark("utils.calculate_event_time_delta", utils.calculate_event_time_delta, lambda n: [(0.5, 1.2)] * n, number=20000),
+        Benchmark("utils.get_seasonal_boost_from_config", utils.get_seasonal_boost_from_config,
+                  lambda n: [(BENCHMARK_START_DATE + datetime.timedelta(days=i % 365),) for i in range(n)], number=20000),
+        Benchmark("utils.get_plausible_price", utils.get_plausible_price, lambda n: [(_SAMPLE_CATEGORY,)] * n, number=20000),
+        Benchmark("utils.get_plausible_prices[10000]", utils.get_plausible_prices, lambda n: [(_SAMPLE_CATEGORY, 10000)] * n, number=50),
+        Benchmark("utils.generate_product_name", utils.generate_product_name, lambda n: [(_SAMPLE_CATEGORY,)] * n, number=20000),
+    ]
+
+    # End to end, at several activity levels and durations
+    for activity_level in config.BENCHMARK_ACTIVITY_LEVELS:
+        for days in config.BENCHMARK_DURATIONS_DAYS:
+            suite.append(Benchmark(
+                f"simulation.simulate_activity[activity={activity_level},days={days}]",
+                lambda profile, end_date: simulation.simulate_activity(profile, end_date=end_date),
+                lambda n, a=activity_level, d=days: [_simulated_profile(a, d) for _ in range(n)], number=1))
+
+    # Serialization of one simulated year
+    _reseed(config.BENCHMARK_SEED)
+    logging.getLogger().setLevel(logging.WARNING)
+    profile, end_date = _simulated_profile(0.5, 365)
+    year = simulation.simulate_activity(profile, end_date=end_date)
+    logging.getLogger().setLevel(logging_level)
+    suite += [
+        Benchmark("serialization.json_dump[1 year profile]",
+                  lambda p: json.dumps(p, indent=2, ensure_ascii=False, default=event_store.json_default),
+                  lambda n: [(year,)] * n, number=10),
+        Benchmark("serialization.materialize_events[1 year profile]", year["activity_log"].to_list, number=10),
+    ]
+    return suite
+
+
+# --- Results and Baselines ---
+
+def run_suite(name_filter=None, repeat=None, scale=1.0):
+    """
+    Runs every benchmark whose name contains `name_filter`.
+
+    Returns:
+        dict: {"meta": {...}, "results": {name: stats}}.
+    """
+    logging_level = logging.getLogger().level
+    results = {}
+    for benchmark in build_suite():
+        if name_filter and name_filter not in benchmark.name:
+            continue
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            stats = run_benchmark(benchmark, repeat=repeat, scale=scale)
+        finally:
+            logging.getLogger().setLevel(logging_level)
+        results[benchmark.name] = stats
+        logging.info("%s: %.1f us/call (min %.1f)", benchmark.name, stats['per_call_seconds_median'] * 1e6, stats['per_call_seconds_min'] * 1e6)
+    return {
+        "meta": {
+            "timestamp": utils.format_iso_timestamp(datetime.datetime.now()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": config.BENCHMARK_SEED,
+            "repeat": repeat or config.BENCHMARK_REPEAT,
+            "scale": scale,
+        },
+        "results": results,
+    }
+
+
+def _threshold_for(name, thresholds):
+    """Longest matching name prefix in `thresholds`, else the default threshold."""
+    matches = [prefix for prefix in thresholds if name.startswith(prefix)]
+    return thresholds[max(matches, key=len)] if matches else config.BENCHMARK_REGRESSION_THRESHOLD
+
+
+def compare_to_baseline(current, baseline, thresholds=None):
+    """
+    Compares median per-call times against a baseline run.
+
+    A benchmark regresses when its median exceeds the baseline median by more
+    than its threshold (a fraction; per-name-prefix overrides in
+    config.BENCHMARK_THRESHOLDS).
+
+    Returns:
+        list: One dict per benchmark present in both runs ({"name", "baseline", "current", "ratio", "threshold", "regressed"}).
+    """
+    thresholds = config.BENCHMARK_THRESHOLDS if thresholds is None else thresholds
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = stats["per_call_seconds_median"] / base["per_call_seconds_median"] if base["per_call_seconds_median"] else float("inf")
+        threshold = _threshold_for(name, thresholds)
+        rows.append({"name": name, "baseline": base["per_call_seconds_median"], "current": stats["per_call_seconds_median"],
+                     "ratio": ratio, "threshold": threshold, "regressed": ratio > 1.0 + threshold})
+    return rows
+
+
+def print_comparison(rows, stream=None):
+    stream = stream or sys.stdout
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else ("faster" if row["ratio"] < 1.0 - row["threshold"] else "ok")
+        stream.write(f"{row['name']:<70} {row['baseline'] * 1e6:>12.1f} us -> {row['current'] * 1e6:>12.1f} us  x{row['ratio']:.2f}  {flag}\n")
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    # Example usage/test: run the suite, write results, compare against the stored baseline
+    #   python benchmarks.py [--filter NAME] [--repeat N] [--scale F] [--output PATH] [--baseline PATH] [--save-baseline]
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Seeded benchmarks for each generation stage.")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, help=f"Rounds per benchmark (default {config.BENCHMARK_REPEAT})")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply calls per round (e.g. 0.1 for a quick run)")
+    parser.add_argument("--output", default=config.BENCHMARK_OUTPUT, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=config.BENCHMARK_BASELINE, help="Baseline results JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    results = run_suite(args.filter, args.repeat, args.scale)
+    for name, stats in results["results"].items():
+        print(f"{name:<70} {stats['per_call_seconds_median'] * 1e6:>12.1f} us/call  ({stats['number']} calls x {stats['repeat']})")
+    save_results(results, args.output)
+    print(f"Wrote {len(results['results'])} benchmark results to {args.output}")
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        rows = compare_to_baseline(results, load_results(args.baseline))
+        print_comparison(rows)
+        regressions = [row["name"] for row in rows if row["regressed"]]
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond threshold: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions beyond threshold.")
+    else:
+        print(f"No baseline at {args.baseline} (create one with --save-baseline).")
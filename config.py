@@ -1,19 +1,107 @@
 # config.py - Enhanced for Realistic Customer Diversity
 import random
-import numpy as np
 from collections import defaultdict
 
 # --- Core Simulation Settings ---
 NUM_PROFILES_TO_GENERATE = 20000 # Generate 30,000 profiles
 SIMULATION_DURATION_YEARS = 5
 SIMULATION_DURATION_DAYS = SIMULATION_DURATION_YEARS * 365
+SIMULATION_START_DATE = None # "YYYY-MM-DD" fixes the simulated window (needed to rebuild a seeded run's profiles one at a time); None = the window ends now
 OUTPUT_DIR = "."
 FILENAME_PREFIX = "amazon_customer_profile_"
 FILENAME_DIGITS = 5
 START_PROFILE_INDEX = 1
+POPULATION_BATCH_SIZE = 10000 # Base profiles sampled per vectorized batch (see population.py)
+POPULATION_SEED_BLOCK = 1000 # With a seed, profile i is drawn from the aligned block of this many indices holding i, so it never depends on batch boundaries
+# Global event stream (event_stream.py): time-sorted JSON Lines shards, k-way merged with bounded memory
+EVENT_STREAM_SHARD_DIR = None # If set, generate_profiles also writes sorted event shards here
+EVENT_STREAM_PROFILES_PER_SHARD = 1000 # Profiles whose events are sorted together in memory per shard
+EVENT_STREAM_MAX_FAN_IN = 256 # Max shard files open in one merge pass (more shards -> multi-pass merge)
+# Real-time replay (replay.py): events paced by simulated timestamps / speedup
+REPLAY_SINK = "stdout" # "stdout", "pipe:PATH", "tcp:HOST:PORT", "http://HOST:PORT/PATH" or "broker"
+REPLAY_SPEEDUP = 86400.0 # Simulated seconds per wall-clock second (86400 = one simulated day per second; 0 = unpaced)
+REPLAY_BATCH_SIZE = 100 # Events per TCP write / HTTP POST (partial batches are flushed whenever the pacer idles)
+REPLAY_BROKER_PARTITIONS = 8 # Partitions of the in-process stand-in broker (keyed by session_id)
+REPLAY_BROKER_CAPACITY = 10000 # Messages per broker partition before publishing blocks
+REPLAY_REPORT_INTERVAL_SECONDS = 5.0
+# Saved end-of-run state (snapshots.py) for extending a dataset without re-simulating it
+SNAPSHOT_DIR = None # If set, generate_profiles also saves each profile's end state (with its RNG position) here
+SNAPSHOT_EXTEND_DAYS = 30 # Default days added by snapshots.extend_dataset (only the new events are written)
+# Single-profile regeneration (profile_service.py): get_profile(index, seed) and a local HTTP service
+PROFILE_CACHE_SIZE = 256 # Most recently requested profiles kept in memory
+PROFILE_SERVICE_SIMULATION_START = "2020-01-01" # Window start when SIMULATION_START_DATE is not set, so a profile is the same on every request
+PROFILE_SERVICE_HOST = "127.0.0.1"
+PROFILE_SERVICE_PORT = 8765
+PROFILE_SERVICE_PAGE_SIZE = 100 # Default events per /profiles/<index>/events page
+PROFILE_SERVICE_MAX_PAGE_SIZE = 5000
+# Benchmark suite (benchmarks.py): seeded per-stage timings, compared against a stored baseline
+BENCHMARK_SEED = 12345
+BENCHMARK_REPEAT = 5 # Timed rounds per benchmark (median is compared)
+BENCHMARK_ACTIVITY_LEVELS = (0.1, 0.5, 0.9) # End-to-end simulate_activity runs ...
+BENCHMARK_DURATIONS_DAYS = (30, 365) # ... at each of these durations
+BENCHMARK_OUTPUT = "benchmark_results.json"
+BENCHMARK_BASELINE = "benchmark_baseline.json"
+BENCHMARK_REGRESSION_THRESHOLD = 0.25 # Median may be up to 25% slower than the baseline
+BENCHMARK_THRESHOLDS = {"simulation.simulate_activity": 0.4, "event_generator.": 0.4} # Looser limits for noisier stages (by name prefix)
+# Statistical equivalence harness (equivalence.py): seeded population compared to a stored reference
+EQUIVALENCE_NUM_PROFILES = 1000 # Enough to flag a ~15% shift in event rate at the default alpha
+EQUIVALENCE_DURATION_DAYS = 365
+EQUIVALENCE_SEED = 2024
+EQUIVALENCE_ALPHA = 0.01 # Family-wise false-alarm rate across all tests (Bonferroni)
+EQUIVALENCE_MAX_SAMPLES = 20000 # Values kept per distribution in the reference file
+EQUIVALENCE_REFERENCE = "equivalence_reference.json"
+# Instrumentation (instrumentation.py): per-stage / per-event-type timers and counts, zero cost when off
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_REPORT_PATH = None # If set, the run's instrumentation report is also written here as JSON
+# Sampled profiling (profiling.py): cProfile (and optionally tracemalloc) on every Nth profile, merged
+PROFILING_EVERY_N = 0 # 0 = off; N = profile every Nth profile
+PROFILING_TRACE_MEMORY = False # Also record allocation sites with tracemalloc (slower sampled profiles)
+PROFILING_TOP_N = 30 # Functions / allocation sites listed in the summaries
+PROFILING_OUTPUT_DIR = "profiling" # combined.prof (pstats), combined_top.txt, allocations_top.json
+# Logging (logging_setup.py): records are queued and written by a background listener thread
+LOG_LEVEL = "INFO" # Root level for generate_profiles.py runs ("DEBUG" for per-event detail)
+LOG_FILE = None # If set, log records are also appended to this file
+LOG_DUPLICATE_WARNING_LIMIT = 5 # Warnings passed per call site per window (0 = no rate limit)
+LOG_DUPLICATE_WINDOW_SECONDS = 60.0
+# Startup (startup.py): cold import cost per entry module, measured in a fresh interpreter
+IMPORT_TIME_RUNS = 7 # Interpreter starts per module (the fastest is compared)
+IMPORT_TIME_BUDGETS_MS = {"config": 25, "event_stream": 80, "replay": 120, "generate_profiles": 300, "profile_service": 400} # event_stream / replay must not load numpy
+# Worker processes (worker_pool.py): tables are preloaded once and shared with forked workers
+WORKER_COUNT = None # None = one worker per CPU
+WORKER_START_METHOD = "fork" # "fork" shares the preloaded tables copy-on-write; falls back to "spawn" where unavailable
+# Parallel generation (scheduler.py): profiles dispatched largest-first by expected event count
+PARALLEL_GENERATION = False # True = generate_profiles.py simulates across WORKER_COUNT worker processes
+SCHEDULER_CHUNKS_PER_WORKER = 4 # Chunk cost target = remaining expected events / (workers * this)
+SCHEDULER_MIN_CHUNK = 1 # Profiles per chunk (largest profiles are dispatched alone)
+SCHEDULER_MAX_CHUNK = 100 # Caps the small-profile chunks at the tail
+# Capacity planner (planner.py): analytic event counts, cost per event from a short micro-sample
+PLANNER_SAMPLE_PROFILES = 40 # Profiles simulated for calibration
+PLANNER_SAMPLE_DAYS = 180 # ... over this many days each
+PLANNER_SEED = 11
+PLANNER_PARALLEL_EFFICIENCY = 0.9 # Fraction of ideal speedup assumed with several workers
+# Scenario sweeps (scenarios.py): config variants over one cached base population, common random numbers
+SWEEP_NUM_PROFILES = 1000
+SWEEP_SEED = 99
+SWEEP_SIMULATION_START = "2020-01-01" # Shared window start; each scenario's SIMULATION_DURATION_* sets its end
+SWEEP_CACHE_DIR = "sweep_cache" # Pickled base populations, keyed by config, size and seed
+SWEEP_OUTPUT_DIR = "sweep_output" # One sub-directory of profile JSON files per scenario
+SWEEP_SCENARIOS = [ # First entry is the reference for paired comparisons
+    {"name": "baseline", "overrides": {}},
+    {"name": "double_purchase_weight", "overrides": {"BASE_EVENT_WEIGHTS": {"purchase": 10.0}}},
+    {"name": "three_years", "overrides": {"SIMULATION_DURATION_YEARS": 3}},
+]
 # Probability of a minor life event occurring per year (approx)
 MINOR_EVENT_YEARLY_PROB = 0.6
 
+# --- Order Eligibility Windows ---
+RETURN_WINDOW_DAYS = 30 # Orders younger than this can be returned
+REVIEW_WINDOW_DAYS = 90 # Orders younger than this can be reviewed
+ORDER_WINDOW_HORIZON_DAYS = max(RETURN_WINDOW_DAYS, REVIEW_WINDOW_DAYS) # Orders older than this leave the recent-orders window
+
+# --- Reproducibility & ID Generation ---
+RANDOM_SEED = None # Seeds base profiles and each profile's simulation by index (with SIMULATION_START_DATE, a run can be rebuilt one profile at a time) and the ID scrambler; None = fresh entropy and a fixed default ID key
+ID_MAX_PROFILES = 1000000 # Profile indices must stay below this; each profile gets ID_SPACE // ID_MAX_PROFILES IDs per format
+
 # --- Behavioral Parameter Ranges/Defaults with Distribution Types ---
 BEHAVIORAL_PARAMS_CONFIG = {
     # Core Shopping Behaviors
@@ -194,6 +282,26 @@ PAYMENT_METHODS = [
     {"type": "Amazon Pay", "credit_required": False, "rewards": False, "frequency": 0.05},
     {"type": "PayPal", "credit_required": False, "rewards": False, "frequency": 0.07}
 ]
+# --- Price Model ---
+# Category keyword -> (min, max) price. A category uses the first keyword found in its lowercased name.
+PRICE_RANGES = {
+    "luxury": (200, 5000), "high-end": (200, 5000),
+    "electronics": (30, 3000), "computers": (100, 4000), "appliances": (50, 2500), "furniture": (100, 3000), "smart home": (20, 500),
+    "clothing": (15, 500), "shoes": (20, 600), "jewelry": (25, 5000), "watches": (50, 10000),
+    "tools": (10, 800), "automotive": (5, 1000), "sports": (10, 1500), "outdoors": (15, 2000),
+    "toys": (5, 300), "baby": (5, 400), "pet supplies": (3, 200),
+    "books": (5, 150), "kindle": (1, 30), "audible": (5, 50), "music": (1, 50), "movies": (3, 60), "software": (10, 1000), "video games": (10, 100),
+    "grocery": (0.5, 100), "health": (2, 200), "beauty": (3, 300), "pharmacy": (5, 500),
+    "office": (1, 300), "crafts": (2, 150), "hobbies": (5, 500),
+    "default": (5, 500)
+}
+PRICE_DISTRIBUTION = "uniform" # "uniform" or "lognormal" (skewed toward the low end of each range)
+PRICE_LOGNORMAL_SIGMA_FRACTION = 0.25 # Log-normal sigma as a fraction of the range's log-width (centered on its geometric mean)
+PRICE_ENDINGS = [0.99, 0.95, 0.49, 0.79, 0.00]
+PRICE_ENDING_PROB = 0.75 # Chance a price gets one of PRICE_ENDINGS
+PRICE_WHOLE_NUMBER_PROB = 0.1 # Chance a price without an ending is rounded to a whole number
+MIN_PRICE = 0.50
+
 # --- Brands --- 
 # (Add more realistic brands as needed)
 BRANDS = [
@@ -211,6 +319,38 @@ ADJECTIVES1 = ['Premium', 'Basic', 'Advanced', 'Deluxe', 'Standard', 'Pro', 'Lit
 ADJECTIVES2 = ['Series', 'Model', 'Edition', 'Version', 'Generation', 'Plus', 'Max', 'Mini']
 NOUNS = ['Device', 'Item', 'Accessory', 'Gadget', 'Tool', 'Appliance', 'Kit', 'System', 'Unit']
 PRODUCT_MODIFIERS = ['for Home', 'for Office', 'Portable', 'Wireless', 'Heavy Duty', 'Compact', 'Smart', '']
+# Category-specific naming rules; the first rule with a keyword in the lowercased category applies.
+# "brands" compete with one general pick from BRANDS (which gets a single share of the weight).
+# Rules with a "title" template name books/media ('The Lost City' by Jane Doe) instead of goods.
+PRODUCT_NAMING_RULES = [
+    {"keywords": ["clothing", "shoes", "apparel"],
+     "nouns": ['Shirt', 'T-Shirt', 'Sweater', 'Hoodie', 'Jacket', 'Coat', 'Pants', 'Jeans', 'Shorts', 'Dress', 'Skirt', 'Sneakers', 'Boots', 'Sandals', 'Hat', 'Scarf', 'Gloves', 'Socks'],
+     "adjectives": ['Cotton', 'Wool', 'Silk', 'Leather', 'Denim', 'Casual', 'Formal', 'Vintage', 'Modern', 'Slim Fit', 'Relaxed Fit', 'Performance'],
+     "brands": ['Urban Threads', 'Summit Gear', 'Coastal Co.', 'Heritage Brand', 'Nova Fashion']},
+    {"keywords": ["book", "kindle", "audible"],
+     "title": {"articles": ['The', 'A', 'An'],
+               "adjectives": ['Lost', 'Secret', 'Forgotten', 'Hidden', 'Last', 'Eternal', 'Silent', 'Burning', 'Crystal', 'Shadow', 'Gilded', 'Crimson'],
+               "nouns": ['City', 'Garden', 'Key', 'Chronicle', 'Journey', 'Legacy', 'Witness', 'Page', 'Throne', 'River', 'Truth', 'Empire', 'Code', 'Cipher'],
+               "first_names": ['Jane', 'John', 'Alex', 'Sam', 'Jordan', 'Casey', 'Morgan', 'Taylor', 'Jamie', 'Riley', 'Chris', 'Pat'],
+               "last_names": ['Doe', 'Smith', 'Reed', 'Morgan', 'Bell', 'Hayes', 'Black', 'White', 'Green', 'Gray', 'Miller', 'Davis']}},
+    {"keywords": ["electronics", "computer", "smart home"],
+     "nouns": ['Laptop', 'Smartphone', 'Tablet', 'Monitor', 'Keyboard', 'Mouse', 'Headphones', 'Speaker', 'Router', 'Camera', 'Webcam', 'Printer', 'Scanner', 'Projector', 'Smart Plug', 'Smart Bulb', 'Security Camera', 'Thermostat'],
+     "adjectives": ['Wireless', 'Bluetooth', 'Gaming', '4K', 'HD', 'Curved', 'Mechanical', 'Noise-Cancelling', 'Portable', 'High-Performance', 'NextGen'],
+     "brands": ['TechCore', 'Innovate Inc.', 'Apex Devices', 'Quantum Systems', 'ElectroGadget']},
+    {"keywords": ["home", "kitchen", "furniture"],
+     "nouns": ['Blender', 'Mixer', 'Toaster', 'Kettle', 'Coffee Maker', 'Microwave', 'Air Fryer', 'Lamp', 'Chair', 'Table', 'Sofa', 'Bookshelf', 'Desk', 'Bed Frame', 'Mattress', 'Nightstand', 'Dresser', 'Shelf', 'Organizer', 'Cookware Set', 'Bakeware Set', 'Cutlery Set', 'Dinnerware Set', 'Vacuum Cleaner', 'Air Purifier'],
+     "adjectives": ['Stainless Steel', 'Non-stick', 'Cast Iron', 'Wooden', 'Modern', 'Minimalist', 'Industrial', 'Farmhouse', 'Mid-Century', 'Adjustable', 'Ergonomic'],
+     "brands": ['HomeSphere', 'KitchenWiz', 'ComfortLiving', 'DesignHaus', 'UrbanFurnish']},
+    {"keywords": ["grocery"],
+     "nouns": ['Coffee Beans', 'Tea Bags', 'Pasta', 'Rice', 'Cereal', 'Granola Bar', 'Snack Mix', 'Chocolate Bar', 'Olive Oil', 'Vinegar', 'Spice Blend', 'Canned Soup', 'Frozen Vegetables', 'Yogurt', 'Milk', 'Cheese', 'Bread'],
+     "adjectives": ['Organic', 'Gluten-Free', 'Non-GMO', 'Fair Trade', 'Artisanal', 'Gourmet', 'Family Size', 'Single Origin'],
+     "brands": ["Nature's Best", 'FarmFresh', 'Pantry Staples', 'Gourmet Select', 'Healthy Harvest']},
+    {"keywords": ["toys", "games"],
+     "nouns": ['Action Figure', 'Doll', 'Building Blocks', 'Board Game', 'Card Game', 'Puzzle', 'Plush Toy', 'RC Car', 'Drone', 'Video Game', 'Educational Toy'],
+     "adjectives": ['Interactive', 'Collectible', 'Remote Control', 'STEM', 'Creative', 'Strategy', 'Cooperative', 'Award-Winning'],
+     "brands": ['ToyWorld', 'PlayFun', 'KidzKraft', 'GameMasters', 'BrainyBuilders']},
+]
+PRODUCT_NAME_MAX_LENGTH = 150
 # --- Geography & Demographic Distribution ---
 # Population distribution based on US Census
 US_REGION_DISTRIBUTION = {
@@ -0,0 +1,280 @@
+# equivalence.py - Statistical Equivalence Harness for Engine Changes
+
+import os
+import sys
+import json
+import math
+import random
+import datetime
+import logging
+import argparse
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import population
+    import simulation
+except ImportError as e:
+    logging.error(f"Error importing modules in equivalence.py: {e}. Ensure config.py, population.py, and simulation.py exist.")
+    raise
+
+# A refactor that changes the order of random draws produces a different sample
+# from the same distributions, so runs are compared with two-sample tests rather
+# than byte for byte. SciPy is not a dependency; the tests below use the usual
+# asymptotic approximations.
+
+EQUIVALENCE_START_DATE = datetime.datetime(2020, 1, 1)
+
+
+# --- Two-Sample Tests ---
+
+def ks_2samp(a, b):
+    """
+    Two-sample Kolmogorov-Smirnov test.
+
+    Returns:
+        tuple: (D statistic, p-value from the asymptotic Kolmogorov distribution).
+    """
+    a = np.sort(np.asarray(a, dtype=float))
+    b = np.sort(np.asarray(b, dtype=float))
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return 0.0, 1.0
+    values = np.concatenate([a, b])
+    d = float(np.max(np.abs(np.searchsorted(a, values, side='right') / n - np.searchsorted(b, values, side='right') / m)))
+    en = math.sqrt(n * m / (n + m))
+    lam = (en + 0.12 + 0.11 / en) * d
+    if lam < 1e-3:
+        return d, 1.0
+    p = 2.0 * sum((-1) ** (j - 1) * math.exp(-2.0 * j * j * lam * lam) for j in range(1, 101))
+    return d, min(1.0, max(0.0, p))
+
+
+def chi_square_homogeneity(counts_a, counts_b):
+    """
+    Chi-square test that two count vectors over the same categories share one distribution.
+
+    Returns:
+        tuple: (statistic, p-value via the Wilson-Hilferty normal approximation).
+    """
+    table = np.array([counts_a, counts_b], dtype=float)
+    table = table[:, table.sum(axis=0) > 0]
+    dof = table.shape[1] - 1
+    if dof < 1 or table.sum() == 0:
+        return 0.0, 1.0
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+    stat = float(((table - expected) ** 2 / expected).sum())
+    z = ((stat / dof) ** (1.0 / 3.0) - (1.0 - 2.0 / (9.0 * dof))) / math.sqrt(2.0 / (9.0 * dof))
+    return stat, 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+def welch_z(a, b):
+    """
+    Large-sample test for equal means (Welch statistic against the normal distribution).
+
+    Returns:
+        tuple: (z statistic, two-sided p-value).
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    if len(a) < 2 or len(b) < 2:
+        return 0.0, 1.0
+    se = math.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    if se == 0:
+        return 0.0, 1.0 if a.mean() == b.mean() else 0.0
+    z = (a.mean() - b.mean()) / se
+    return z, math.erfc(abs(z) / math.sqrt(2.0))
+
+
+# --- Population Run and Fingerprints ---
+
+def generate_population(num_profiles=None, seed=None, days=None, start_index=1):
+    """
+    Simulates a seeded population in memory and keeps each
+    profile's behavioral parameters before and after simulation.
+
+    Returns:
+        list: (finalized profile, initial params array, final params array) per simulated profile.
+    """
+    num_profiles = num_profiles or config.EQUIVALENCE_NUM_PROFILES
+    seed = config.EQUIVALENCE_SEED if seed is None else seed
+    days = days or config.EQUIVALENCE_DURATION_DAYS
+    end_date = EQUIVALENCE_START_DATE + datetime.timedelta(days=days)
+    random.seed(seed)
+    np.random.seed(seed)
+    batch = population.sample_population(start_index, num_profiles, EQUIVALENCE_START_DATE, rng=np.random.default_rng([seed, start_index]))
+    profiles = [batch.profile(i) for i in range(len(batch))]
+    initial = [np.frombuffer(p["_internal_state"].behavioral_params.values, dtype=float).copy() for p in profiles]
+
+    simulated = [simulation.simulate_activity(p, end_date=end_date, finalize=False) for p in profiles]
+
+    results = []
+    for profile, params_before in zip(simulated, initial):
+        if not profile:
+            continue
+        params_after = np.frombuffer(profile["_internal_state"].behavioral_params.values, dtype=float).copy()
+        results.append((simulation.finalize_profile(profile), params_before, params_after))
+    return results
+
+
+def _event_type_dispersion(per_profile_counts, event_types):
+    """
+    Overdispersion of event-type counts across profiles (Pearson chi-square per degree of
+    freedom around the pooled mix). Events of one profile are not independent draws,
+    so the pooled chi-square statistic is divided by this factor before testing.
+    """
+    matrix = np.array([[counts.get(t, 0) for t in event_types] for counts in per_profile_counts if counts], dtype=float)
+    if matrix.shape[0] < 2 or matrix.shape[1] < 2:
+        return 1.0
+    pooled = matrix.sum(axis=0) / matrix.sum()
+    matrix, pooled = matrix[:, pooled > 0], pooled[pooled > 0]
+    expected = matrix.sum(axis=1, keepdims=True) * pooled
+    dof = (matrix.shape[0] - 1) * (matrix.shape[1] - 1)
+    return float(((matrix - expected) ** 2 / expected).sum() / dof) if dof > 0 else 1.0
+
+
+def fingerprint(runs, days, max_samples=None, seed=0):
+    """
+    Reduces a population run to the distributions that are compared.
+
+    Every sample is one value per profile (profiles are the independent units;
+    gaps and order totals are summarized within each profile first).
+
+    Returns:
+        dict: Samples per metric ("events_per_profile", "median_gap_hours", "mean_order_total",
+              "life_events_per_year", "param_drift"), pooled "event_type_counts" and their
+              "event_type_dispersion".
+    """
+    max_samples = max_samples or config.EQUIVALENCE_MAX_SAMPLES
+    rng = np.random.default_rng(seed)
+    def capped(values):
+        values = np.asarray(values, dtype=float)
+        if len(values) > max_samples:
+            values = rng.choice(values, max_samples, replace=False)
+        return [round(float(v), 6) for v in values]
+
+    events_per_profile, median_gaps, mean_totals, life_rates, drift = [], [], [], [], []
+    type_counts = {}
+    per_profile_counts = []
+    years = days / 365.0
+    for profile, params_before, params_after in runs:
+        activity_log = profile["activity_log"]
+        count = len(activity_log)
+        events_per_profile.append(count)
+        counts = {}
+        totals = []
+        for i in range(count):
+            event_type = activity_log.event_type_at(i)
+            counts[event_type] = counts.get(event_type, 0) + 1
+            if event_type == "purchase":
+                totals.append(activity_log[i]["details"].get("total_amount", 0.0))
+        if count > 1:
+            seconds = np.diff([activity_log.timestamp_at(i).timestamp() for i in range(count)])
+            median_gaps.append(float(np.median(seconds)) / 3600.0)
+        if totals:
+            mean_totals.append(float(np.mean(totals)))
+        for event_type, n in counts.items():
+            type_counts[event_type] = type_counts.get(event_type, 0) + n
+        per_profile_counts.append(counts)
+        life_rates.append(len(profile.get("life_events", [])) / years)
+        drift.append(float(np.abs(params_after - params_before).sum()))
+    return {
+        "events_per_profile": capped(events_per_profile),
+        "event_type_counts": type_counts,
+        "event_type_dispersion": _event_type_dispersion(per_profile_counts, sorted(type_counts)),
+        "median_gap_hours": capped(median_gaps),
+        "mean_order_total": capped(mean_totals),
+        "life_events_per_year": capped(life_rates),
+        "param_drift": capped(drift),
+    }
+
+
+def compare_fingerprints(reference, candidate, alpha=None):
+    """
+    Runs one test per metric and fails any whose p-value is below alpha divided by
+    the number of tests (Bonferroni), so the whole check has false-alarm rate <= alpha.
+
+    Returns:
+        tuple: (passed bool, list of {"metric", "test", "statistic", "p_value", "passed"}).
+    """
+    alpha = config.EQUIVALENCE_ALPHA if alpha is None else alpha
+    rows = []
+    for metric in ("events_per_profile", "median_gap_hours", "mean_order_total", "param_drift"):
+        stat, p = ks_2samp(reference[metric], candidate[metric])
+        rows.append({"metric": metric, "test": "ks", "statistic": stat, "p_value": p})
+    stat, p = welch_z(reference["life_events_per_year"], candidate["life_events_per_year"])
+    rows.append({"metric": "life_events_per_year", "test": "welch_z", "statistic": stat, "p_value": p})
+    event_types = sorted(set(reference["event_type_counts"]) | set(candidate["event_type_counts"]))
+    dispersion = max(1.0, (reference["event_type_dispersion"] + candidate["event_type_dispersion"]) / 2.0)
+    stat, p = chi_square_homogeneity([reference["event_type_counts"].get(t, 0) / dispersion for t in event_types],
+                                     [candidate["event_type_counts"].get(t, 0) / dispersion for t in event_types])
+    rows.append({"metric": "event_type_mix", "test": "chi_square", "statistic": stat, "p_value": p})
+    threshold = alpha / len(rows)
+    for row in rows:
+        row["passed"] = row["p_value"] >= threshold
+    return all(row["passed"] for row in rows), rows
+
+
+def record_reference(path=None, **run_options):
+    """Runs the seeded population and stores its fingerprint (with the run settings) as the reference."""
+    path = path or config.EQUIVALENCE_REFERENCE
+    settings = _run_settings(**run_options)
+    runs = generate_population(**settings)
+    reference = {"settings": settings, "fingerprint": fingerprint(runs, settings["days"])}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(reference, f)
+    return reference
+
+
+def check_against_reference(path=None, **run_options):
+    """
+    Runs the population with the reference's settings (overridable, e.g. seed) and compares.
+
+    Returns:
+        tuple: (passed bool, test rows).
+    """
+    path = path or config.EQUIVALENCE_REFERENCE
+    with open(path, 'r', encoding='utf-8') as f:
+        reference = json.load(f)
+    settings = dict(reference["settings"])
+    settings.update({k: v for k, v in run_options.items() if v is not None})
+    runs = generate_population(**settings)
+    return compare_fingerprints(reference["fingerprint"], fingerprint(runs, settings["days"]))
+
+
+def _run_settings(num_profiles=None, seed=None, days=None):
+    return {
+        "num_profiles": num_profiles or config.EQUIVALENCE_NUM_PROFILES,
+        "seed": config.EQUIVALENCE_SEED if seed is None else seed,
+        "days": days or config.EQUIVALENCE_DURATION_DAYS,
+    }
+
+
+if __name__ == '__main__':
+    # Example usage/test:
+    #   python equivalence.py record                   store the reference fingerprint
+    #   python equivalence.py check [--seed N]         compare a run against it (exit 1 on failure)
+    parser = argparse.ArgumentParser(description="Distributional equivalence check for simulator changes.")
+    parser.add_argument("mode", choices=("record", "check"))
+    parser.add_argument("--reference", default=config.EQUIVALENCE_REFERENCE)
+    parser.add_argument("--profiles", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--days", type=int)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING) # Keep progress messages out of the report
+    options = {"num_profiles": args.profiles, "seed": args.seed, "days": args.days}
+
+    if args.mode == "record":
+        reference = record_reference(args.reference, **options)
+        print(f"Recorded reference fingerprint to {args.reference}: {reference['settings']}")
+    else:
+        if not os.path.exists(args.reference):
+            print(f"No reference at {args.reference} (create one with 'record').")
+            sys.exit(2)
+        passed, rows = check_against_reference(args.reference, **options)
+        for row in rows:
+            print(f"{row['metric']:<24} {row['test']:<11} stat={row['statistic']:>10.4f}  p={row['p_value']:.4f}  {'ok' if row['passed'] else 'FAIL'}")
+        print("PASS: distributions match the reference." if passed else "FAIL: distributions differ from the reference.")
+        sys.exit(0 if passed else 1)
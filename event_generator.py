@@ -4,15 +4,31 @@ import random
 import datetime
 import logging
 import math # Added for sigmoid
+import functools
 
 # Import necessary components from other modules
 try:
     import config
     import utils
+    import profile_state
+    import id_service
 except ImportError as e:
-    logging.error(f"Error importing modules in event_generator.py: {e}. Ensure config.py and utils.py exist.")
+    logging.error(f"Error importing modules in event_generator.py: {e}. Ensure config.py, utils.py, profile_state.py, and id_service.py exist.")
     raise
 
+# Star-rating distribution for written reviews (skewed positive, as on Amazon)
+_RATING_SAMPLER = utils.WeightedSampler([1, 2, 3, 4, 5], [5, 5, 15, 35, 40])
+
+_LOWER_INTEREST_CATEGORIES = tuple((cat.lower(), cat) for cat in config.BASE_INTEREST_CATEGORIES)
+
+@functools.lru_cache(maxsize=1 << 16)
+def _query_category(query):
+    """First BASE_INTEREST_CATEGORIES entry named in a search query, or None (memoized: queries repeat heavily)."""
+    query = query.lower()
+    for cat_lower, cat in _LOWER_INTEREST_CATEGORIES:
+        if cat_lower in query: return cat
+    return None
+
 def generate_event_details(event_type, profile, current_timestamp):
     """
     Generates plausible details for a given event type based on the profile's
@@ -20,7 +36,8 @@ def generate_event_details(event_type, profile, current_timestamp):
 
     Args:
         event_type (str): The type of event to generate details for.
-        profile (dict): The customer profile dictionary, including '_internal_state'.
+        profile (dict): The customer profile dictionary, including '_internal_state'
+            (a profile_state.ProfileState).
         current_timestamp (datetime.datetime): The timestamp when the event occurs.
 
     Returns:
@@ -31,8 +48,8 @@ def generate_event_details(event_type, profile, current_timestamp):
         return None
 
     state = profile["_internal_state"]
-    params = state["behavioral_params"]
-    details = {"session_id": state["current_session_id"]}
+    params = state.behavioral_params
+    details = {"session_id": state.current_session_id}
 
     # --- Helper Functions within context ---
     def get_relevant_category(bias_towards_recent_base=0.6):
@@ -42,15 +59,13 @@ def generate_event_details(event_type, profile, current_timestamp):
         # Higher propensity decreases bias towards recent (more exploration)
         bias_towards_recent = bias_towards_recent_base + (0.5 - exploration_propensity) * 0.4 # Adjust bias +/- 20%
 
-        possible_cats = list(state.get("current_interests", config.BASE_INTEREST_CATEGORIES))
+        possible_cats = sorted(state.current_interests) # Sets iterate in hash order, which varies with PYTHONHASHSEED
         if not possible_cats: possible_cats = config.BASE_INTEREST_CATEGORIES
         recent_cats = []
-        for p in state.get("viewed_products", [])[-10:]: recent_cats.append(p.get('category'))
-        for s in state.get("search_history", [])[-5:]:
-            query = s.get('query', '').lower()
-            for cat in config.BASE_INTEREST_CATEGORIES:
-                if cat.lower() in query: recent_cats.append(cat); break
-        for o in state.get("orders", [])[-3:]:
+        for p in state.viewed_products[-10:]: recent_cats.append(p.get('category'))
+        for s in state.search_history[-5:]:
+            recent_cats.append(_query_category(s.get('query', '')))
+        for o in state.orders[-3:]:
             for item in o.get('items', []): recent_cats.append(item.get('category'))
         recent_cats = [cat for cat in recent_cats if cat]
         if recent_cats and random.random() < bias_towards_recent:
@@ -65,15 +80,13 @@ def generate_event_details(event_type, profile, current_timestamp):
         preferred_brand = None
 
         # Check recent purchases for brands in this category
-        brand_counts = state.get("brand_purchase_counts", {}).get(cat, {})
+        brand_counts = state.brand_purchase_counts.get(cat)
         if brand_counts and random.random() < brand_affinity:
-            # Weighted choice towards frequently purchased brands
-            total_purchases = sum(brand_counts.values())
-            brand_weights = [(brand, count / total_purchases) for brand, count in brand_counts.items()]
-            preferred_brand = utils.select_weighted_item(brand_weights)
-            logging.debug(f"Brand affinity triggered: Chose '{preferred_brand}' for category '{cat}'")
+            # Weighted choice towards frequently purchased brands (per-category sampler kept up to date on purchase)
+            preferred_brand = brand_counts.draw()
+            logging.debug("Brand affinity triggered: Chose '%s' for category '%s'", preferred_brand, cat)
 
-        product_id = base_product['product_id'] if base_product and 'product_id' in base_product else utils.generate_product_id()
+        product_id = base_product['product_id'] if base_product and 'product_id' in base_product else state.ids.product_id()
         product_name = base_product['product_name'] if base_product and 'product_name' in base_product else utils.generate_product_name(cat)
         price = base_product.get('price') if base_product and 'price' in base_product else utils.get_plausible_price(cat)
         brand = preferred_brand or (base_product.get('brand') if base_product else random.choice(config.BRANDS)) # Use preferred or existing or random
@@ -89,8 +102,8 @@ def generate_event_details(event_type, profile, current_timestamp):
 
     def get_device():
         # (Keep existing logic - relies on state['devices'])
-        devices = state.get("devices", [])
-        primary_device_info = state.get("primary_device") # Get the full dict
+        devices = state.devices
+        primary_device_info = state.primary_device # Get the full dict
         primary_device_name = primary_device_info.get("name") if primary_device_info else None
 
         if not devices: return "Unknown Device"
@@ -124,8 +137,8 @@ def generate_event_details(event_type, profile, current_timestamp):
 
         if random.random() < params.get("deal_seeking_propensity", 0.3): mods_to_add.extend(random.sample(['deals', 'discount', 'coupon', 'clearance'], k=1))
         if random.random() < params.get("brand_affinity_strength", 0.3) * 0.5: # Lower chance to search specific brand
-             all_brands = [item['brand'] for order in state.get('orders', []) for item in order.get('items', []) if 'brand' in item]
-             if all_brands: mods_to_add.append(random.choice(all_brands))
+             order_brands = state.get("order_brands")
+             if order_brands: mods_to_add.append(order_brands.choice())
 
         query = f"{query_base} {' '.join(mods_to_add)}".strip().replace("  ", " ")
         results_count = random.randint(0, 5000) if query else 0
@@ -181,8 +194,8 @@ def generate_event_details(event_type, profile, current_timestamp):
         product_to_add = generate_product_for_event() # Assume full logic exists here as before
 
         if not product_to_add: return None
-        cart = state.setdefault("cart", [])
-        existing_cart_item = next((item for item in cart if item["product_id"] == product_to_add["product_id"]), None)
+        cart = state.setdefault("cart", profile_state.Cart())
+        existing_cart_item = cart.get(product_to_add["product_id"])
         quantity = random.randint(1, 3)
         if existing_cart_item and random.random() < 0.5:
              existing_cart_item["quantity"] += quantity
@@ -195,20 +208,18 @@ def generate_event_details(event_type, profile, current_timestamp):
                  "price_per_item": product_to_add.get("price"), "added_timestamp": current_timestamp,
                  "brand": product_to_add.get("brand")
             }
-            cart.append(cart_item)
+            cart.add(cart_item)
             details.update({"product_id": cart_item["product_id"], "quantity_added": quantity, "new_total_quantity": quantity, "source": source})
-        state["cart"] = cart
 
     elif event_type == "remove_from_cart":
-        cart = state.get("cart", [])
+        cart = state.get("cart")
         if not cart: return None
-        removed_item = random.choice(cart)
-        cart.remove(removed_item)
+        removed_item = cart.random_item()
+        cart.discard(removed_item)
         details.update({"product_id": removed_item["product_id"], "quantity_removed": removed_item["quantity"], "price_per_item": removed_item["price_per_item"]})
-        state["cart"] = cart
 
     elif event_type == "purchase":
-        cart = state.get("cart", [])
+        cart = state.get("cart") or profile_state.Cart()
         items_to_buy = []
         purchase_source = "cart"
         impulse_prob = params.get("impulse_purchase_prob", 0.05)
@@ -226,18 +237,17 @@ def generate_event_details(event_type, profile, current_timestamp):
             abandon_prob = params.get("cart_abandon_propensity", 0.3)
             if random.random() < abandon_prob and len(cart) > 1:
                  buy_count = random.randint(1, len(cart) -1)
-                 items_to_buy = random.sample(cart, buy_count)
+                 items_to_buy = random.sample(cart.items(), buy_count)
             else:
-                 items_to_buy = list(cart)
-            purchased_ids = {item['product_id'] for item in items_to_buy}
-            state["cart"] = [item for item in cart if item['product_id'] not in purchased_ids]
+                 items_to_buy = cart.items()
+            cart.remove_many(item['product_id'] for item in items_to_buy)
         else:
             return None
 
         if not items_to_buy: return None
 
         total = sum(item['price_per_item'] * item['quantity'] for item in items_to_buy)
-        order_id = utils.generate_order_id()
+        order_id = state.ids.order_id()
         coupon_used = None
         # MBO Integration: Higher chance to use coupon if deal seeker OR reward sensitive
         deal_seek_prop = params.get("deal_seeking_propensity", 0.3)
@@ -259,7 +269,7 @@ def generate_event_details(event_type, profile, current_timestamp):
             "purchase_source": purchase_source, "coupon_used": coupon_used
         })
         # Update state: add order, update brand purchase counts
-        state.setdefault("orders", []).append({
+        profile_state.record_order(state, {
             "order_id": order_id, "items": items_to_buy, "total": details["total_amount"],
             "timestamp": current_timestamp, "status": "processing" # Initial status
         })
@@ -269,8 +279,7 @@ def generate_event_details(event_type, profile, current_timestamp):
             brand = item.get("brand")
             cat = item.get("category")
             if brand and cat:
-                cat_brands = brand_counts.setdefault(cat, {})
-                cat_brands[brand] = cat_brands.get(brand, 0) + item["quantity"]
+                brand_counts.setdefault(cat, utils.WeightedSampler()).add(brand, item["quantity"])
 
     # --- MBO Integration: New Event Type ---
     elif event_type == "reorder_item":
@@ -286,7 +295,7 @@ def generate_event_details(event_type, profile, current_timestamp):
             if min_reorder_days <= days_since_order <= max_reorder_days:
                 for item in order.get("items", []):
                     # Basic check: avoid reordering if already in cart or recently ordered again
-                    in_cart = any(c_item['product_id'] == item['product_id'] for c_item in state.get("cart", []))
+                    in_cart = item['product_id'] in state.get("cart", ())
                     recently_reordered = any(
                         reorder_item['product_id'] == item['product_id'] and (current_timestamp - reorder['timestamp']).days < min_reorder_days
                         for reorder in state.get("orders", []) if reorder.get("purchase_source") == "reorder"
@@ -311,13 +320,13 @@ def generate_event_details(event_type, profile, current_timestamp):
             reorder_candidates.append((item, prob))
 
         # Select item based on probability
-        chosen_item_data, chosen_prob = utils.select_weighted_item(reorder_candidates, weight_index=1) if reorder_candidates else (None, 0)
+        chosen_item_data, chosen_prob = utils.WeightedSampler(reorder_candidates, [prob for _, prob in reorder_candidates]).draw() if reorder_candidates else (None, 0)
 
         if chosen_item_data and random.random() < chosen_prob:
             item_to_reorder = chosen_item_data
             # Generate purchase details for the reordered item
             total = item_to_reorder['price_per_item'] * item_to_reorder['quantity']
-            order_id = utils.generate_order_id()
+            order_id = state.ids.order_id()
             details.update({
                 "order_id": order_id,
                 "items": [item_to_reorder], # Reorder typically one item at a time
@@ -331,7 +340,7 @@ def generate_event_details(event_type, profile, current_timestamp):
                 "coupon_used": None # Typically no coupon on simple reorder
             })
             # Update state: add order, update brand purchase counts
-            state.setdefault("orders", []).append({
+            profile_state.record_order(state, {
                 "order_id": order_id, "items": [item_to_reorder], "total": details["total_amount"],
                 "timestamp": current_timestamp, "status": "processing", "purchase_source": "reorder"
             })
@@ -340,8 +349,7 @@ def generate_event_details(event_type, profile, current_timestamp):
             brand = item_to_reorder.get("brand")
             cat = item_to_reorder.get("category")
             if brand and cat:
-                cat_brands = brand_counts.setdefault(cat, {})
-                cat_brands[brand] = cat_brands.get(brand, 0) + item_to_reorder["quantity"]
+                brand_counts.setdefault(cat, utils.WeightedSampler()).add(brand, item_to_reorder["quantity"])
         else:
             return None # No reorder triggered
 
@@ -349,7 +357,9 @@ def generate_event_details(event_type, profile, current_timestamp):
     elif event_type == "return_item":
         # Return propensity influences likelihood (handled in simulation.py weighting)
         # Details generation remains similar
-        eligible_orders = [o for o in state.get("orders", []) if o.get("status") in ["delivered", "completed", "returned_partial"] and (current_timestamp - o["timestamp"]).days < 30]
+        recent_orders = state.get("recent_orders")
+        if not recent_orders: return None
+        eligible_orders = recent_orders.eligible(current_timestamp, config.RETURN_WINDOW_DAYS, ("delivered", "completed", "returned_partial"))
         if not eligible_orders: return None
         order = random.choice(eligible_orders)
         eligible_items = [item for item in order["items"] if item.get("return_status") != "returned"]
@@ -362,7 +372,7 @@ def generate_event_details(event_type, profile, current_timestamp):
              "quantity_returned": item_to_return["quantity"], "reason": reason, "return_method": return_method
         })
         item_to_return["return_status"] = "returned"
-        order["status"] = "returned_full" if all(it.get("return_status") == "returned" for it in order["items"]) else "returned_partial"
+        profile_state.set_order_status(state, order, "returned_full" if all(it.get("return_status") == "returned" for it in order["items"]) else "returned_partial")
 
 
     # --- Other Events (Apply parameter influence where applicable) ---
@@ -406,19 +416,21 @@ def generate_event_details(event_type, profile, current_timestamp):
         # Review length/detail influenced by propensity?
         write_propensity = params.get("review_write_propensity", 0.1)
         # ... (find eligible item logic remains same) ...
-        eligible_orders = [o for o in state.get("orders", []) if o.get("status") in ["delivered", "completed"] and (current_timestamp - o["timestamp"]).days < 90]
+        recent_orders = state.get("recent_orders")
+        if not recent_orders: return None
+        eligible_orders = recent_orders.eligible(current_timestamp, config.REVIEW_WINDOW_DAYS, ("delivered", "completed"))
         if not eligible_orders: return None
         order = random.choice(eligible_orders)
         eligible_items = [item for item in order["items"] if item.get("review_status") != "reviewed" and item.get("return_status") != "returned"]
         if not eligible_items: return None
         item = random.choice(eligible_items)
 
-        rating = random.choices([1, 2, 3, 4, 5], weights=[5, 5, 15, 35, 40], k=1)[0]
+        rating = _RATING_SAMPLER.draw()
         review_length = max(10, int(random.gauss(100, 80) * (0.5 + write_propensity))) # Longer reviews if higher propensity
         has_title = random.random() < 0.4 + write_propensity * 0.4
         has_photos = random.random() < 0.1 + write_propensity * 0.2
         has_video = random.random() < 0.02 + write_propensity * 0.1
-        review_id = utils.generate_review_id()
+        review_id = state.ids.review_id()
         details.update({ #... (write review details) ...
             "review_id": review_id, "product_id": item["product_id"], "order_id": order["order_id"],
             "rating": rating, "review_length_words": review_length, "has_title": has_title,
@@ -440,7 +452,7 @@ def generate_event_details(event_type, profile, current_timestamp):
             else: return None
         elif action == "remove":
             if not wishlist: return None
-            product_id = random.choice(list(wishlist)); wishlist.remove(product_id); source="wishlist_page"
+            product_id = random.choice(sorted(wishlist)); wishlist.remove(product_id); source="wishlist_page"
         details.update({"action": action, "product_id": product_id, "source": source, "wishlist_size": len(wishlist)})
         state["wishlist"] = wishlist
 
@@ -470,7 +482,7 @@ def generate_event_details(event_type, profile, current_timestamp):
         value = round(random.uniform(0.5, 25.0), 2)
         coupon_type = random.choice(["percentage", "fixed_amount"])
         if coupon_type == "percentage": value = random.randint(5, 50)
-        coupon_code = utils.generate_coupon_code()
+        coupon_code = state.ids.coupon_code()
         details.update({"coupon_code": coupon_code, "coupon_value": value, "coupon_type": coupon_type, "category_applied": category})
         state.setdefault("active_promotions", {})[coupon_code] = {"value": value, "type": coupon_type, "category": category}
 
@@ -485,7 +497,7 @@ def generate_event_details(event_type, profile, current_timestamp):
 
     # Final check
     if not details:
-        logging.warning(f"Failed to generate details for event type: {event_type} for profile {profile.get('profile_id', 'N/A')}")
+        logging.warning("Failed to generate details for event type: %s for profile %s", event_type, profile.get("profile_id", "N/A"))
         return None
 
     return details
@@ -497,13 +509,14 @@ if __name__ == '__main__':
     print("--- Testing Refactored Event Generation ---")
 
     mock_start_date = datetime.datetime(2024, 1, 1)
+    mock_ids = id_service.ProfileIds(1)
     mock_profile = {
         "profile_id": "cust_0001",
-        "_internal_state": {
+        "_internal_state": profile_state.ProfileState.from_dict({
             "current_timestamp": mock_start_date, "current_age": 30,
             "current_interests": {"Electronics", "Books", "Deals & Bargains", "Household Supplies"},
             "is_prime": True, "used_services": {"Prime Membership", "Prime Video"},
-            "behavioral_params": { # Sample parameters including MBO
+            "behavioral_params": profile_state.BehavioralParams.from_dict({ # Sample parameters including MBO (others default to range midpoints)
                 "activity_level": 0.7, "review_read_propensity": 0.8, "review_write_propensity": 0.2,
                 "purchase_latency_factor": 0.8, "deal_seeking_propensity": 0.9, "brand_affinity_strength": 0.2,
                 "tech_adoption_propensity": 0.6, "cart_abandon_propensity": 0.2, "return_propensity": 0.1,
@@ -513,24 +526,27 @@ if __name__ == '__main__':
                 "audible_engagement": 0.2, "alexa_shopping_propensity": 0.1,
                 # MBO Params
                 "reward_sensitivity": 0.8, "attention_focus": 0.4, "category_exploration_propensity": 0.2, "habit_formation_speed": 0.7
-            },
+            }, fill_missing=True),
             "devices": [ # Store full dicts internally now
                  {"name": "Mobile App (iOS)", "platform": "app", "conversion_rate": 0.038},
                  {"name": "Desktop Website (Mac)", "platform": "web", "conversion_rate": 0.046},
                  {"name": "Echo Device", "platform": "voice", "conversion_rate": 0.030}
             ],
             "primary_device": {"name": "Mobile App (iOS)", "platform": "app", "conversion_rate": 0.038}, # Store full dict internally
-            "cart": [],
-            "orders": [ # Add a sample past order for reorder testing
-                {"order_id": "ord_past_001", "items": [{"product_id": "prod_abc", "product_name": "Habitual Coffee Pods", "category": "Grocery", "quantity": 1, "price_per_item": 15.99, "brand": "BrandX"}], "total": 15.99, "timestamp": mock_start_date - datetime.timedelta(days=45), "status": "delivered"}
-            ],
+            "cart": profile_state.Cart(),
+            "orders": [], # Populated below with a sample past order for reorder testing
             "wishlist": set(), "viewed_products": [], "search_history": [],
-            "last_event_timestamp": mock_start_date, "current_session_id": utils.generate_session_id(),
+            "last_event_timestamp": mock_start_date, "ids": mock_ids, "current_session_id": mock_ids.session_id(),
             "session_start_time": mock_start_date, "events_in_session": 0, "seasonal_boost": 1.0,
-            "brand_purchase_counts": {"Grocery": {"BrandX": 1}} # Reflect past order
-        }
+            "brand_purchase_counts": {"Grocery": utils.WeightedSampler(["BrandX"], [1])} # Reflect past order
+        })
     }
 
+    profile_state.record_order(mock_profile["_internal_state"], {
+        "order_id": "ord_past_001", "items": [{"product_id": "prod_abc", "product_name": "Habitual Coffee Pods", "category": "Grocery", "quantity": 1, "price_per_item": 15.99, "brand": "BrandX"}],
+        "total": 15.99, "timestamp": mock_start_date - datetime.timedelta(days=45), "status": "delivered"
+    })
+
     # Test events influenced by parameters
     event_types_to_test = ["search", "view_product", "browse_category", "view_review", "clip_coupon", "purchase", "add_to_cart", "reorder_item"]
     for etype in event_types_to_test:
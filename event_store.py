@@ -0,0 +1,199 @@
+# event_store.py - Compact Columnar Storage for a Profile's Activity Log
+
+import sys
+import datetime
+import logging
+from array import array
+
+# Import necessary components from other modules
+try:
+    import utils
+except ImportError as e:
+    logging.error(f"Error importing modules in event_store.py: {e}. Ensure utils.py exists.")
+    raise
+
+# Reference point for storing timestamps as integer microseconds
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_MISSING = object()
+
+# Detail fields with a small set of repeating values; interned so every event shares one string object
+_INTERNED_DETAIL_KEYS = frozenset([
+    "category", "brand", "category_name", "category_applied", "search_type", "source", "sort_applied",
+    "sort_order", "filter_applied", "payment_method", "shipping_address_type", "shipping_speed",
+    "purchase_source", "reason", "return_method", "coupon_type", "intent", "action", "notes",
+])
+
+
+class _Interner:
+    """Maps repeating values (event types, devices, sessions, detail key tuples) to small integer codes."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class _Record(tuple):
+    """A frozen dict: (schema code, value1, value2, ...). Keys live in the store's schema table."""
+    __slots__ = ()
+
+
+class EventStore:
+    """
+    Append-only activity log held in typed columns.
+
+    Timestamps are integer microseconds, event types / devices / session IDs are
+    per-store integer codes, and the remaining detail fields are frozen into
+    tuples keyed by an interned schema. Nested lists and dicts (e.g. purchased
+    items) are copied at record time, so later state changes such as an item's
+    `return_status` never leak into an already logged event.
+
+    Events are turned back into the usual
+    `{"timestamp", "event_type", "details"}` dicts only when iterated or
+    serialized (`to_list`, `json_default`).
+    """
+
+    __slots__ = ("_timestamps", "_type_codes", "_session_codes", "_device_codes", "_payloads",
+                 "_event_types", "_sessions", "_devices", "_schemas")
+
+    def __init__(self):
+        self._timestamps = array("q")
+        self._type_codes = array("B")
+        self._session_codes = array("I")
+        self._device_codes = array("H")
+        self._payloads = []
+        self._event_types = _Interner()
+        self._sessions = _Interner([_MISSING])
+        self._devices = _Interner([_MISSING])
+        self._schemas = _Interner()
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def __bool__(self):
+        return len(self._timestamps) > 0
+
+    def __iter__(self):
+        for index in range(len(self._timestamps)):
+            yield self._materialize(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index out of range")
+        return self._materialize(index)
+
+    # --- Recording ---
+    def append(self, timestamp, event_type, details):
+        """Records one event. `details` is copied; the caller's dict is not retained."""
+        session_id = details.get("session_id", _MISSING)
+        device_used = details.get("device_used", _MISSING)
+        rest = {k: v for k, v in details.items() if k != "session_id" and k != "device_used"}
+        self._timestamps.append((timestamp - _EPOCH) // _MICROSECOND)
+        self._type_codes.append(self._event_types.code(event_type))
+        self._session_codes.append(self._sessions.code(session_id))
+        self._device_codes.append(self._devices.code(device_used))
+        self._payloads.append(self._freeze(rest))
+
+    def _freeze(self, value, key=None):
+        if isinstance(value, dict):
+            return _Record((self._schemas.code(tuple(value)),) + tuple(self._freeze(v, k) for k, v in value.items()))
+        if isinstance(value, (list, tuple)):
+            return tuple(self._freeze(v, key) for v in value)
+        if key in _INTERNED_DETAIL_KEYS and type(value) is str:
+            return sys.intern(value)
+        return value
+
+    # --- Reading ---
+    def _thaw(self, value):
+        if type(value) is _Record:
+            keys = self._schemas.values[value[0]]
+            return {k: self._thaw(v) for k, v in zip(keys, value[1:])}
+        if type(value) is tuple:
+            return [self._thaw(v) for v in value]
+        return value
+
+    def timestamp_at(self, index):
+        """Returns the datetime of event `index` without materializing the event."""
+        return _EPOCH + self._timestamps[index] * _MICROSECOND
+
+    def session_id_at(self, index):
+        session_id = self._sessions.values[self._session_codes[index]]
+        return None if session_id is _MISSING else session_id
+
+    def event_type_at(self, index):
+        return self._event_types.values[self._type_codes[index]]
+
+    def _materialize(self, index):
+        details = {}
+        session_id = self._sessions.values[self._session_codes[index]]
+        if session_id is not _MISSING:
+            details["session_id"] = session_id
+        device_used = self._devices.values[self._device_codes[index]]
+        if device_used is not _MISSING:
+            details["device_used"] = device_used
+        details.update(self._thaw(self._payloads[index]))
+        return {
+            "timestamp": utils.format_iso_timestamp(self.timestamp_at(index)),
+            "event_type": self._event_types.values[self._type_codes[index]],
+            "details": details,
+        }
+
+    def iter_from(self, start_index):
+        """Yields materialized events from `start_index` onwards."""
+        for index in range(start_index, len(self._timestamps)):
+            yield self._materialize(index)
+
+    def to_list(self):
+        """Materializes every event as a plain dict."""
+        return list(self)
+
+    def sort_by_timestamp(self):
+        """Stable-sorts the columns by timestamp. A no-op when events were recorded in order."""
+        ts = self._timestamps
+        if all(ts[i] <= ts[i + 1] for i in range(len(ts) - 1)):
+            return
+        order = sorted(range(len(ts)), key=ts.__getitem__)
+        for name in ("_timestamps", "_type_codes", "_session_codes", "_device_codes"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+        self._payloads = [self._payloads[i] for i in order]
+
+    def __getstate__(self):
+        return (self._timestamps, self._type_codes, self._session_codes, self._device_codes, self._payloads,
+                self._event_types.values, self._sessions.values[1:], self._devices.values[1:], self._schemas.values)
+
+    def __setstate__(self, pickled):
+        (self._timestamps, self._type_codes, self._session_codes, self._device_codes, self._payloads,
+         event_types, sessions, devices, schemas) = pickled
+        self._event_types = _Interner(event_types)
+        self._sessions = _Interner([_MISSING] + list(sessions))
+        self._devices = _Interner([_MISSING] + list(devices))
+        self._schemas = _Interner(schemas)
+
+
+def json_default(obj):
+    """`json.dump` fallback: materializes event stores at the sink and stringifies everything else (e.g. datetimes)."""
+    if isinstance(obj, EventStore):
+        return obj.to_list()
+    return str(obj)
+
+
+def materialize_profile(profile):
+    """Replaces a profile's EventStore activity log with the plain list of event dicts, in place."""
+    if isinstance(profile.get("activity_log"), EventStore):
+        profile["activity_log"] = profile["activity_log"].to_list()
+    return profile
@@ -0,0 +1,195 @@
+# event_stream.py - Globally Time-Ordered Event Stream Across Profiles
+
+import os
+import json
+import glob
+import heapq
+import logging
+import tempfile
+
+# Import necessary components from other modules
+try:
+    import config
+    import event_store
+except ImportError as e:
+    logging.error("Error importing modules in event_stream.py: %s. Ensure config.py and event_store.py exist.", e)
+    raise
+
+# Stream records are flat dicts: {"timestamp", "profile_id", "event_type", "details"}.
+# Timestamps are fixed-width ISO strings ("...Z"), so string order is time order.
+
+
+def _timestamp_key(record):
+    return record["timestamp"]
+
+
+def profile_events(profile):
+    """
+    Yields one profile's events as stream records, in activity log order.
+
+    Works on simulated profiles (EventStore log) and on profiles loaded back from
+    the JSON output files (list of event dicts); both are already time-sorted.
+    """
+    profile_id = profile.get("profile_id")
+    for event in profile.get("activity_log", []):
+        yield {"timestamp": event["timestamp"], "profile_id": profile_id,
+               "event_type": event["event_type"], "details": event.get("details", {})}
+
+
+def merge_streams(streams):
+    """
+    K-way heap merge of time-sorted record iterators into one time-ordered stream.
+
+    Only the head record of each input is held in memory. Ties keep input order,
+    so events of one profile never swap places.
+
+    Args:
+        streams (iterable): Iterators of records, each sorted by timestamp.
+
+    Returns:
+        iterator: The merged records.
+    """
+    return heapq.merge(*streams, key=_timestamp_key)
+
+
+def merge_profiles(profiles):
+    """Merges the activity logs of in-memory profiles into one time-ordered stream."""
+    return merge_streams([profile_events(profile) for profile in profiles])
+
+
+# --- Sorted Shard Files (JSON Lines) ---
+
+def write_records(records, path):
+    """Writes records to `path` as JSON Lines. Returns the number written."""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=event_store.json_default))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def iter_shard(path):
+    """Streams the records of one JSON Lines shard file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ShardWriter:
+    """
+    Collects profiles and writes their events as time-sorted shard files.
+
+    Every `profiles_per_shard` profiles, the group's events are merged in
+    memory and written to `shard_NNNNN.jsonl`, so memory is bounded by one
+    group rather than the whole dataset. Writers sharing a directory (e.g. one
+    per worker chunk) pass distinct `name_prefix`es, such as "shard_c00003_".
+    """
+
+    def __init__(self, shard_dir, profiles_per_shard=None, name_prefix="shard_"):
+        self.shard_dir = shard_dir
+        self.profiles_per_shard = profiles_per_shard or config.EVENT_STREAM_PROFILES_PER_SHARD
+        self.name_prefix = name_prefix
+        self.paths = []
+        self._pending = []
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def add(self, profile):
+        """Adds one simulated or loaded profile (only its event records are kept)."""
+        self._pending.append(list(profile_events(profile)))
+        if len(self._pending) >= self.profiles_per_shard:
+            self.flush()
+
+    def flush(self):
+        """Writes the pending profiles' events as one sorted shard."""
+        if not self._pending:
+            return None
+        path = os.path.join(self.shard_dir, f"{self.name_prefix}{len(self.paths):05d}.jsonl")
+        count = write_records(merge_streams([iter(events) for events in self._pending]), path)
+        logging.debug("Wrote %d events from %d profiles to %s", count, len(self._pending), path)
+        self._pending = []
+        self.paths.append(path)
+        return path
+
+    def close(self):
+        """Flushes the last partial shard. Returns the list of shard paths."""
+        self.flush()
+        return self.paths
+
+
+def shard_profile_files(profile_paths, shard_dir, profiles_per_shard=None):
+    """
+    Converts per-profile JSON output files into time-sorted shard files,
+    loading one group of profiles at a time.
+
+    Returns:
+        list: Paths of the written shards.
+    """
+    writer = ShardWriter(shard_dir, profiles_per_shard)
+    for path in profile_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            writer.add(json.load(f))
+    return writer.close()
+
+
+def merge_shards(shard_paths, fan_in=None, work_dir=None):
+    """
+    Merges sorted shard files into one time-ordered stream.
+
+    At most `fan_in` files are open at once: with more shards, groups are first
+    merged into intermediate shards in `work_dir` (multi-pass external merge).
+
+    Args:
+        shard_paths (list): Sorted JSON Lines shard files.
+        fan_in (int, optional): Maximum shards merged at once. Defaults to config.EVENT_STREAM_MAX_FAN_IN.
+        work_dir (str, optional): Directory for intermediate shards. Defaults to a temporary directory.
+
+    Returns:
+        iterator: The merged records.
+    """
+    fan_in = max(2, fan_in or config.EVENT_STREAM_MAX_FAN_IN)
+    paths = list(shard_paths)
+    merge_pass = 0
+    while len(paths) > fan_in:
+        work_dir = work_dir or tempfile.mkdtemp(prefix="event_stream_")
+        merged = []
+        for start in range(0, len(paths), fan_in):
+            group = paths[start:start + fan_in]
+            path = os.path.join(work_dir, f"pass{merge_pass}_{start // fan_in:05d}.jsonl")
+            write_records(merge_streams([iter_shard(p) for p in group]), path)
+            merged.append(path)
+        logging.info("Merge pass %d: %d shards -> %d", merge_pass, len(paths), len(merged))
+        paths = merged
+        merge_pass += 1
+    return merge_streams([iter_shard(p) for p in paths])
+
+
+def global_event_stream(output_dir=None, shard_dir=None):
+    """
+    Builds the globally time-ordered stream for a directory of generated profile files.
+
+    Args:
+        output_dir (str, optional): Directory holding the profile JSON files. Defaults to config.OUTPUT_DIR.
+        shard_dir (str, optional): Where to write the sorted shards. Defaults to config.EVENT_STREAM_SHARD_DIR,
+            or a temporary directory.
+
+    Returns:
+        iterator: The merged records.
+    """
+    output_dir = output_dir or config.OUTPUT_DIR
+    shard_dir = shard_dir or config.EVENT_STREAM_SHARD_DIR or tempfile.mkdtemp(prefix="event_shards_")
+    profile_paths = sorted(glob.glob(os.path.join(output_dir, f"{config.FILENAME_PREFIX}*.json")))
+    shard_paths = shard_profile_files(profile_paths, shard_dir)
+    logging.info("Sharded %d profiles into %d sorted shards in %s", len(profile_paths), len(shard_paths), shard_dir)
+    return merge_shards(shard_paths)
+
+
+if __name__ == '__main__':
+    # Example usage/test: merge the profiles in config.OUTPUT_DIR into one ordered JSON Lines file
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(config.OUTPUT_DIR, "events_global.jsonl")
+    written = write_records(global_event_stream(), target)
+    print(f"Wrote {written} events in global timestamp order to {target}")
@@ -11,25 +11,29 @@ import math
 try:
     import config
     import utils
+    import event_store
 except ImportError as e:
     logging.error(f"Failed to import config or utils: {e}. Ensure config.py and utils.py are present.")
     exit(1) # Exit if core config/utils are missing
 
 # Import core generation logic modules
 try:
-    import personas
+    import population
     import simulation
+    import event_stream
+    import snapshots
+    import instrumentation
+    import profiling
+    import logging_setup
+    import scheduler
 except ImportError as e:
-    logging.error(f"Failed to import personas or simulation: {e}. Ensure personas.py and simulation.py are present.")
+    logging.error(f"Failed to import population or simulation: {e}. Ensure population.py, personas.py, simulation.py, event_stream.py, snapshots.py, instrumentation.py, profiling.py, logging_setup.py and scheduler.py are present.")
     exit(1) # Exit if generation logic is missing
 
 
 # --- Logging Setup ---
-# Configure logging level (e.g., INFO for general progress, DEBUG for detailed steps)
-log_level = logging.INFO # Or change to logging.DEBUG for more verbosity
-logging.basicConfig(level=log_level,
-                    format='%(asctime)s - %(levelname)s - [%(module)s:%(lineno)d] - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S')
+# Records are queued and written by a background thread; the level is config.LOG_LEVEL
+# (e.g., INFO for general progress, DEBUG for detailed steps). Set up when run as a script.
 
 # --- Main Execution ---
 
@@ -59,39 +63,73 @@ def main():
     logging.info(f"Output directory: {os.path.abspath(output_dir)}")
     logging.info(f"File size/line limits: Disabled (prioritizing detail)") # Updated log message
 
+    # With PARALLEL_GENERATION, instrumentation and profiling run in the workers (see scheduler._run_chunk)
+    if config.INSTRUMENTATION_ENABLED and not config.PARALLEL_GENERATION:
+        instrumentation.enable()
+    profiler = profiling.SampledProfiler() if config.PROFILING_EVERY_N and not config.PARALLEL_GENERATION else None
     total_start_time = time.time()
     profiles_generated = 0
     profiles_failed = 0
 
-    # Determine the simulation start date (relative to "now" when the script runs)
+    # Determine the simulation start date (config.SIMULATION_START_DATE, else relative to "now" when the script runs)
     # All profiles will share the same simulation time window for consistency
-    simulation_start_date_for_all = datetime.datetime.now() - datetime.timedelta(days=config.SIMULATION_DURATION_DAYS) # Use config value directly
-    logging.info(f"Simulation time window: {simulation_start_date_for_all.date()} to {datetime.datetime.now().date()}")
+    if config.SIMULATION_START_DATE:
+        simulation_start_date_for_all = datetime.datetime.fromisoformat(config.SIMULATION_START_DATE)
+    else:
+        simulation_start_date_for_all = datetime.datetime.now() - datetime.timedelta(days=config.SIMULATION_DURATION_DAYS) # Use config value directly
+    logging.info(f"Simulation time window: {simulation_start_date_for_all.date()} to {(simulation_start_date_for_all + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)).date()}")
 
     # --- Generation Loop ---
-    for i in range(start_index, start_index + num_profiles):
+    batch = None
+    shard_writer = event_stream.ShardWriter(config.EVENT_STREAM_SHARD_DIR) if config.EVENT_STREAM_SHARD_DIR and not config.PARALLEL_GENERATION else None
+    snapshot_dir = config.SNAPSHOT_DIR
+    simulation_end_date = simulation_start_date_for_all + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+    sequential_indices = range(start_index, start_index + num_profiles)
+    summary = None
+    if config.PARALLEL_GENERATION:
+        # Simulation, JSON output, snapshots, shards, instrumentation and sampled profiling run in
+        # worker processes, scheduled largest-first by expected events
+        summary = scheduler.generate_parallel(start_index, num_profiles, simulation_start_date_for_all, output_dir, config.WORKER_COUNT)
+        profiles_generated, profiles_failed = summary["generated"], summary["failed"]
+        sequential_indices = range(0)
+    for i in sequential_indices:
         profile_index = i
+        # Base profiles are sampled a batch at a time (vectorized) and split out one by one below
+        if batch is None or profile_index >= batch.start_index + len(batch):
+            batch_size = min(config.POPULATION_BATCH_SIZE, start_index + num_profiles - profile_index)
+            batch = population.sample_population(profile_index, batch_size, simulation_start_date_for_all)
+            logging.debug("Sampled base profiles %d to %d", profile_index, profile_index + batch_size - 1)
         profile_start_time = time.time()
-        logging.info(f"--- Generating profile {profile_index:0{filename_digits}d}/{start_index + num_profiles - 1} ---")
+        logging.info("--- Generating profile %0*d/%d ---", filename_digits, profile_index, start_index + num_profiles - 1)
 
         base_profile = None
         simulated_profile = None
         final_profile_data = None
+        if profiler:
+            profiler.start(profile_index) # Simulation and output of every Nth profile
 
         try:
             # 1. Create Base Profile
-            logging.debug(f"[{profile_index}] Calling create_base_profile...")
-            base_profile = personas.create_base_profile(profile_index, simulation_start_date_for_all)
+            logging.debug("[%d] Building base profile from the sampled batch...", profile_index)
+            base_profile = batch.profile(profile_index - batch.start_index)
             if not base_profile:
                 raise ValueError("Failed to create base profile structure.")
-            logging.debug(f"[{profile_index}] Base profile created.")
+            logging.debug("[%d] Base profile created.", profile_index)
 
             # 2. Simulate Activity
-            logging.debug(f"[{profile_index}] Calling simulate_activity...")
-            simulated_profile = simulation.simulate_activity(base_profile) # Pass the profile with internal state
+            logging.debug("[%d] Calling simulate_activity...", profile_index)
+            if config.RANDOM_SEED is not None:
+                population.seed_profile(config.RANDOM_SEED, profile_index) # Same per-profile streams as the parallel workers
+            simulated_profile = simulation.simulate_activity(base_profile, finalize=not snapshot_dir) # Pass the profile with internal state
             if not simulated_profile:
                 raise ValueError("Simulation failed to produce a final profile.")
-            logging.debug(f"[{profile_index}] Simulation complete. Events: {len(simulated_profile.get('activity_log', []))}")
+            if snapshot_dir:
+                # Save the end state before finalizing drops it
+                snapshots.save_profile(simulated_profile, snapshot_dir, profile_index, simulation_end_date)
+                simulated_profile = simulation.finalize_profile(simulated_profile)
+            logging.debug("[%d] Simulation complete. Events: %d", profile_index, len(simulated_profile.get('activity_log', [])))
 
             # 3. Finalize Profile Data (No truncation needed anymore)
             final_profile_data = simulated_profile # Use the potentially truncated profile
@@ -101,13 +139,16 @@ def main():
             file_path = os.path.join(output_dir, file_name)
 
             # 5. Write Profile to JSON File
-            logging.debug(f"[{profile_index}] Writing profile to {file_path}...")
+            logging.debug("[%d] Writing profile to %s...", profile_index, file_path)
             with open(file_path, 'w', encoding='utf-8') as f:
                 # Use indent for readability, ensure_ascii=False for broader character support
-                json.dump(final_profile_data, f, indent=2, ensure_ascii=False, default=str) # default=str handles datetime objects
+                json.dump(final_profile_data, f, indent=2, ensure_ascii=False, default=event_store.json_default) # Materializes the activity log; str() for datetime objects
+
+            if shard_writer:
+                shard_writer.add(final_profile_data) # Time-sorted event shards for the global stream
 
             profile_end_time = time.time()
-            logging.info(f"Successfully generated and saved profile {profile_index:0{filename_digits}d} (took {profile_end_time - profile_start_time:.2f}s)")
+            logging.info("Successfully generated and saved profile %0*d (took %.2fs)", filename_digits, profile_index, profile_end_time - profile_start_time)
             profiles_generated += 1
 
         except Exception as e:
@@ -117,6 +158,8 @@ def main():
             # Optional: Decide whether to stop or continue on error
             # continue # Default: Continue to next profile
             # break # Uncomment to stop on the first error
+        if profiler:
+            profiler.stop()
 
         # --- Progress Logging ---
         profiles_processed = profiles_generated + profiles_failed
@@ -130,8 +173,27 @@ def main():
              logging.info(f"Avg time/profile: {avg_time:.2f}s. Est. time remaining: {est_remaining_time:.0f}s ({est_remaining_time/60.0:.1f} min)")
 
 
+    shard_paths = shard_writer.close() if shard_writer else (summary["shard_paths"] if summary else [])
+    if shard_paths:
+        logging.info(f"Wrote {len(shard_paths)} time-sorted event shards to '{os.path.abspath(config.EVENT_STREAM_SHARD_DIR)}' (merge with event_stream.merge_shards).")
+    if snapshot_dir:
+        snapshots.save_manifest(snapshot_dir, simulation_end_date)
+        logging.info(f"Saved end-of-run snapshots to '{os.path.abspath(snapshot_dir)}' (extend with snapshots.extend_dataset).")
+
+    collector = instrumentation.disable()
+    if summary:
+        # Worker reports and per-worker profiles, already combined by the scheduler
+        report, stats_path, samples = summary["instrumentation"], summary["profile_path"], summary["profile_samples"]
+    else:
+        report = collector.report() if collector else None
+        stats_path, samples = (profiler.write(), profiler.samples) if profiler else (None, 0)
+    if stats_path:
+        logging.info(f"Sampled profiling: merged {samples} samples into '{os.path.abspath(stats_path)}' (summary and allocation sites in '{os.path.abspath(config.PROFILING_OUTPUT_DIR)}').")
+
     # --- Final Summary ---
     total_end_time = time.time()
+    if summary:
+        logging.info(scheduler.format_load_balance(summary["load_balance"]))
     logging.info(f"\n--- Generation Complete ---")
     logging.info(f"Total execution time: {total_end_time - total_start_time:.2f} seconds")
     logging.info(f"Successfully generated: {profiles_generated} profiles")
@@ -139,6 +201,15 @@ def main():
     logging.info(f"Profiles saved in '{os.path.abspath(output_dir)}'.")
     if profiles_failed > 0:
         logging.warning("There were errors during generation. Please check the log above for details on failed profiles.")
+    if report is not None:
+        logging.info(f"Instrumentation (top stages and event types by total time):\n{instrumentation.format_report(report, limit=25)}")
+        if config.INSTRUMENTATION_REPORT_PATH:
+            instrumentation.write_report(report, config.INSTRUMENTATION_REPORT_PATH)
+            logging.info(f"Instrumentation report written to '{os.path.abspath(config.INSTRUMENTATION_REPORT_PATH)}'.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    logging_setup.configure()
+    try:
+        main()
+    finally:
+        logging_setup.shutdown() # Flush queued records before exiting
\ No newline at end of file
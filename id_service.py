@@ -0,0 +1,230 @@
+# id_service.py - Collision-Free, Reproducible Entity IDs
+
+import random
+import logging
+
+# Import necessary components from other modules
+try:
+    import config
+    import startup
+except ImportError as e:
+    logging.error(f"Error importing modules in id_service.py: {e}. Ensure config.py and startup.py exist.")
+    raise
+
+np = startup.lazy_import("numpy") # Loaded on first sampling call, not at import
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15 # Odd multiplier for the Feistel round function
+_FEISTEL_ROUNDS = 4
+_COUPON_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Value space of each ID format (see the utils.generate_* functions for the formats),
+# given as the two Feistel half-domain sizes whose product is the space size
+ID_SPACE_SPLITS = {
+    "product": (1 << 18, 1 << 18), # B0 + 9 hex digits: 16**9
+    "order": (30 * 9000000, 30 * 9000000), # DDD-DDDDDDD-DDDDDDD: 900 * 9000000**2
+    "session": (1 << 32, 1 << 32), # UUID-shaped: 2**64
+    "review": (90000, 100000), # R + 10 digits: 9 * 10**9
+    "question": (30000, 30000), # Q + 9 digits: 9 * 10**8
+    "coupon": (36 ** 4, 36 ** 4), # XXXX-XXXX: 36**8
+}
+ID_SPACES = {kind: a * b for kind, (a, b) in ID_SPACE_SPLITS.items()}
+
+
+def _mix64(x):
+    x = ((x ^ (x >> 31)) * 0xBF58476D1CE4E5B9) & _MASK64
+    return x ^ (x >> 27)
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection on [0, a * b).
+
+    A value is split into (left, right) with left < a and right < b, and each
+    round maps (left, right) to (right, (left + F(right)) mod size-of-left).
+    Halves swap shape every round, so with an even number of rounds the
+    result lands back in [0, a * b) without any cycle walking. Every round is
+    invertible, so the whole map is a bijection for any keys.
+    """
+
+    def __init__(self, a, b, keys):
+        if len(keys) % 2:
+            raise ValueError("FeistelPermutation needs an even number of round keys")
+        self.a, self.b = a, b
+        self.domain_size = a * b
+        self.keys = tuple(k & _MASK64 for k in keys)
+
+    def permute(self, x):
+        """Maps one value in [0, domain_size) to its scrambled counterpart."""
+        left, right = divmod(x, self.b)
+        left_size, right_size = self.a, self.b
+        for key in self.keys:
+            f = ((right ^ key) * _GOLDEN) & _MASK64
+            f ^= f >> 29
+            left, right = right, (left + f) % left_size
+            left_size, right_size = right_size, left_size
+        return left * self.b + right
+
+    def permute_many(self, values):
+        """Vectorized `permute` over an array of values; returns a uint64 array."""
+        x = np.asarray(values, dtype=np.uint64)
+        left, right = np.divmod(x, np.uint64(self.b))
+        left_size, right_size = np.uint64(self.a), np.uint64(self.b)
+        for key in self.keys:
+            f = (right ^ np.uint64(key)) * np.uint64(_GOLDEN) # Wraps mod 2**64, same as the scalar path
+            f ^= f >> np.uint64(29)
+            left, right = right, (left + f % left_size) % left_size # Half sizes are < 2**32, so no overflow
+            left_size, right_size = right_size, left_size
+        return left * np.uint64(self.b) + right
+
+
+def _format_product(v):
+    return f"B0{v:09X}"
+
+def _format_order(v):
+    a, rest = divmod(v, 9000000 * 9000000)
+    b, c = divmod(rest, 9000000)
+    return f"{100 + a}-{1000000 + b}-{1000000 + c}"
+
+_UUID4_CLEAR = ~((0xF << 76) | (0x3 << 62))
+_UUID4_SET = (0x4 << 76) | (0x2 << 62)
+
+def _format_session(v):
+    # The scrambled value fills UUID bits the version/variant fields leave untouched (low 62 bits plus
+    # bits 64-65); the remaining high bits are a mix of it, so the UUID stays unique and looks random.
+    high = (_mix64(v) & ~3) | (v >> 62)
+    h = f"{(((high << 64) | (v & ((1 << 62) - 1))) & _UUID4_CLEAR) | _UUID4_SET:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+def _format_review(v):
+    return f"R{10 ** 9 + v}"
+
+def _format_question(v):
+    return f"Q{10 ** 8 + v}"
+
+def _format_coupon(v):
+    chars = []
+    for _ in range(8):
+        v, digit = divmod(v, 36)
+        chars.append(_COUPON_ALPHABET[digit])
+    return f"{''.join(chars[:4])}-{''.join(chars[4:])}"
+
+_FORMATTERS = {
+    "product": _format_product, "order": _format_order, "session": _format_session,
+    "review": _format_review, "question": _format_question, "coupon": _format_coupon,
+}
+
+
+class IdService:
+    """
+    Issues IDs in the existing formats from (profile index, per-profile counter) pairs.
+
+    Each pair maps to a unique slot in the format's value space, and a seeded
+    Feistel permutation scrambles the slot so IDs still look random. Distinct
+    profiles and counters therefore never collide, and the same seed always
+    reproduces the same IDs.
+    """
+
+    def __init__(self, seed=None, max_profiles=None):
+        self.seed = seed
+        self.max_profiles = max_profiles or config.ID_MAX_PROFILES
+        self._permutations = {}
+        for kind, (a, b) in ID_SPACE_SPLITS.items():
+            rng = random.Random(f"{seed}:{kind}") # String seeds hash deterministically across runs
+            self._permutations[kind] = FeistelPermutation(a, b, [rng.getrandbits(64) for _ in range(_FEISTEL_ROUNDS)])
+
+    def capacity(self, kind):
+        """Maximum number of IDs of `kind` a single profile can be issued."""
+        return ID_SPACES[kind] // self.max_profiles
+
+    def _slot(self, kind, profile_index, counter):
+        if profile_index >= self.max_profiles:
+            raise OverflowError(f"Profile index {profile_index} exceeds ID_MAX_PROFILES ({self.max_profiles}); raise it in config.py.")
+        slot = counter * self.max_profiles + profile_index
+        if slot >= ID_SPACES[kind]:
+            raise OverflowError(f"Profile {profile_index} exhausted its {kind} ID capacity ({self.capacity(kind)}).")
+        return slot
+
+    def issue(self, kind, profile_index, counter):
+        """Returns the ID for the `counter`-th `kind` issued to `profile_index`."""
+        return _FORMATTERS[kind](self._permutations[kind].permute(self._slot(kind, profile_index, counter)))
+
+    def issue_many(self, kind, profile_index, first_counter, count):
+        """Returns `count` consecutive IDs of `kind` for one profile, scrambled in a single vectorized pass."""
+        if count <= 0:
+            return []
+        self._slot(kind, profile_index, first_counter + count - 1) # Range check on the last slot
+        slots = np.arange(first_counter, first_counter + count, dtype=np.uint64) * np.uint64(self.max_profiles) + np.uint64(profile_index)
+        formatter = _FORMATTERS[kind]
+        return [formatter(int(v)) for v in self._permutations[kind].permute_many(slots)]
+
+
+_SERVICES = {}
+
+def get_id_service(seed=None):
+    """Returns the process-wide IdService for `seed` (defaults to config.RANDOM_SEED)."""
+    if seed is None:
+        seed = config.RANDOM_SEED
+    service = _SERVICES.get(seed)
+    if service is None:
+        service = _SERVICES[seed] = IdService(seed)
+    return service
+
+
+class ProfileIds:
+    """Per-profile ID counters. Pickles as (seed, profile index, counters)."""
+
+    __slots__ = ("profile_index", "counters", "_service")
+
+    def __init__(self, profile_index, seed=None, counters=None):
+        self.profile_index = profile_index
+        self.counters = dict(counters or {})
+        self._service = get_id_service(seed)
+
+    def next_id(self, kind):
+        counter = self.counters.get(kind, 0)
+        self.counters[kind] = counter + 1
+        return self._service.issue(kind, self.profile_index, counter)
+
+    def bulk(self, kind, count):
+        """Issues `count` IDs of `kind` at once."""
+        first = self.counters.get(kind, 0)
+        self.counters[kind] = first + count
+        return self._service.issue_many(kind, self.profile_index, first, count)
+
+    def product_id(self):
+        return self.next_id("product")
+
+    def order_id(self):
+        return self.next_id("order")
+
+    def session_id(self):
+        return self.next_id("session")
+
+    def review_id(self):
+        return self.next_id("review")
+
+    def question_id(self):
+        return self.next_id("question")
+
+    def coupon_code(self):
+        return self.next_id("coupon")
+
+    def __getstate__(self):
+        return self._service.seed, self.profile_index, self.counters
+
+    def __setstate__(self, pickled):
+        seed, self.profile_index, self.counters = pickled
+        self._service = get_id_service(seed)
+
+
+if __name__ == '__main__':
+    # Example usage/test
+    ids = ProfileIds(1)
+    print(f"Product ID: {ids.product_id()}")
+    print(f"Order ID: {ids.order_id()}")
+    print(f"Session ID: {ids.session_id()}")
+    print(f"Review ID: {ids.review_id()}")
+    print(f"Question ID: {ids.question_id()}")
+    print(f"Coupon Code: {ids.coupon_code()}")
+    print(f"Bulk Product IDs: {ids.bulk('product', 3)}")
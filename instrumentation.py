@@ -0,0 +1,262 @@
+# instrumentation.py - Optional Per-Stage / Per-Event-Type Timing, Counts and Hooks
+
+import json
+import time
+import logging
+import functools
+
+# Import necessary components from other modules
+try:
+    import utils
+    import event_store
+    import event_generator
+    import simulation
+except ImportError as e:
+    logging.error(f"Error importing modules in instrumentation.py: {e}. Ensure utils.py, event_store.py, event_generator.py, and simulation.py exist.")
+    raise
+
+# Instrumentation works by swapping timing wrappers in for the instrumented
+# functions (module attributes looked up at call time) while enabled, and
+# putting the originals back when disabled. Disabled, the simulator runs the
+# original functions: there is no flag check or extra call on any hot path.
+
+_HISTOGRAM_BUCKETS = 64 # Bucket b holds durations of 2**(b-1) .. 2**b - 1 ns
+
+
+class Hook:
+    """
+    Base class for instrumentation hooks; override the callbacks you need.
+
+    on_event: called after each generated event.
+    on_profile_done: called after a profile is finalized.
+    """
+
+    def on_event(self, profile, event_type, timestamp, details):
+        pass
+
+    def on_profile_done(self, profile):
+        pass
+
+
+class Instrumentation:
+    """
+    Call counts, cumulative nanoseconds and log2 duration histograms per name.
+
+    Names are "stage.<stage>" (parts of simulate_activity) and
+    "event.<event_type>" (generate_event_details per event type). Reports are
+    plain dicts that add up across worker processes (see merge_reports).
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total_ns = {}
+        self.histograms = {}
+        self.hooks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def record(self, name, ns):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.total_ns[name] = self.total_ns.get(name, 0) + ns
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = [0] * _HISTOGRAM_BUCKETS
+        histogram[min(ns.bit_length(), _HISTOGRAM_BUCKETS - 1)] += 1
+
+    def report(self):
+        """Returns the collected numbers as a JSON-serializable dict."""
+        return {
+            name: {"count": self.counts[name], "total_ns": self.total_ns[name], "histogram_log2_ns": list(self.histograms[name])}
+            for name in sorted(self.counts)
+        }
+
+
+def merge_reports(reports):
+    """
+    Adds up reports from several processes (or runs) into one.
+
+    Args:
+        reports (iterable): Dicts returned by Instrumentation.report().
+
+    Returns:
+        dict: The combined report.
+    """
+    merged = {}
+    for report in reports:
+        for name, entry in report.items():
+            target = merged.setdefault(name, {"count": 0, "total_ns": 0, "histogram_log2_ns": [0] * _HISTOGRAM_BUCKETS})
+            target["count"] += entry["count"]
+            target["total_ns"] += entry["total_ns"]
+            target["histogram_log2_ns"] = [a + b for a, b in zip(target["histogram_log2_ns"], entry["histogram_log2_ns"])]
+    return merged
+
+
+def _histogram_percentile(histogram, q):
+    """Upper bound (ns) of the bucket holding the q-th percentile."""
+    total = sum(histogram)
+    if not total:
+        return 0
+    threshold = q / 100.0 * total
+    running = 0
+    for bucket, count in enumerate(histogram):
+        running += count
+        if running >= threshold:
+            return (1 << bucket) - 1 if bucket else 0
+    return (1 << (len(histogram) - 1)) - 1
+
+
+def format_report(report, limit=None):
+    """Formats a report as a table sorted by total time (largest first)."""
+    rows = sorted(report.items(), key=lambda item: item[1]["total_ns"], reverse=True)
+    if limit:
+        rows = rows[:limit]
+    lines = [f"{'name':<40} {'count':>10} {'total ms':>12} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}"]
+    for name, entry in rows:
+        mean_us = entry["total_ns"] / entry["count"] / 1000.0 if entry["count"] else 0.0
+        lines.append(f"{name:<40} {entry['count']:>10} {entry['total_ns'] / 1e6:>12.1f} {mean_us:>10.2f} "
+                     f"{_histogram_percentile(entry['histogram_log2_ns'], 50) / 1000.0:>10.2f} "
+                     f"{_histogram_percentile(entry['histogram_log2_ns'], 99) / 1000.0:>10.2f}")
+    return "\n".join(lines)
+
+
+# --- Enabling / Disabling ---
+
+_active = None
+_originals = []
+
+
+def _patch(owner, attribute, wrapper_factory):
+    original = getattr(owner, attribute)
+    _originals.append((owner, attribute, original))
+    setattr(owner, attribute, functools.wraps(original)(wrapper_factory(original)))
+
+
+def _timed(name, instrumentation):
+    """Wrapper factory: times every call under `name`."""
+    clock = time.perf_counter_ns
+    record = instrumentation.record
+    def factory(original):
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(name, clock() - start)
+        return wrapper
+    return factory
+
+
+def _timed_event_details(instrumentation):
+    clock = time.perf_counter_ns
+    record = instrumentation.record
+    hooks = instrumentation.hooks
+    def factory(original):
+        def wrapper(event_type, profile, current_timestamp):
+            start = clock()
+            details = original(event_type, profile, current_timestamp)
+            elapsed = clock() - start
+            record("stage.event_details", elapsed)
+            record(f"event.{event_type}", elapsed)
+            if details and hooks:
+                for hook in hooks:
+                    hook.on_event(profile, event_type, current_timestamp, details)
+            return details
+        return wrapper
+    return factory
+
+
+def _timed_finalize(instrumentation):
+    clock = time.perf_counter_ns
+    record = instrumentation.record
+    hooks = instrumentation.hooks
+    def factory(original):
+        def wrapper(profile):
+            start = clock()
+            result = original(profile)
+            record("stage.finalize", clock() - start)
+            for hook in hooks:
+                hook.on_profile_done(result)
+            return result
+        return wrapper
+    return factory
+
+
+def enable(instrumentation=None):
+    """
+    Starts collecting: installs timing wrappers around the simulation stages.
+
+    Args:
+        instrumentation (Instrumentation, optional): Collector to fill (e.g. with hooks
+            already added). Defaults to a new one.
+
+    Returns:
+        Instrumentation: The active collector.
+    """
+    global _active
+    if _active is not None:
+        return _active
+    _active = instrumentation or Instrumentation()
+    _patch(simulation, "simulate_activity", _timed("stage.simulate_activity", _active))
+    _patch(utils, "calculate_event_time_delta", _timed("stage.time_delta", _active))
+    _patch(simulation, "check_for_minor_life_event", _timed("stage.minor_life_event_check", _active))
+    _patch(simulation, "apply_minor_life_event", _timed("stage.minor_life_event_apply", _active))
+    _patch(simulation, "determine_next_event_type", _timed("stage.choose_event", _active))
+    _patch(event_generator, "generate_event_details", _timed_event_details(_active))
+    _patch(event_store.EventStore, "append", _timed("stage.record_event", _active))
+    _patch(simulation, "finalize_profile", _timed_finalize(_active))
+    return _active
+
+
+def disable():
+    """
+    Restores the original functions.
+
+    Returns:
+        Instrumentation: The collector that was active (None if instrumentation was off).
+    """
+    global _active
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    collector, _active = _active, None
+    return collector
+
+
+def active():
+    """The collector currently filled, or None when instrumentation is off."""
+    return _active
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    # Example usage/test: instrument a few simulated profiles and print the breakdown
+    import sys
+    import datetime
+    import personas
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    num_profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    class EventCounter(Hook):
+        def __init__(self):
+            self.events = 0
+            self.profiles = 0
+        def on_event(self, profile, event_type, timestamp, details):
+            self.events += 1
+        def on_profile_done(self, profile):
+            self.profiles += 1
+
+    collector = enable()
+    counter = collector.add_hook(EventCounter())
+    start_date = datetime.datetime(2020, 1, 1)
+    for index in range(1, num_profiles + 1):
+        simulation.simulate_activity(personas.create_base_profile(index, start_date))
+    disable()
+    print(format_report(collector.report()))
+    print(f"Hooks saw {counter.events} events across {counter.profiles} profiles.")
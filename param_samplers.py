@@ -0,0 +1,312 @@
+# param_samplers.py - Behavioral Parameter Samplers Compiled from config
+
+import abc
+import random
+import logging
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import profile_state
+except ImportError as e:
+    logging.error(f"Error importing modules in param_samplers.py: {e}. Ensure config.py and profile_state.py exist.")
+    raise
+
+
+# --- Samplers ---
+# Scalar draws use the global np.random / random state in the same order as the
+# original per-profile sampling; vector draws take an explicit np.random.Generator.
+
+class ParamSampler(abc.ABC):
+    """Base sampler: a validated distribution plus fixed clamp bounds for one parameter."""
+
+    __slots__ = ("name", "low", "high", "is_int")
+
+    def __init__(self, name, low, high, is_int):
+        self.name = name
+        self.low = -np.inf if low is None else low
+        self.high = np.inf if high is None else high
+        self.is_int = is_int
+
+    def clamp(self, value):
+        return max(self.low, min(self.high, value))
+
+    @abc.abstractmethod
+    def draw(self):
+        """Draws one value."""
+
+    @abc.abstractmethod
+    def draw_many(self, n, rng):
+        """Draws `n` values as a float array."""
+
+
+class BetaSampler(ParamSampler):
+    """Beta(alpha, beta) scaled onto the range (already within bounds, so never clamped)."""
+
+    __slots__ = ("alpha", "beta")
+
+    def __init__(self, name, low, high, is_int, alpha, beta):
+        super().__init__(name, low, high, is_int)
+        self.alpha, self.beta = alpha, beta
+
+    def draw(self):
+        return self.low + (self.high - self.low) * np.random.beta(self.alpha, self.beta)
+
+    def draw_many(self, n, rng):
+        return self.low + (self.high - self.low) * rng.beta(self.alpha, self.beta, n)
+
+
+class NormalSampler(ParamSampler):
+    __slots__ = ("mean", "std_dev")
+
+    def __init__(self, name, low, high, is_int, mean, std_dev):
+        super().__init__(name, low, high, is_int)
+        self.mean, self.std_dev = mean, std_dev
+
+    def draw(self):
+        return self.clamp(np.random.normal(self.mean, self.std_dev))
+
+    def draw_many(self, n, rng):
+        return np.clip(rng.normal(self.mean, self.std_dev, n), self.low, self.high)
+
+
+class ExponentialSampler(ParamSampler):
+    __slots__ = ("scale",)
+
+    def __init__(self, name, low, high, is_int, scale):
+        super().__init__(name, low, high, is_int)
+        self.scale = scale
+
+    def draw(self):
+        return self.clamp(np.random.exponential(self.scale))
+
+    def draw_many(self, n, rng):
+        return np.clip(rng.exponential(self.scale, n), self.low, self.high)
+
+
+class ParetoSampler(ParamSampler):
+    """Pareto shifted by +1 so the minimum value is 1."""
+
+    __slots__ = ("shape",)
+
+    def __init__(self, name, low, high, is_int, shape):
+        super().__init__(name, low, high, is_int)
+        self.shape = shape
+
+    def draw(self):
+        return self.clamp(np.random.pareto(self.shape) + 1)
+
+    def draw_many(self, n, rng):
+        return np.clip(rng.pareto(self.shape, n) + 1, self.low, self.high)
+
+
+class ZipfSampler(ParamSampler):
+    __slots__ = ("exponent",)
+
+    def __init__(self, name, low, high, is_int, exponent):
+        super().__init__(name, low, high, is_int)
+        self.exponent = exponent
+
+    def draw(self):
+        return self.clamp(np.random.zipf(self.exponent, 1)[0])
+
+    def draw_many(self, n, rng):
+        return np.clip(rng.zipf(self.exponent, n).astype(float), self.low, self.high)
+
+
+class PoissonSampler(ParamSampler):
+    """Poisson(lam) clamped to the integer range."""
+
+    __slots__ = ("lam",)
+
+    def __init__(self, name, low, high, is_int, lam):
+        super().__init__(name, None if low is None else int(low), None if high is None else int(high), is_int)
+        self.lam = lam
+
+    def draw(self):
+        return self.clamp(np.random.poisson(self.lam))
+
+    def draw_many(self, n, rng):
+        return np.clip(rng.poisson(self.lam, n).astype(float), self.low, self.high)
+
+
+class HourlySampler(ParamSampler):
+    """'custom_daily': picks a time-of-day period by weight, then an hour within it (SHOPPING_PATTERNS)."""
+
+    __slots__ = ("periods", "weights", "hours", "_probabilities")
+
+    def __init__(self, name, low, high, is_int, hourly_distribution):
+        super().__init__(name, low, high, is_int)
+        self.periods = list(hourly_distribution)
+        self.weights = [p['weight'] for p in hourly_distribution.values()]
+        self.hours = [list(p['hours']) for p in hourly_distribution.values()]
+        self._probabilities = np.asarray(self.weights, dtype=float) / sum(self.weights)
+
+    def draw(self):
+        chosen = random.choices(range(len(self.periods)), weights=self.weights, k=1)[0]
+        return random.choice(self.hours[chosen])
+
+    def draw_many(self, n, rng):
+        periods = rng.choice(len(self.periods), n, p=self._probabilities)
+        values = np.empty(n)
+        for i, hours in enumerate(self.hours):
+            mask = periods == i
+            values[mask] = rng.choice(np.asarray(hours), int(mask.sum()))
+        return values
+
+
+# distribution name -> (sampler class, 'params' keys in constructor order, defaults for optional keys)
+_SAMPLER_TYPES = {
+    "beta": (BetaSampler, ("alpha", "beta"), {}),
+    "normal": (NormalSampler, ("mean", "std_dev"), {}),
+    "exponential": (ExponentialSampler, ("scale",), {}),
+    "pareto": (ParetoSampler, ("shape",), {}),
+    "zipf": (ZipfSampler, ("exponent",), {}),
+    "poisson": (PoissonSampler, ("lam",), {"lam": 1.0}),
+}
+
+
+def compile_sampler(name, param_config):
+    """
+    Builds the sampler for one BEHAVIORAL_PARAMS_CONFIG entry.
+
+    Raises:
+        ValueError: For unknown distributions, missing or invalid distribution
+            params, or a missing/inverted range.
+    """
+    dist_type = param_config.get("distribution")
+    dist_params = param_config.get("params", {})
+    param_range = param_config.get("range")
+    is_int = param_config.get("type", "float") == "int"
+    if param_range is not None and (len(param_range) != 2 or param_range[0] > param_range[1]):
+        raise ValueError(f"'{name}': invalid range {param_range!r}")
+    low, high = param_range if param_range else (None, None)
+
+    if dist_type == "custom_daily":
+        hourly_dist = config.SHOPPING_PATTERNS.get('hourly_distribution', {})
+        if not hourly_dist or sum(p.get('weight', 0) for p in hourly_dist.values()) <= 0:
+            raise ValueError(f"'{name}': 'custom_daily' needs SHOPPING_PATTERNS['hourly_distribution'] with positive weights")
+        return HourlySampler(name, low, high, is_int, hourly_dist)
+    if dist_type not in _SAMPLER_TYPES:
+        raise ValueError(f"'{name}': unknown distribution '{dist_type}' (expected one of {sorted(_SAMPLER_TYPES) + ['custom_daily']})")
+    sampler_cls, keys, defaults = _SAMPLER_TYPES[dist_type]
+    missing = [key for key in keys if key not in dist_params and key not in defaults]
+    if missing:
+        raise ValueError(f"'{name}': distribution '{dist_type}' is missing params {missing}")
+    if dist_type == "beta" and param_range is None:
+        raise ValueError(f"'{name}': beta sampling needs a 'range' to scale onto")
+    args = [dist_params.get(key, defaults.get(key)) for key in keys]
+    if any(not isinstance(a, (int, float)) or (key != "mean" and a <= 0) for key, a in zip(keys, args)):
+        raise ValueError(f"'{name}': distribution params must be positive numbers, got {dict(zip(keys, args))}")
+    return sampler_cls(name, low, high, is_int, *args)
+
+
+class CompiledParams:
+    """
+    All behavioral parameter samplers in profile_state.PARAM_NAMES order, plus the
+    life-stage adjustments pre-resolved into (stage, parameter) offset and mask tables.
+    """
+
+    def __init__(self, params_config, life_stages):
+        errors = []
+        samplers = []
+        for name in profile_state.PARAM_NAMES:
+            try:
+                samplers.append(compile_sampler(name, params_config[name]))
+            except ValueError as e:
+                errors.append(str(e))
+        self.samplers = tuple(samplers)
+        self.low = np.array([s.low for s in samplers], dtype=float) if not errors else None
+        self.high = np.array([s.high for s in samplers], dtype=float) if not errors else None
+        self.int_indices = [j for j, s in enumerate(samplers) if s.is_int]
+
+        self.stage_offsets = np.zeros((len(life_stages), len(profile_state.PARAM_NAMES)))
+        self.stage_mask = np.zeros(self.stage_offsets.shape, dtype=bool)
+        self.stage_adjustments = [] # Per stage: [(param index, offset), ...] for the scalar path
+        for s, life_stage in enumerate(life_stages):
+            adjustments = []
+            for name, offset in life_stage.get("param_adjustments", {}).items():
+                j = profile_state.PARAM_INDEX.get(name)
+                if j is None:
+                    errors.append(f"life stage '{life_stage.get('name')}': adjusts unknown parameter '{name}'")
+                    continue
+                self.stage_offsets[s, j] = offset
+                self.stage_mask[s, j] = True
+                adjustments.append((j, offset))
+            self.stage_adjustments.append(adjustments)
+        if errors:
+            raise ValueError("Invalid behavioral parameter config:\n  " + "\n  ".join(errors))
+
+    def draw(self, stage_index):
+        """
+        Draws one profile's parameters for a life stage (index into config.LIFE_STAGES).
+
+        Returns:
+            list: Parameter values in PARAM_NAMES order.
+        """
+        values = [sampler.draw() for sampler in self.samplers]
+        for j, offset in self.stage_adjustments[stage_index]:
+            values[j] = self.samplers[j].clamp(values[j] + offset)
+        for j in self.int_indices:
+            values[j] = int(round(values[j]))
+        return values
+
+    def draw_many(self, stage_indices, rng):
+        """
+        Draws a (profiles, parameters) matrix, one column vector per sampler.
+
+        Args:
+            stage_indices (np.ndarray): Index into config.LIFE_STAGES for each profile.
+            rng (np.random.Generator): Source of randomness.
+        """
+        n = len(stage_indices)
+        params = np.empty((n, len(self.samplers)), order="F") # Column-major while filling columns
+        for j, sampler in enumerate(self.samplers):
+            params[:, j] = sampler.draw_many(n, rng)
+        for j in np.flatnonzero(self.stage_mask.any(axis=0)):
+            adjusted = self.stage_mask[stage_indices, j]
+            shifted = np.clip(params[:, j] + self.stage_offsets[stage_indices, j], self.low[j], self.high[j])
+            params[:, j] = np.where(adjusted, shifted, params[:, j])
+        for j in self.int_indices:
+            params[:, j] = np.rint(params[:, j])
+        return params
+
+
+def compile_event_adjustments(event_types):
+    """
+    Pre-resolves the 'param_adjust' effects of life events to (name, index, delta, low, high) tuples.
+
+    Parameters that do not exist in BEHAVIORAL_PARAMS_CONFIG have no effect; they
+    are reported once here instead of on every occurrence.
+
+    Returns:
+        dict: Event name -> tuple of adjustments.
+    """
+    compiled, unknown = {}, set()
+    for event in event_types:
+        adjustments = []
+        for name, delta in event.get("effect", {}).get("param_adjust", {}).items():
+            j = profile_state.PARAM_INDEX.get(name)
+            if j is None:
+                unknown.add(name)
+                continue
+            sampler = BEHAVIORAL_PARAMS.samplers[j]
+            adjustments.append((name, j, delta, sampler.low, sampler.high))
+        compiled[event["name"]] = tuple(adjustments)
+    if unknown:
+        logging.warning("Life events adjust parameters missing from BEHAVIORAL_PARAMS_CONFIG (ignored): %s", sorted(unknown))
+    return compiled
+
+
+# Compiled at import so config mistakes fail at startup rather than per profile
+BEHAVIORAL_PARAMS = CompiledParams(config.BEHAVIORAL_PARAMS_CONFIG, config.LIFE_STAGES)
+MINOR_EVENT_ADJUSTMENTS = compile_event_adjustments(config.MINOR_LIFE_EVENT_TYPES)
+
+
+if __name__ == '__main__':
+    # Example usage/test
+    for sampler in BEHAVIORAL_PARAMS.samplers[:5]:
+        print(f"{sampler.name}: {type(sampler).__name__} [{sampler.low}, {sampler.high}] -> {sampler.draw():.3f}")
+    matrix = BEHAVIORAL_PARAMS.draw_many(np.zeros(5, dtype=int), np.random.default_rng(0))
+    print(f"Vector draw for 5 '{config.LIFE_STAGES[0]['name']}' profiles: shape {matrix.shape}")
@@ -2,94 +2,115 @@
 import random
 import datetime
 import logging
-import numpy as np # Added for poisson distribution
 
 # Import necessary components from other modules
 try:
     import config
     import utils
+    import profile_state
+    import event_store
+    import id_service
+    import param_samplers
 except ImportError as e:
-    logging.error(f"Error importing modules in personas.py: {e}. Ensure config.py and utils.py exist.")
+    logging.error(f"Error importing modules in personas.py: {e}. Ensure config.py, utils.py, profile_state.py, event_store.py, id_service.py, and param_samplers.py exist.")
     raise
 
-def _sample_parameter(param_config, life_stage_adjustments=None, param_name=None):
-    """Samples a value for a behavioral parameter based on its config and life stage adjustments."""
-    value = None
-    param_type = param_config.get("type", "float") # Default to float
-    dist_type = param_config.get("distribution")
-    dist_params = param_config.get("params", {})
-    base_range = param_config.get("range") # Still needed for clamping and some distributions
-    min_val, max_val = base_range if base_range else (None, None)
-
-    try:
-        if dist_type == "beta":
-            value = utils.sample_beta(dist_params['alpha'], dist_params['beta'], min_val, max_val)
-        elif dist_type == "normal":
-            value = utils.sample_normal(dist_params['mean'], dist_params['std_dev'], min_val, max_val)
-        elif dist_type == "exponential":
-            value = utils.sample_exponential(dist_params['scale'], min_val, max_val)
-        elif dist_type == "pareto":
-            value = utils.sample_pareto(dist_params['shape'], min_val, max_val)
-        elif dist_type == "zipf":
-            value = utils.sample_zipf(dist_params['exponent'], min_val=min_val, max_val=max_val)
-        elif dist_type == "poisson": # Poisson needs integer range
-            lam = dist_params.get('lam', 1.0)
-            value = np.random.poisson(lam)
-            if min_val is not None: value = max(int(min_val), value)
-            if max_val is not None: value = min(int(max_val), value)
-        elif dist_type == "custom_daily": # Special case for time_of_day_preference
-            # Logic to sample based on SHOPPING_PATTERNS['hourly_distribution']
-            hourly_dist = config.SHOPPING_PATTERNS.get('hourly_distribution', {})
-            if not hourly_dist:
-                 logging.warning(f"Hourly distribution not found in config for 'custom_daily' sampling of '{param_name}'. Falling back.")
-                 value = random.randint(0, 23) # Fallback to random hour
-            else:
-                periods = list(hourly_dist.keys())
-                weights = [p['weight'] for p in hourly_dist.values()]
-                if not periods or not weights or len(periods) != len(weights) or sum(weights) <= 0:
-                     logging.warning(f"Invalid hourly distribution weights/periods for 'custom_daily' sampling of '{param_name}'. Falling back.")
-                     value = random.randint(0, 23) # Fallback
-                else:
-                    chosen_period = random.choices(periods, weights=weights, k=1)[0]
-                    value = random.choice(hourly_dist[chosen_period]['hours'])
-        elif base_range: # Fallback to uniform if distribution unknown but range exists
-            logging.warning(f"Unknown distribution '{dist_type}' for '{param_name}'. Falling back to uniform sampling.")
-            if param_type == "int": value = random.randint(min_val, max_val)
-            else: value = random.uniform(min_val, max_val) # Default to float
-        else:
-            logging.error(f"Cannot sample parameter '{param_name}': Missing 'range' and unsupported/missing distribution '{dist_type}'.")
-            return param_config.get("default") # Return default if specified, else None
-
-        # Apply life stage adjustments AFTER initial sampling
-        if life_stage_adjustments and param_name in life_stage_adjustments:
-            adjustment = life_stage_adjustments[param_name]
-            value += adjustment
-            # Clamp value back into the original range after adjustment
-            if min_val is not None and max_val is not None:
-                value = max(min_val, min(max_val, value))
-
-        # Ensure correct type (especially after adjustments)
-        if param_type == "int":
-            # Check if value is None before rounding
-            if value is not None:
-                 value = int(round(value))
-            else:
-                 # Handle case where value is None after adjustment/clamping?
-                 # Maybe return default or log error? For now, keep as None.
-                 logging.warning(f"Value became None for int parameter '{param_name}' after adjustments. Check logic.")
-
-
-    except KeyError as e:
-        logging.error(f"Missing required parameter '{e}' in config for distribution '{dist_type}' of parameter '{param_name}'.")
-        return param_config.get("default")
-    except Exception as e:
-        logging.error(f"Error sampling parameter '{param_name}' with distribution '{dist_type}': {e}", exc_info=True)
-        return param_config.get("default")
+# Life stage selection by the 'weight' key in LIFE_STAGES (shared with population.py's batch draws)
+if sum(ls.get('weight', 1) for ls in config.LIFE_STAGES) <= 0: # Avoid error if all weights are zero
+    logging.warning("Sum of LIFE_STAGES weights is zero. Falling back to equal weighting.")
+LIFE_STAGE_SAMPLER = utils.WeightedSampler(range(len(config.LIFE_STAGES)), [ls.get('weight', 1) for ls in config.LIFE_STAGES]) # Default weight 1 if missing
+
+def profile_common_fields(simulation_start_date):
+    """Profile fields shared by every profile of a run (computed once per batch)."""
+    return {
+        "generation_timestamp": utils.format_iso_timestamp(datetime.datetime.now()),
+        "simulation_period_start": utils.format_iso_timestamp(simulation_start_date),
+        "simulation_period_end": utils.format_iso_timestamp(simulation_start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)),
+        "seasonal_boost": utils.get_seasonal_boost_from_config(simulation_start_date),
+    }
+
+
+def assemble_profile(profile_index, simulation_start_date, life_stage_data, behavioral_params, *,
+                     age_at_sim_end, birth_year, location_type, household_composition, income_bracket,
+                     account_creation_date, is_prime, prime_start_date, used_services, interests, devices,
+                     primary_device_info, login_freq, time_since_last_minor_event, common=None, id_seed=None):
+    """
+    Builds the profile dictionary and its '_internal_state' from already sampled attributes.
 
-    return value
+    Shared by create_base_profile (scalar draws) and population.create_base_profiles (vectorized draws).
 
+    Args:
+        profile_index (int): The index number for the profile.
+        simulation_start_date (datetime.datetime): The starting date for the simulation period.
+        life_stage_data (dict): The chosen entry of config.LIFE_STAGES.
+        behavioral_params (profile_state.BehavioralParams): The sampled behavioral parameters.
+        common (dict, optional): Output of profile_common_fields; computed here if omitted.
+        id_seed (int, optional): Seed keying the profile's entity IDs. Defaults to config.RANDOM_SEED.
+        (remaining keyword arguments are the sampled demographic, status and device attributes)
 
-def create_base_profile(profile_index, simulation_start_date):
+    Returns:
+        dict: The base customer profile.
+    """
+    if common is None:
+        common = profile_common_fields(simulation_start_date)
+    ids = id_service.ProfileIds(profile_index, seed=id_seed)
+    return {
+        "profile_id": utils.generate_customer_id(profile_index),
+        "generation_timestamp": common["generation_timestamp"],
+        "simulation_period_start": common["simulation_period_start"],
+        "simulation_period_end": common["simulation_period_end"],
+        # --- Demographics & Context (Observable/Inferrable) ---
+        "demographics": {
+            "age_at_simulation_end": age_at_sim_end, # Will be updated
+            "birth_year": birth_year, # For reference
+            "location_type": location_type, # Inferrable from IP/Shipping
+            "household_composition_initial": household_composition, # Potentially inferrable (shipping names, baby registry etc) - Keep for context
+            "estimated_income_bracket_initial": income_bracket, # Potentially inferrable (purchase types, location) - Keep for context
+            "life_stage_initial_context": life_stage_data["name"], # Keep for context, not direct output if sensitive
+        },
+        "amazon_status": {
+            "account_creation_date": utils.format_iso_timestamp(account_creation_date),
+            "is_prime_member_initial": is_prime,
+            "prime_membership_start_date": utils.format_iso_timestamp(prime_start_date),
+            "used_services_initial": sorted(list(used_services)), # Observable through usage
+        },
+        "device_usage": {
+            "primary_device": primary_device_info.get("name", "Unknown Device"), # Inferrable from usage patterns
+            "all_devices": sorted([d.get("name", "Unknown") for d in devices]), # Store only names
+            "login_frequency_initial_estimate": login_freq, # Estimate, actual usage is in log
+        },
+        "interests_initial": sorted(list(interests)), # Inferrable from browsing/purchases
+        # --- Core Behavioral Data ---
+        "activity_log": event_store.EventStore(), # Columnar; materialized to dicts at output
+        "life_events": [], # Minor events over 5 years
+
+        # --- Internal Simulation State (NOT SAVED in final JSON), see profile_state.ProfileState ---
+        "_internal_state": profile_state.ProfileState(
+            current_timestamp=simulation_start_date,
+            current_age=age_at_sim_end - config.SIMULATION_DURATION_YEARS,
+            current_life_stage=life_stage_data, # Used for potential minor adjustments
+            current_household_composition=household_composition,
+            current_income_bracket=income_bracket,
+            current_interests=interests,
+            is_prime=is_prime,
+            prime_start_date=prime_start_date,
+            used_services=used_services,
+            behavioral_params=behavioral_params, # Fixed-index array of the sampled parameters
+            login_frequency=login_freq, # Store initial estimate
+            devices=devices, # Store full device info internally
+            primary_device=primary_device_info, # Store full primary device info internally
+            # Dynamic state (cart, orders, wishlist, histories, etc.) starts empty
+            last_event_timestamp=simulation_start_date,
+            ids=ids, # Per-profile counters for collision-free entity IDs
+            current_session_id=ids.session_id(),
+            session_start_time=simulation_start_date,
+            time_since_last_minor_event=time_since_last_minor_event,
+            seasonal_boost=common["seasonal_boost"],
+        )
+    }
+
+
+def create_base_profile(profile_index, simulation_start_date, id_seed=None):
     """
     Creates the base structure of a customer profile, sampling behavioral
     parameters instead of assigning fixed archetypes.
@@ -97,13 +118,15 @@ def create_base_profile(profile_index, simulation_start_date):
     Args:
         profile_index (int): The index number for the profile being generated.
         simulation_start_date (datetime.datetime): The starting date for the simulation period.
+        id_seed (int, optional): Seed keying the profile's entity IDs. Defaults to config.RANDOM_SEED.
 
     Returns:
         dict: A dictionary representing the base customer profile, including
-              an '_internal_state' with sampled behavioral parameters. Returns None on critical error.
+              an '_internal_state' (profile_state.ProfileState) with sampled behavioral
+              parameters. Returns None on critical error.
     """
     profile_id = utils.generate_customer_id(profile_index)
-    logging.debug(f"Creating base profile {profile_id}")
+    logging.debug("Creating base profile %s", profile_id)
 
     try:
         # 1. Select Life Stage (influences interests & parameter adjustments)
@@ -112,27 +135,11 @@ def create_base_profile(profile_index, simulation_start_date):
              return None
         # Use weighted choice based on 'weight' key added to LIFE_STAGES in config
         life_stages = config.LIFE_STAGES
-        weights = [ls.get('weight', 1) for ls in life_stages] # Default weight 1 if missing
-        if sum(weights) <= 0: # Avoid error if all weights are zero
-             logging.warning("Sum of LIFE_STAGES weights is zero. Falling back to equal weighting.")
-             life_stage_data = random.choice(life_stages)
-        else:
-             life_stage_data = random.choices(life_stages, weights=weights, k=1)[0]
-        life_stage_adjustments = life_stage_data.get("param_adjustments", {})
-
-        # 2. Sample Behavioral Parameters
-        behavioral_params = {}
-        for param_name, param_config in config.BEHAVIORAL_PARAMS_CONFIG.items():
-            behavioral_params[param_name] = _sample_parameter(param_config, life_stage_adjustments, param_name)
-            if behavioral_params[param_name] is None:
-                 # Check if a default is defined in config before erroring out
-                 default_val = param_config.get("default")
-                 if default_val is not None:
-                      logging.warning(f"Failed to sample parameter '{param_name}', using default value: {default_val}")
-                      behavioral_params[param_name] = default_val
-                 else:
-                      logging.error(f"Failed to sample required parameter '{param_name}' for profile {profile_id} and no default provided. Aborting profile creation.")
-                      return None # Abort if a critical parameter can't be sampled and has no default
+        stage_index = LIFE_STAGE_SAMPLER.draw()
+        life_stage_data = life_stages[stage_index]
+
+        # 2. Sample Behavioral Parameters (compiled samplers; life-stage adjustments pre-resolved)
+        behavioral_params = dict(zip(profile_state.PARAM_NAMES, param_samplers.BEHAVIORAL_PARAMS.draw(stage_index)))
 
         # --- MBO Parameter Integration: Modulate existing parameters ---
         # Modulate research_depth by attention_focus
@@ -169,7 +176,7 @@ def create_base_profile(profile_index, simulation_start_date):
              else:
                   # This case implies the person turned 18 *after* the simulation started, which shouldn't happen based on age sampling.
                   # However, as a fallback, set creation to the day before sim start.
-                  logging.warning(f"Profile {profile_id}: Calculated earliest creation date {earliest_creation_dt} is after latest {latest_creation_dt}. Setting creation to sim start - 1 day.")
+                  logging.warning("Profile %s: Calculated earliest creation date %s is after latest %s. Setting creation to sim start - 1 day.", profile_id, earliest_creation_dt, latest_creation_dt)
                   account_creation_date = latest_creation_dt
         else:
              account_creation_year = random.randint(min_creation_year, max_creation_year)
@@ -289,22 +296,12 @@ def create_base_profile(profile_index, simulation_start_date):
             if "Desktop" in device_name: weight *= (1.5 - tech_propensity) # Less likely primary for high tech?
             device_weights.append((device_info, max(0.1, weight))) # Store the whole dict with weight
 
-        final_devices = []  # List to store chosen device dicts
-        attempts = 0
-        chosen_device_names = set() # Keep track of names to ensure uniqueness
-        while len(final_devices) < num_devices and attempts < num_devices * 3:
-            chosen_device_info = utils.select_weighted_item(device_weights)
-            if chosen_device_info:
-                 chosen_name = chosen_device_info.get("name")
-                 if chosen_name and chosen_name not in chosen_device_names:
-                      final_devices.append(chosen_device_info)
-                      chosen_device_names.add(chosen_name)
-            attempts += 1
+        # Distinct devices drawn by weight without replacement
+        final_devices = utils.WeightedSampler.from_pairs(device_weights).sample(num_devices)
         if not final_devices: # Ensure at least one device
              final_devices.append(random.choice(config.DEVICE_TYPES))
 
         primary_device_info = random.choice(final_devices)
-        primary_device = primary_device_info.get("name", "Unknown Device")
 
 
         # 7. Determine Initial Login Frequency (Estimate based on activity level)
@@ -318,69 +315,18 @@ def create_base_profile(profile_index, simulation_start_date):
 
 
         # 8. Construct Profile Dictionary (NO Archetype Names)
-        profile = {
-            "profile_id": profile_id,
-            "generation_timestamp": utils.format_iso_timestamp(datetime.datetime.now()),
-            "simulation_period_start": utils.format_iso_timestamp(simulation_start_date),
-            "simulation_period_end": utils.format_iso_timestamp(simulation_start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)),
-            # --- Demographics & Context (Observable/Inferrable) ---
-            "demographics": {
-                "age_at_simulation_end": age_at_sim_end, # Will be updated
-                "birth_year": birth_year, # For reference
-                "location_type": location_type, # Inferrable from IP/Shipping
-                "household_composition_initial": household_composition, # Potentially inferrable (shipping names, baby registry etc) - Keep for context
-                "estimated_income_bracket_initial": income_bracket, # Potentially inferrable (purchase types, location) - Keep for context
-                "life_stage_initial_context": life_stage_data["name"], # Keep for context, not direct output if sensitive
-            },
-            "amazon_status": {
-                "account_creation_date": utils.format_iso_timestamp(account_creation_date),
-                "is_prime_member_initial": is_prime,
-                "prime_membership_start_date": utils.format_iso_timestamp(prime_start_date),
-                "used_services_initial": sorted(list(used_services)), # Observable through usage
-            },
-            "device_usage": {
-                "primary_device": primary_device, # Inferrable from usage patterns
-                "all_devices": sorted([d.get("name", "Unknown") for d in final_devices]), # Store only names
-                "login_frequency_initial_estimate": login_freq, # Estimate, actual usage is in log
-            },
-            "interests_initial": sorted(list(interests)), # Inferrable from browsing/purchases
-            # --- Core Behavioral Data ---
-            "activity_log": [],
-            "life_events": [], # Minor events over 5 years
-
-            # --- Internal Simulation State (NOT SAVED in final JSON) ---
-            "_internal_state": {
-                "current_timestamp": simulation_start_date,
-                "current_age": age_at_sim_end - config.SIMULATION_DURATION_YEARS,
-                "current_life_stage": life_stage_data, # Used for potential minor adjustments
-                "current_household_composition": household_composition,
-                "current_income_bracket": income_bracket,
-                "current_interests": interests,
-                "is_prime": is_prime,
-                "prime_start_date": prime_start_date,
-                "used_services": used_services,
-                "behavioral_params": behavioral_params, # Store the sampled parameters here
-                "login_frequency": login_freq, # Store initial estimate
-                "devices": final_devices, # Store full device info internally
-                "primary_device": primary_device_info, # Store full primary device info internally
-                # Dynamic state
-                "cart": [],
-                "orders": [],
-                "wishlist": set(),
-                "viewed_products": [],
-                "search_history": [],
-                "last_event_timestamp": simulation_start_date,
-                "current_session_id": utils.generate_session_id(),
-                "session_start_time": simulation_start_date,
-                "events_in_session": 0,
-                "time_since_last_minor_event": random.randint(0, 180), # Start with random offset
-                "seasonal_boost": utils.get_seasonal_boost_from_config(simulation_start_date),
-                "active_promotions": {},
-                "customer_service_interactions": 0,
-                "brand_purchase_counts": {}, # Track brand purchases for affinity simulation
-            }
-        }
-        logging.debug(f"Base profile {profile_id} created successfully with behavioral parameters.")
+        profile = assemble_profile(
+            profile_index, simulation_start_date, life_stage_data,
+            profile_state.BehavioralParams.from_dict(behavioral_params),
+            age_at_sim_end=age_at_sim_end, birth_year=birth_year, location_type=location_type,
+            household_composition=household_composition, income_bracket=income_bracket,
+            account_creation_date=account_creation_date, is_prime=is_prime, prime_start_date=prime_start_date,
+            used_services=used_services, interests=interests, devices=final_devices,
+            primary_device_info=primary_device_info, login_freq=login_freq,
+            time_since_last_minor_event=random.randint(0, 180), # Start with random offset
+            id_seed=id_seed,
+        )
+        logging.debug("Base profile %s created successfully with behavioral parameters.", profile_id)
         return profile
 
     except Exception as e:
@@ -404,7 +350,7 @@ if __name__ == '__main__':
              pass
         print(json.dumps(output_profile, indent=2, default=str))
         print("\n--- Sampled Behavioral Parameters (Internal State) ---")
-        print(json.dumps(test_profile['_internal_state']['behavioral_params'], indent=2))
+        print(json.dumps(test_profile['_internal_state'].behavioral_params.to_dict(), indent=2))
     else:
         print("Failed to generate test profile.")
     print("\n--- Persona Test Complete ---")
\ No newline at end of file
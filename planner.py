@@ -0,0 +1,223 @@
+# planner.py - Runtime and Disk Capacity Planning Without Running the Simulation
+
+import os
+import json
+import time
+import datetime
+import tempfile
+import logging
+import argparse
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import event_store
+    import event_stream
+    import profile_state
+    import param_samplers
+    import population
+    import simulation
+    import snapshots
+    import scheduler
+except ImportError as e:
+    logging.error("Error importing modules in planner.py: %s. Ensure config.py, event_store.py, event_stream.py, profile_state.py, param_samplers.py, population.py, simulation.py, snapshots.py, and scheduler.py exist.", e)
+    raise
+
+# Expected events per profile come from the configured distributions alone:
+# E[max(0.05, activity_level)] over the life-stage mixture (beta density
+# integrated numerically) times the seasonal-boost-weighted hours of the window
+# divided by the 72h base gap. A micro-sample of a few short simulations only
+# calibrates the cost side: seconds per event and bytes per event per format.
+
+_ACTIVITY_LEVEL_INDEX = profile_state.param_index("activity_level")
+_QUADRATURE_POINTS = 4000
+_MONTE_CARLO_DRAWS = 200000 # For non-beta activity distributions
+
+
+def _activity_grid():
+    """Points and probability weights approximating the activity_level sampler's distribution."""
+    sampler = param_samplers.BEHAVIORAL_PARAMS.samplers[_ACTIVITY_LEVEL_INDEX]
+    if isinstance(sampler, param_samplers.BetaSampler):
+        u = (np.arange(_QUADRATURE_POINTS) + 0.5) / _QUADRATURE_POINTS
+        log_density = (sampler.alpha - 1) * np.log(u) + (sampler.beta - 1) * np.log1p(-u)
+        weights = np.exp(log_density - log_density.max())
+        return sampler.low + (sampler.high - sampler.low) * u, weights / weights.sum()
+    values = sampler.draw_many(_MONTE_CARLO_DRAWS, np.random.default_rng(0))
+    return values, np.full(len(values), 1.0 / len(values))
+
+
+def expected_activity_factor():
+    """
+    E[max(0.05, activity_level)] over the life-stage mix, including each stage's
+    activity_level adjustment (clamped to the parameter's range).
+
+    Returns:
+        tuple: (mean factor, largest possible factor).
+    """
+    sampler = param_samplers.BEHAVIORAL_PARAMS.samplers[_ACTIVITY_LEVEL_INDEX]
+    values, weights = _activity_grid()
+    stage_weights = np.array([stage.get('weight', 1) for stage in config.LIFE_STAGES], dtype=float)
+    stage_weights /= stage_weights.sum()
+    mean = 0.0
+    for stage_index, stage_weight in enumerate(stage_weights):
+        offset = dict(param_samplers.BEHAVIORAL_PARAMS.stage_adjustments[stage_index]).get(_ACTIVITY_LEVEL_INDEX, 0.0)
+        stage_values = np.clip(values + offset, sampler.low, sampler.high) if offset else values
+        mean += stage_weight * float(np.sum(weights * np.maximum(scheduler.MIN_ACTIVITY, stage_values)))
+    return mean, max(scheduler.MIN_ACTIVITY, sampler.high)
+
+
+def expected_events(days=None, start_date=None):
+    """
+    Analytic expected events per profile for a simulation window.
+
+    Args:
+        days (int, optional): Window length. Defaults to config.SIMULATION_DURATION_DAYS.
+        start_date (datetime.datetime, optional): Window start (seasonal peaks depend on it).
+            Defaults to `days` before now, as in generate_profiles.py.
+
+    Returns:
+        dict: {"mean", "max", "boosted_hours"}.
+    """
+    days = days or config.SIMULATION_DURATION_DAYS
+    start_date = start_date or datetime.datetime.now() - datetime.timedelta(days=days)
+    hours = scheduler.boosted_hours(start_date, start_date + datetime.timedelta(days=days))
+    mean_factor, max_factor = expected_activity_factor()
+    per_factor = hours / scheduler.MEAN_GAP_HOURS
+    return {"mean": mean_factor * per_factor, "max": max_factor * per_factor, "boosted_hours": hours}
+
+
+def calibrate(sample_profiles=None, sample_days=None, seed=None):
+    """
+    Measures cost per event and bytes per event from a short micro-sample
+    (sample_profiles profiles simulated for sample_days days).
+
+    Returns:
+        dict: Per-profile sampling seconds, fitted seconds = fixed + per_event * events,
+            and bytes = fixed + per_event * events for each output format.
+    """
+    sample_profiles = sample_profiles or config.PLANNER_SAMPLE_PROFILES
+    sample_days = sample_days or config.PLANNER_SAMPLE_DAYS
+    seed = config.PLANNER_SEED if seed is None else seed
+    start_date = datetime.datetime(2020, 1, 1)
+    end_date = start_date + datetime.timedelta(days=sample_days)
+
+    sampling_start = time.perf_counter()
+    batch = population.sample_population(0, sample_profiles, start_date, rng=np.random.default_rng(seed))
+    profiles = list(batch)
+    sampling_seconds = (time.perf_counter() - sampling_start) / sample_profiles
+
+    events, seconds, json_bytes, shard_bytes, snapshot_bytes = [], [], [], [], []
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        for n, profile in enumerate(profiles):
+            start = time.perf_counter()
+            simulated = simulation.simulate_activity(profile, end_date=end_date, finalize=False)
+            snapshot_path = snapshots.save_profile(simulated, snapshot_dir, n, end_date)
+            snapshot_bytes.append(os.path.getsize(snapshot_path))
+            finalized = simulation.finalize_profile(simulated)
+            text = json.dumps(finalized, indent=2, ensure_ascii=False, default=event_store.json_default)
+            seconds.append(time.perf_counter() - start)
+            events.append(len(finalized["activity_log"]))
+            json_bytes.append(len(text.encode('utf-8')))
+            shard_bytes.append(sum(len(json.dumps(record, ensure_ascii=False, default=event_store.json_default).encode('utf-8')) + 1
+                                   for record in event_stream.profile_events(finalized)))
+
+    def fit(values):
+        """Least-squares fixed + per_event * events (fixed kept >= 0)."""
+        if len(set(events)) < 2:
+            return {"fixed": 0.0, "per_event": float(sum(values)) / max(1, sum(events))}
+        per_event, fixed = np.polyfit(events, values, 1)
+        if fixed < 0:
+            return {"fixed": 0.0, "per_event": float(sum(values)) / max(1, sum(events))}
+        return {"fixed": float(fixed), "per_event": float(per_event)}
+
+    return {
+        "profiles": sample_profiles,
+        "days": sample_days,
+        "events": int(sum(events)),
+        "sampling_seconds_per_profile": sampling_seconds,
+        "seconds": fit(seconds), # Simulation, finalization and JSON serialization
+        "bytes": {
+            "json": fit(json_bytes), # One indented JSON file per profile
+            "event_shards": fit(shard_bytes), # Time-sorted JSONL shards (EVENT_STREAM_SHARD_DIR)
+            "snapshots": {"fixed": float(np.mean(snapshot_bytes)), "per_event": 0.0}, # SNAPSHOT_DIR, no activity log
+        },
+    }
+
+
+def plan(num_profiles=None, workers=None, days=None, calibration=None):
+    """
+    Projects runtime and disk use of a generation run without running it.
+
+    Runtime = parent-side base profile sampling (serial) + simulation work spread
+    over the workers at config.PLANNER_PARALLEL_EFFICIENCY, but never less than
+    the most active single profile takes.
+
+    Returns:
+        dict: The projection (see format_plan).
+    """
+    num_profiles = num_profiles or config.NUM_PROFILES_TO_GENERATE
+    workers = max(1, workers or 1)
+    days = days or config.SIMULATION_DURATION_DAYS
+    calibration = calibration or calibrate()
+    events = expected_events(days)
+    cost = calibration["seconds"]
+    profile_seconds = cost["fixed"] + cost["per_event"] * events["mean"]
+    longest_profile = cost["fixed"] + cost["per_event"] * events["max"]
+    work_seconds = num_profiles * profile_seconds
+    efficiency = config.PLANNER_PARALLEL_EFFICIENCY if workers > 1 else 1.0
+    serial_seconds = num_profiles * calibration["sampling_seconds_per_profile"]
+    runtime = serial_seconds + max(work_seconds / (workers * efficiency), longest_profile)
+    disk = {fmt: num_profiles * (model["fixed"] + model["per_event"] * events["mean"]) for fmt, model in calibration["bytes"].items()}
+    return {
+        "profiles": num_profiles,
+        "workers": workers,
+        "days": days,
+        "expected_events_per_profile": events["mean"],
+        "max_events_per_profile": events["max"],
+        "expected_events_total": events["mean"] * num_profiles,
+        "seconds_per_event": cost["per_event"],
+        "runtime_seconds": runtime,
+        "cpu_seconds": work_seconds + serial_seconds,
+        "disk_bytes": disk,
+        "calibration": calibration,
+    }
+
+
+def _human_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def format_plan(projection):
+    """Text report of plan()."""
+    runtime = projection["runtime_seconds"]
+    calibration = projection["calibration"]
+    lines = [
+        f"Plan: {projection['profiles']} profiles x {projection['days']} days on {projection['workers']} worker(s)",
+        f"  Expected events: {projection['expected_events_per_profile']:.0f} per profile (most active ~{projection['max_events_per_profile']:.0f}), "
+        f"{projection['expected_events_total']:.3g} total",
+        f"  Cost: {projection['seconds_per_event'] * 1e6:.1f} us/event (calibrated on {calibration['profiles']} profiles x {calibration['days']} days, {calibration['events']} events)",
+        f"  Runtime: ~{runtime:.0f} s ({runtime / 3600.0:.2f} h); {projection['cpu_seconds']:.0f} CPU-seconds",
+        "  Disk:",
+    ]
+    for fmt, size in projection["disk_bytes"].items():
+        lines.append(f"    {fmt:<14} {_human_bytes(size)}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    # Example usage/test:
+    #   python planner.py [--profiles N] [--workers W] [--days D] [--json]
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Estimate runtime and disk use of a generation run without running it.")
+    parser.add_argument("--profiles", type=int, help=f"Profiles to generate (default {config.NUM_PROFILES_TO_GENERATE})")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (see PARALLEL_GENERATION)")
+    parser.add_argument("--days", type=int, help=f"Simulated days (default {config.SIMULATION_DURATION_DAYS})")
+    parser.add_argument("--json", action="store_true", help="Print the projection as JSON")
+    args = parser.parse_args()
+    projection = plan(args.profiles, args.workers, args.days)
+    print(json.dumps(projection, indent=2) if args.json else format_plan(projection))
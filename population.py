@@ -0,0 +1,386 @@
+# population.py - Vectorized Population Synthesis (Batch Base Profiles)
+
+import random
+import datetime
+import logging
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import personas
+    import profile_state
+    import param_samplers
+except ImportError as e:
+    logging.error(f"Error importing modules in population.py: {e}. Ensure config.py, personas.py, profile_state.py, and param_samplers.py exist.")
+    raise
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_DAY_SECONDS = 86400.0
+_PRIME_LAUNCH = datetime.datetime(2005, 2, 1)
+
+# Service name -> order of columns in the service mask (mirrors personas.create_base_profile)
+_SERVICES = (
+    "Prime Membership", "Prime Video", "Prime Music (Bundled)", "Amazon Music Unlimited", "Prime Reading",
+    "Kindle Unlimited", "Audible Membership (Premium Plus/Plus)", "Alexa Skills Usage", "Subscribe & Save",
+    "Amazon Fresh/Whole Foods Delivery", "Amazon Pharmacy", "AWS Usage (Free/Paid)", "Amazon Handmade Buyer",
+    "Amazon Launchpad Buyer", "Amazon Warehouse Deals Shopper", "Amazon Outlet Shopper", "Amazon Photos",
+)
+_KINDLE_INTERESTS = ("Books (Physical)", "Kindle Store", "eBooks")
+_FRESH_LOCATIONS = ("Dense Urban", "Urban", "Suburban")
+# (activity threshold, login frequency options), checked top-down as in create_base_profile
+_LOGIN_FREQUENCIES = (
+    (0.8, ["Multiple times a day"]),
+    (0.6, ["Multiple times a day", "Daily"]),
+    (0.4, ["Daily", "Few times a week"]),
+    (0.2, ["Few times a week", "Weekly", "Bi-Weekly"]),
+    (0.05, ["Weekly", "Bi-Weekly", "Monthly", "Quarterly"]),
+    (-1.0, ["Monthly", "Quarterly", "Rarely (< Quarterly)"]),
+)
+
+
+def sample_behavioral_params(stage_indices, rng):
+    """
+    Samples the behavioral parameter matrix for a batch of profiles.
+
+    Every parameter column is drawn as one vector by the compiled samplers
+    (life-stage offsets applied per row), as create_base_profile does one
+    profile at a time.
+
+    Args:
+        stage_indices (np.ndarray): Index into config.LIFE_STAGES for each profile.
+        rng (np.random.Generator): Source of randomness.
+
+    Returns:
+        np.ndarray: Matrix of shape (len(stage_indices), len(profile_state.PARAM_NAMES)).
+    """
+    params = param_samplers.BEHAVIORAL_PARAMS.draw_many(stage_indices, rng)
+
+    # MBO integration: attention_focus modulates research_depth
+    if "research_depth" in profile_state.PARAM_INDEX and "attention_focus" in profile_state.PARAM_INDEX:
+        rd, af = profile_state.PARAM_INDEX["research_depth"], profile_state.PARAM_INDEX["attention_focus"]
+        min_rd, max_rd = config.BEHAVIORAL_PARAMS_CONFIG['research_depth'].get('range', (0.1, 0.9))
+        params[:, rd] = np.clip(params[:, rd] * (0.6 + params[:, af] * 0.8), min_rd, max_rd)
+    return np.ascontiguousarray(params) # Row-major, so each profile's parameters are one contiguous slice
+
+
+def _to_seconds(dt):
+    return (dt - _EPOCH).total_seconds()
+
+
+def _year_start_seconds(years):
+    return (np.asarray(years) - 1970).astype("datetime64[Y]").astype("datetime64[s]").astype(np.int64).astype(float)
+
+
+def sample_population(start_index, count, simulation_start_date, rng=None, seed=None):
+    """
+    Samples `count` base profiles (indices start_index .. start_index + count - 1) in one pass.
+
+    Life stages, behavioral parameters, demographics, dates, interests, Prime
+    and service usage, devices and login frequency are all drawn as NumPy
+    vectors. The result matches create_base_profile in distribution, not
+    draw for draw.
+
+    Without an explicit `rng`, a seeded draw is keyed by profile index: indices
+    are grouped into aligned blocks of config.POPULATION_SEED_BLOCK, each block
+    is always sampled whole from a generator seeded with (seed, block start), and
+    the requested rows are cut out. Profile i is then the same whatever batch,
+    chunk or single-profile request it is sampled in.
+
+    Args:
+        start_index (int): Index of the first profile.
+        count (int): Number of profiles to create.
+        simulation_start_date (datetime.datetime): The starting date for the simulation period.
+        rng (np.random.Generator, optional): Source of randomness for the whole batch (no
+            per-index keying).
+        seed (int, optional): Seed for index-keyed draws, and the key of the profiles' entity
+            IDs (id_service). Defaults to config.RANDOM_SEED; fresh entropy when both are None.
+
+    Returns:
+        PopulationBatch: The sampled columns; profiles are split out on access.
+    """
+    seed = config.RANDOM_SEED if seed is None else seed
+    if rng is None and seed is not None:
+        return _sample_seeded_blocks(start_index, count, simulation_start_date, seed)
+    return _sample_rows(start_index, count, simulation_start_date, rng or np.random.default_rng(), seed)
+
+
+def seed_profile(seed, index):
+    """
+    Seeds the global `random` / `np.random` generators the simulation draws from for
+    one profile, so its events depend only on (seed, index) and not on which
+    process or loop position simulates it.
+    """
+    random.seed(f"{seed}:{index}")
+    np.random.seed([seed, index])
+
+
+def _sample_seeded_blocks(start_index, count, simulation_start_date, seed):
+    """Index-keyed sampling (see sample_population): whole aligned blocks, trimmed to the requested range."""
+    block = config.POPULATION_SEED_BLOCK
+    stop = start_index + max(count, 0)
+    parts = []
+    for block_start in range(start_index - start_index % block, stop, block):
+        batch = _sample_rows(block_start, block, simulation_start_date, np.random.default_rng([seed, block_start]), seed)
+        parts.append((batch, max(start_index, block_start) - block_start, min(stop, block_start + block) - block_start))
+    if not parts:
+        return _sample_rows(start_index, 0, simulation_start_date, np.random.default_rng([seed, start_index]), seed)
+    return PopulationBatch.concatenate(parts, start_index)
+
+
+def _sample_rows(start_index, count, simulation_start_date, rng, id_seed=None):
+    """Draws every column of `count` base profiles from one generator; `id_seed` keys their entity IDs."""
+    n = count
+    if n <= 0:
+        n = 0
+    life_stages = config.LIFE_STAGES
+    if not life_stages:
+        raise ValueError("LIFE_STAGES list in config is empty. Cannot create profiles.")
+
+    # 1. Life stages
+    stages = personas.LIFE_STAGE_SAMPLER.draw_indices(n, rng)
+
+    # 2. Behavioral parameters
+    params = sample_behavioral_params(stages, rng)
+    def column(name, default):
+        j = profile_state.PARAM_INDEX.get(name)
+        return params[:, j] if j is not None else np.full(n, default)
+    activity = column("activity_level", 0.5)
+    tech = column("tech_adoption_propensity", 0.5)
+    deal = column("deal_seeking_propensity", 0.5)
+    reward = column("reward_sensitivity", 0.5)
+
+    # 3. Demographics
+    ages = np.empty(n, dtype=np.int64)
+    incomes = np.empty(n, dtype=np.int64)
+    for s, life_stage in enumerate(life_stages):
+        rows = np.flatnonzero(stages == s)
+        min_age, max_age = life_stage["age_range"]
+        if min_age > max_age: min_age, max_age = 25, 35 # Fallback
+        ages[rows] = rng.integers(min_age, max_age + 1, len(rows))
+        income_indices = life_stage.get("income_bracket_indices", list(range(len(config.INCOME_BRACKETS))))
+        incomes[rows] = rng.choice(np.asarray(income_indices), len(rows))
+    birth_years = simulation_start_date.year - ages
+    households = rng.integers(0, len(config.HOUSEHOLD_COMPOSITIONS), n)
+    locations = rng.integers(0, len(config.LOCATION_TYPES), n)
+
+    # Account creation dates (as float seconds since 1970)
+    latest = _to_seconds(simulation_start_date) - _DAY_SECONDS
+    min_years = np.maximum(birth_years + 18, 1998)
+    max_year = simulation_start_date.year - 1
+    late = min_years > max_year # Turned 18 after the sim-start year: between 18th birthday and sim start
+    years = np.where(late, min_years, rng.integers(np.minimum(min_years, max_year), max_year + 1))
+    lo = _year_start_seconds(np.where(late, birth_years + 18, years))
+    hi = np.where(late, latest, np.minimum(_year_start_seconds(years + 1) - _DAY_SECONDS, latest))
+    creation = np.where(lo <= hi, lo + rng.random(n) * np.maximum(hi - lo, 0), latest)
+    if late.any() and (lo[late] > hi[late]).any():
+        logging.warning("%d profiles had an earliest creation date after sim start. Setting creation to sim start - 1 day.", int((lo[late] > hi[late]).sum()))
+    creation = np.minimum(creation, latest)
+
+    # 4. Interests: life-stage interests plus a few random extras driven by exploration propensity.
+    # Extras are k-subsets of the categories the stage lacks, drawn with Floyd's algorithm (k <= 9),
+    # and kept as a small (profiles, max k) matrix of label indices padded with -1.
+    interest_labels = list(dict.fromkeys(config.BASE_INTEREST_CATEGORIES + [i for ls in life_stages for i in ls.get("interests", [])]))
+    interest_index = {label: k for k, label in enumerate(interest_labels)}
+    stage_interests = np.zeros((len(life_stages), len(interest_labels)), dtype=bool)
+    num_extra = 1 + np.rint(column('category_exploration_propensity', 0.5) * 8).astype(np.int64)
+    extra_interests = np.full((n, int(num_extra.max(initial=1))), -1, dtype=np.int16)
+    for s, life_stage in enumerate(life_stages):
+        own = life_stage.get("interests", [])
+        stage_interests[s, [interest_index[i] for i in own]] = True
+        rows = np.flatnonzero(stages == s)
+        available = np.array([interest_index[i] for i in config.BASE_INTEREST_CATEGORIES if i not in own], dtype=np.int16)
+        if not len(rows) or not len(available):
+            continue
+        k = np.minimum(num_extra[rows], len(available))
+        chosen = np.full((len(rows), extra_interests.shape[1]), -1, dtype=np.int64)
+        for m in range(int(k.max())):
+            active = m < k
+            j = len(available) - k + m # Floyd: draw from [0, j], take j itself on a repeat
+            t = (rng.random(len(rows)) * (np.maximum(j, 0) + 1)).astype(np.int64)
+            repeat = (chosen[:, :m] == t[:, None]).any(axis=1)
+            chosen[:, m] = np.where(active, np.where(repeat, j, t), -1)
+        extra_interests[rows] = np.where(chosen >= 0, available[np.maximum(chosen, 0)], -1)
+    def interested(*labels):
+        cols = [interest_index[l] for l in labels if l in interest_index]
+        if not cols:
+            return np.zeros(n, dtype=bool)
+        return stage_interests[:, cols].any(axis=1)[stages] | np.isin(extra_interests, cols).any(axis=1)
+
+    # 5. Prime and services
+    prime_prob = np.clip(0.6 + (deal - 0.5) * 0.1 + (activity - 0.5) * 0.2 + (tech - 0.5) * 0.1 + (reward - 0.5) * 0.15, 0.01, 0.99)
+    is_prime = rng.random(n) < prime_prob
+    prime_lo = np.maximum(creation, _to_seconds(_PRIME_LAUNCH))
+    prime_lo = np.where(prime_lo < latest, prime_lo, creation)
+    prime_start = prime_lo + rng.random(n) * np.maximum(latest - prime_lo, 0)
+
+    def u():
+        return rng.random(n)
+    services = np.zeros((n, len(_SERVICES)), dtype=bool)
+    col = {name: k for k, name in enumerate(_SERVICES)}
+    services[:, col["Prime Membership"]] = is_prime
+    services[:, col["Prime Video"]] = is_prime & (u() < column("prime_video_engagement", 0.5))
+    music = (is_prime | (u() < 0.1)) & (u() < column("amazon_music_engagement", 0.3))
+    services[:, col["Prime Music (Bundled)"]] = music
+    services[:, col["Amazon Music Unlimited"]] = music & (u() < 0.3 * tech)
+    kindle_interest = interested(*_KINDLE_INTERESTS)
+    kindle = kindle_interest & (u() < column("kindle_engagement", 0.4))
+    services[:, col["Prime Reading"]] = kindle & is_prime
+    services[:, col["Kindle Unlimited"]] = kindle & (u() < 0.4)
+    audible_interest = interested("Audible Books & Originals") | (kindle_interest & (u() < 0.3))
+    services[:, col["Audible Membership (Premium Plus/Plus)"]] = audible_interest & (u() < column("audible_engagement", 0.2) * (0.8 + reward * 0.4))
+    services[:, col["Alexa Skills Usage"]] = u() < tech * 0.8
+    services[:, col["Subscribe & Save"]] = u() < np.clip(column("subscribe_save_propensity", 0.1) + reward * 0.1, 0, 1)
+    fresh_location = np.isin(locations, [k for k, loc in enumerate(config.LOCATION_TYPES) if loc in _FRESH_LOCATIONS])
+    services[:, col["Amazon Fresh/Whole Foods Delivery"]] = interested("Grocery & Gourmet Food") & fresh_location & (u() < 0.4 * activity)
+    services[:, col["Amazon Pharmacy"]] = interested("Health & Personal Care") & (u() < 0.2 * activity)
+    services[:, col["AWS Usage (Free/Paid)"]] = u() < tech * 0.1
+    services[:, col["Amazon Handmade Buyer"]] = interested("Amazon Handmade") & (u() < 0.3)
+    services[:, col["Amazon Launchpad Buyer"]] = interested("Amazon Launchpad") & (u() < tech * 0.2)
+    services[:, col["Amazon Warehouse Deals Shopper"]] = u() < deal * 0.5
+    services[:, col["Amazon Outlet Shopper"]] = u() < deal * 0.4
+    services[:, col["Amazon Photos"]] = u() < tech * 0.6
+
+    # 6. Devices: weighted sampling without replacement via the Gumbel top-k trick
+    device_names = [d.get("name", "Unknown Device") for d in config.DEVICE_TYPES]
+    weights = np.ones((n, len(device_names)))
+    for k, name in enumerate(device_names):
+        if any(t in name for t in ["Mobile", "Tablet", "App"]): weights[:, k] *= 0.5 + tech
+        if any(t in name for t in ["Echo", "Fire TV", "Smart Watch", "Smart Home"]): weights[:, k] *= 0.2 + tech * 1.5
+        if "Desktop" in name: weights[:, k] *= 1.5 - tech
+    keys = np.log(np.maximum(weights, 0.1)) + rng.gumbel(size=weights.shape)
+    device_order = np.argsort(-keys, axis=1)
+    num_devices = np.clip(np.trunc(rng.normal(1.5 + tech * 3, 1.0)).astype(np.int64), 1, len(device_names))
+    primary_pos = (rng.random(n) * num_devices).astype(np.int64)
+    primary = device_order[np.arange(n), primary_pos]
+
+    # 7. Login frequency from activity level buckets
+    login_freqs = np.empty(n, dtype=object)
+    assigned = np.zeros(n, dtype=bool)
+    for threshold, options in _LOGIN_FREQUENCIES:
+        rows = ~assigned & (activity > threshold)
+        login_freqs[rows] = np.asarray(options, dtype=object)[rng.integers(0, len(options), int(rows.sum()))]
+        assigned |= rows
+    minor_event_offsets = rng.integers(0, 181, n)
+
+    return PopulationBatch(
+        start_index, simulation_start_date, id_seed=id_seed, stages=stages, params=params, ages=ages, birth_years=birth_years,
+        incomes=incomes, households=households, locations=locations, creation=creation, is_prime=is_prime,
+        prime_start=prime_start, stage_interests=stage_interests, extra_interests=extra_interests,
+        interest_labels=interest_labels, services=services,
+        device_order=device_order, num_devices=num_devices, primary=primary, login_freqs=login_freqs,
+        minor_event_offsets=minor_event_offsets,
+    )
+
+
+class PopulationBatch:
+    """
+    Column store of a sampled population. Indexing or iterating splits rows out into
+    base profile dicts (with their ProfileState), so a large population costs only
+    its arrays until each profile is actually simulated.
+    """
+
+    # Per-profile columns (first axis = row); the rest are shared lookup tables
+    ROW_COLUMNS = (
+        "stages", "params", "ages", "birth_years", "incomes", "households", "locations", "creation", "is_prime",
+        "prime_start", "extra_interests", "services", "device_order", "num_devices", "primary", "login_freqs",
+        "minor_event_offsets",
+    )
+
+    id_seed = None # Seed of the id_service permutations (None: config.RANDOM_SEED)
+
+    def __init__(self, start_index, simulation_start_date, id_seed=None, **columns):
+        self.start_index = start_index
+        self.simulation_start_date = simulation_start_date
+        self.id_seed = id_seed
+        self.common = personas.profile_common_fields(simulation_start_date)
+        self.__dict__.update(columns)
+
+    @classmethod
+    def concatenate(cls, parts, start_index):
+        """
+        Joins row ranges of several batches (sampled for the same start date) into one.
+
+        Args:
+            parts (list): (PopulationBatch, first row, end row) tuples, in index order.
+            start_index (int): Profile index of the first joined row.
+        """
+        first = parts[0][0]
+        width = max(batch.extra_interests.shape[1] for batch, _, _ in parts)
+        columns = {"stage_interests": first.stage_interests, "interest_labels": first.interest_labels}
+        for name in cls.ROW_COLUMNS:
+            pieces = [getattr(batch, name)[lo:hi] for batch, lo, hi in parts]
+            if name == "extra_interests": # Padded with -1 to the widest batch
+                pieces = [np.pad(p, ((0, 0), (0, width - p.shape[1])), constant_values=-1) for p in pieces]
+            columns[name] = np.concatenate(pieces)
+        joined = cls(start_index, first.simulation_start_date, id_seed=first.id_seed, **columns)
+        joined.common = first.common
+        return joined
+
+    def row(self, i):
+        """One-row batch holding row `i`; it pickles as arrays, so the profile can be split out where it is simulated."""
+        return PopulationBatch.concatenate([(self, i, i + 1)], self.start_index + i)
+
+    def __len__(self):
+        return len(self.stages)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.profile(i)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("profile index out of range")
+        return self.profile(i)
+
+    def profile(self, i):
+        """Builds the base profile for row `i` (profile index start_index + i)."""
+        behavioral_params = profile_state.BehavioralParams.__new__(profile_state.BehavioralParams)
+        behavioral_params.__setstate__(self.params[i].tobytes())
+        prime = bool(self.is_prime[i])
+        return personas.assemble_profile(
+            self.start_index + i, self.simulation_start_date, config.LIFE_STAGES[self.stages[i]], behavioral_params,
+            age_at_sim_end=int(self.ages[i]), birth_year=int(self.birth_years[i]),
+            location_type=config.LOCATION_TYPES[self.locations[i]],
+            household_composition=config.HOUSEHOLD_COMPOSITIONS[self.households[i]],
+            income_bracket=config.INCOME_BRACKETS[self.incomes[i]],
+            account_creation_date=_EPOCH + datetime.timedelta(seconds=float(self.creation[i])), is_prime=prime,
+            prime_start_date=_EPOCH + datetime.timedelta(seconds=float(self.prime_start[i])) if prime else None,
+            used_services={_SERVICES[k] for k in np.flatnonzero(self.services[i]).tolist()},
+            interests={self.interest_labels[k] for k in np.flatnonzero(self.stage_interests[self.stages[i]]).tolist()}
+                      | {self.interest_labels[k] for k in self.extra_interests[i].tolist() if k >= 0},
+            devices=[config.DEVICE_TYPES[k] for k in self.device_order[i, :self.num_devices[i]].tolist()],
+            primary_device_info=config.DEVICE_TYPES[self.primary[i]], login_freq=self.login_freqs[i],
+            time_since_last_minor_event=int(self.minor_event_offsets[i]), common=self.common, id_seed=self.id_seed,
+        )
+
+
+def create_base_profiles(start_index, count, simulation_start_date, rng=None):
+    """
+    Creates `count` base profiles in one vectorized pass (see sample_population).
+
+    Args:
+        start_index (int): Index of the first profile.
+        count (int): Number of profiles to create.
+        simulation_start_date (datetime.datetime): The starting date for the simulation period.
+        rng (np.random.Generator, optional): Source of randomness.
+
+    Returns:
+        list: `count` base profile dicts, as returned by personas.create_base_profile.
+    """
+    return list(sample_population(start_index, count, simulation_start_date, rng))
+
+
+if __name__ == '__main__':
+    # Example usage/test
+    import json
+    import time
+    logging.basicConfig(level=logging.INFO)
+    start_date = datetime.datetime(2024, 1, 1)
+    t0 = time.time()
+    population = sample_population(1, 100000, start_date, np.random.default_rng(0))
+    print(f"Sampled {len(population)} base profiles in {time.time() - t0:.2f}s")
+    sample = {k: v for k, v in population[0].items() if k not in ('_internal_state', 'activity_log')}
+    print(json.dumps(sample, indent=2, default=str))
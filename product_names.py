@@ -0,0 +1,159 @@
+# product_names.py - Template-Compiled Product Name Generation
+
+import random
+import bisect
+import itertools
+import functools
+import logging
+
+# Import necessary components from other modules
+try:
+    import config
+    import startup
+except ImportError as e:
+    logging.error(f"Error importing modules in product_names.py: {e}. Ensure config.py and startup.py exist.")
+    raise
+
+np = startup.lazy_import("numpy") # Loaded on first sampling call, not at import
+
+
+class Vocabulary:
+    """Pre-resolved word list for one template slot. Duplicate words merge their weights."""
+
+    __slots__ = ("words", "weights", "cum_weights", "_probabilities")
+
+    def __init__(self, weighted_words):
+        merged = {}
+        for word, weight in weighted_words:
+            merged[word] = merged.get(word, 0.0) + weight
+        self.words = tuple(merged)
+        weights = list(merged.values())
+        self.weights = weights
+        if len(set(weights)) == 1:
+            self.cum_weights = None # Uniform: plain random.choice / integer indices
+        else:
+            self.cum_weights = list(itertools.accumulate(weights))
+        self._probabilities = None # Built on the first vector draw, so importing does not load numpy
+
+    @classmethod
+    def uniform(cls, words):
+        return cls((word, 1.0) for word in words)
+
+    def draw(self):
+        """Draws one word."""
+        if self.cum_weights is None:
+            return random.choice(self.words)
+        index = bisect.bisect(self.cum_weights, random.random() * self.cum_weights[-1])
+        return self.words[min(index, len(self.words) - 1)]
+
+    def draw_words(self, n, rng):
+        """Draws `n` words via one index array."""
+        words = self.words
+        return [words[i] for i in rng.choice(len(words), n, p=self.probabilities).tolist()]
+
+    @property
+    def probabilities(self):
+        """Normalized weights as an array (None for uniform vocabularies)."""
+        if self._probabilities is None and self.cum_weights is not None:
+            self._probabilities = np.asarray(self.weights) / self.cum_weights[-1]
+        return self._probabilities
+
+
+# Optional trailing slots carry their own leading space, so an empty pick leaves no gap
+_MODEL_NUMBERS = Vocabulary(
+    [(f" {n}", 0.25 / 900) for n in range(100, 1000)]
+    + [(f" {n}000", 0.25 / 9) for n in range(1, 10)]
+    + [(f" X{n}", 0.25 / 25) for n in range(1, 26)]
+    + [("", 0.25)]
+)
+
+
+def _truncate(name):
+    limit = config.PRODUCT_NAME_MAX_LENGTH
+    return (name[:limit] + '...') if len(name) > limit else name
+
+
+class NameTemplate:
+    """A category's naming rule compiled to a format pattern plus one Vocabulary per slot."""
+
+    __slots__ = ("pattern", "slots")
+
+    def __init__(self, pattern, slots):
+        self.pattern = pattern
+        self.slots = tuple(slots)
+
+    def generate(self):
+        return _truncate(self.pattern.format(*[slot.draw() for slot in self.slots]))
+
+    def generate_many(self, n, rng):
+        columns = [slot.draw_words(n, rng) for slot in self.slots]
+        fmt = self.pattern.format
+        return [_truncate(fmt(*parts)) for parts in zip(*columns)]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(category):
+    """
+    Compiles the naming rule that applies to `category` (memoized per category).
+
+    Args:
+        category (str): Product category name (None is treated as "Unknown").
+
+    Returns:
+        NameTemplate: The compiled template.
+    """
+    if category is None: category = "Unknown"
+    cat_lower = category.lower()
+    rule = next((r for r in config.PRODUCT_NAMING_RULES if any(k in cat_lower for k in r["keywords"])), {})
+
+    title = rule.get("title")
+    if title:
+        slots = [Vocabulary.uniform(title[key]) for key in ("articles", "adjectives", "nouns", "first_names", "last_names")]
+        return NameTemplate("'{0} {1} {2}' by {3} {4}", slots)
+
+    if "brands" in rule:
+        share = 1.0 / (len(rule["brands"]) + 1) # Category brands plus one general-brand slot
+        brands = Vocabulary([(b, share) for b in rule["brands"]] + [(b, share / len(config.BRANDS)) for b in config.BRANDS])
+    else:
+        brands = Vocabulary.uniform(config.BRANDS)
+    category_text = category.strip().replace("{", "{{").replace("}", "}}")
+    pattern = "{0} {1} " + (f"{category_text} " if category_text else "") + "{2} {3}{4}{5}"
+    slots = [
+        brands,
+        Vocabulary.uniform(rule.get("adjectives", config.ADJECTIVES1)),
+        Vocabulary.uniform(rule.get("nouns", config.NOUNS)),
+        Vocabulary.uniform(config.ADJECTIVES2),
+        _MODEL_NUMBERS,
+        Vocabulary.uniform(f" {m}" if m else "" for m in config.PRODUCT_MODIFIERS),
+    ]
+    return NameTemplate(pattern, slots)
+
+
+def generate_product_name(category):
+    """Generates one descriptive fake product name for `category`."""
+    return compile_template(category).generate()
+
+
+def generate_product_names(category, n, rng=None):
+    """
+    Generates `n` product names for one category at once.
+
+    Each slot is drawn as a single NumPy index array, so the per-name cost is
+    little more than one string format.
+
+    Args:
+        category (str): Product category name.
+        n (int): Number of names to generate.
+        rng (np.random.Generator, optional): Source of randomness. Defaults to the global np.random state.
+
+    Returns:
+        list: `n` product names.
+    """
+    return compile_template(category).generate_many(n, np.random if rng is None else rng)
+
+
+if __name__ == '__main__':
+    # Example usage/test
+    for cat in ["Electronics", "Clothing", "Books", "Grocery", "Toys & Games", "Garden Supplies", None]:
+        print(f"{cat}: {generate_product_name(cat)}")
+    print(f"Bulk (Home & Kitchen): {generate_product_names('Home & Kitchen', 3)}")
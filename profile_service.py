@@ -0,0 +1,219 @@
+# profile_service.py - Random-Access Single-Profile Regeneration and Local HTTP Service
+
+import re
+import sys
+import json
+import random
+import datetime
+import logging
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import event_store
+    import population
+    import simulation
+except ImportError as e:
+    logging.error("Error importing modules in profile_service.py: %s. Ensure config.py, event_store.py, population.py, and simulation.py exist.", e)
+    raise
+
+# Building a profile reseeds the global `random` / `np.random` generators (the
+# scalar engine draws from them); one build at a time keeps that consistent.
+_BUILD_LOCK = threading.Lock()
+
+
+def _resolve_seed(seed):
+    if seed is None:
+        seed = config.RANDOM_SEED if config.RANDOM_SEED is not None else 0
+    return int(seed) & 0xFFFFFFFF
+
+
+def _simulation_start_date():
+    return datetime.datetime.fromisoformat(config.SIMULATION_START_DATE or config.PROFILE_SERVICE_SIMULATION_START)
+
+
+def build_profile(index, seed=None, simulation_start_date=None):
+    """
+    Builds and simulates exactly one profile, deterministically from (index, seed).
+
+    The base profile comes from population.sample_population keyed by (seed, index)
+    and the simulation runs with population.seed_profile(seed, index), exactly as in
+    a generate_profiles.py run (sequential or parallel); the caller's generator state
+    is restored afterwards. With seed = config.RANDOM_SEED and the run's window start
+    (config.SIMULATION_START_DATE), the result is that run's profile `index`, given the
+    same PYTHONHASHSEED (some draws pick from sets) and config.
+
+    Args:
+        index (int): Profile index (0 <= index < config.ID_MAX_PROFILES).
+        seed (int, optional): Seed for the draws. Defaults to config.RANDOM_SEED (or 0).
+        simulation_start_date (datetime.datetime, optional): Start of the simulated window.
+            Defaults to config.SIMULATION_START_DATE, else config.PROFILE_SERVICE_SIMULATION_START.
+
+    Returns:
+        dict: The finalized profile (activity log as an event_store.EventStore).
+
+    Raises:
+        ValueError: If the index is out of range or the simulation fails.
+    """
+    index = int(index)
+    if not 0 <= index < config.ID_MAX_PROFILES:
+        raise ValueError(f"Profile index {index} out of range [0, {config.ID_MAX_PROFILES})")
+    seed = _resolve_seed(seed)
+    simulation_start_date = simulation_start_date or _simulation_start_date()
+    with _BUILD_LOCK:
+        saved_state = random.getstate(), np.random.get_state()
+        try:
+            base_profile = population.sample_population(index, 1, simulation_start_date, seed=seed).profile(0)
+            population.seed_profile(seed, index)
+            profile = simulation.simulate_activity(base_profile)
+        finally:
+            random.setstate(saved_state[0])
+            np.random.set_state(saved_state[1])
+    if not profile:
+        raise ValueError(f"Simulation failed for profile index {index}")
+    return profile
+
+
+@functools.lru_cache(maxsize=config.PROFILE_CACHE_SIZE)
+def _cached_profile(index, seed):
+    return build_profile(index, seed)
+
+
+def get_profile(index, seed=None):
+    """
+    Returns the profile for (index, seed), building it on a cache miss.
+
+    The most recent config.PROFILE_CACHE_SIZE profiles are kept in an LRU cache;
+    a hit returns the cached dict itself, so treat it as read-only.
+
+    Args:
+        index (int): Profile index.
+        seed (int, optional): Seed for the draws. Defaults to config.RANDOM_SEED (or 0).
+
+    Returns:
+        dict: The finalized profile.
+    """
+    return _cached_profile(int(index), _resolve_seed(seed))
+
+
+def cache_info():
+    """Hit/miss counters of the profile cache (functools.lru_cache statistics)."""
+    return _cached_profile.cache_info()._asdict()
+
+
+def event_page(profile, offset=0, limit=None):
+    """
+    Returns one page of a profile's activity log, materializing only that page.
+
+    Returns:
+        dict: {"profile_id", "total", "offset", "limit", "events"}.
+    """
+    limit = min(limit or config.PROFILE_SERVICE_PAGE_SIZE, config.PROFILE_SERVICE_MAX_PAGE_SIZE)
+    offset = max(0, offset)
+    activity_log = profile["activity_log"]
+    return {
+        "profile_id": profile.get("profile_id"),
+        "total": len(activity_log),
+        "offset": offset,
+        "limit": limit,
+        "events": list(activity_log[offset:offset + limit]),
+    }
+
+
+# --- Local HTTP Service ---
+
+_PROFILE_PATH = re.compile(r"^/profiles/(\d+)(/events)?/?$")
+
+
+class ProfileRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /profiles/<index>[?seed=S]                          full profile JSON
+    GET /profiles/<index>/events[?seed=S&offset=O&limit=L]  one page of the activity log
+    GET /health                                             status and cache statistics
+    """
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if parsed.path == "/health":
+            self._send_json(200, {"status": "ok", "cache": cache_info()})
+            return
+        match = _PROFILE_PATH.match(parsed.path)
+        if not match:
+            self._send_json(404, {"error": f"Unknown path {parsed.path}"})
+            return
+        try:
+            seed = int(query["seed"]) if "seed" in query else None
+            profile = get_profile(int(match.group(1)), seed)
+            if match.group(2):
+                body = event_page(profile, int(query.get("offset", 0)), int(query.get("limit", 0)) or None)
+            else:
+                body = profile
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logging.error("Profile service failed on %s: %s", self.path, e, exc_info=True)
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, body)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False, default=event_store.json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+def serve(host=None, port=None, warm_indices=()):
+    """
+    Runs the profile service until interrupted. All generation modules are
+    already imported (and their config tables compiled) by the time it listens.
+
+    Args:
+        host (str, optional): Bind address. Defaults to config.PROFILE_SERVICE_HOST.
+        port (int, optional): Port. Defaults to config.PROFILE_SERVICE_PORT.
+        warm_indices (iterable): Profile indices to build into the cache before serving.
+    """
+    for index in warm_indices:
+        get_profile(index)
+    server = ThreadingHTTPServer((host or config.PROFILE_SERVICE_HOST, port or config.PROFILE_SERVICE_PORT), ProfileRequestHandler)
+    logging.info("Serving profiles on http://%s:%s/profiles/<index>", server.server_address[0], server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    # Example usage/test:
+    #   python profile_service.py INDEX [SEED]   print one profile's summary
+    #   python profile_service.py serve [PORT]   run the local HTTP service
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        index = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+        seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        start = datetime.datetime.now()
+        profile = get_profile(index, seed)
+        built = datetime.datetime.now()
+        get_profile(index, seed)
+        cached = datetime.datetime.now()
+        summary = {k: v for k, v in profile.items() if k != "activity_log"}
+        summary["activity_log_size"] = len(profile["activity_log"])
+        print(json.dumps(summary, indent=2, default=event_store.json_default))
+        print(f"Built in {(built - start).total_seconds() * 1000:.1f} ms, cached lookup in {(cached - built).total_seconds() * 1000:.3f} ms; cache: {cache_info()}")
@@ -0,0 +1,436 @@
+# profile_state.py - Typed Simulation State and Incrementally Maintained Containers
+
+import datetime
+import random
+import logging
+from array import array
+from collections import deque
+
+# Import necessary components from other modules
+try:
+    import config
+except ImportError as e:
+    logging.error(f"Error importing modules in profile_state.py: {e}. Ensure config.py exists.")
+    raise
+
+
+class RecentOrdersWindow:
+    """
+    Time-ordered window over a profile's most recent orders.
+
+    Orders are appended in timestamp order (the simulation clock only moves
+    forward), so anything older than the horizon can be dropped from the left
+    as time advances. Lookups such as "delivered orders from the last 30 days"
+    then only touch orders inside the window instead of the full order history.
+    """
+
+    def __init__(self, orders=None, horizon_days=None):
+        self.horizon = datetime.timedelta(days=horizon_days or config.ORDER_WINDOW_HORIZON_DAYS)
+        self._orders = deque()
+        for order in orders or []:
+            self.append(order)
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __iter__(self):
+        return iter(self._orders)
+
+    def append(self, order):
+        """Adds an order. Orders must arrive in non-decreasing timestamp order."""
+        self._orders.append(order)
+
+    def expire(self, current_timestamp):
+        """Drops orders that have aged out of the horizon."""
+        orders = self._orders
+        while orders and current_timestamp - orders[0]["timestamp"] >= self.horizon:
+            orders.popleft()
+
+    def eligible(self, current_timestamp, max_age_days, statuses):
+        """
+        Returns the orders younger than `max_age_days` whose status is in `statuses`,
+        oldest first (same order as a scan over the full order list).
+        """
+        self.expire(current_timestamp)
+        max_age = datetime.timedelta(days=max_age_days)
+        matches = []
+        for order in reversed(self._orders):
+            if current_timestamp - order["timestamp"] >= max_age:
+                break # Everything further left is older still
+            if order.get("status") in statuses:
+                matches.append(order)
+        matches.reverse()
+        return matches
+
+
+class BrandMultiset:
+    """
+    Running count of brands across every purchased item.
+
+    Drawing from it is equivalent to `random.choice` over the flattened list of
+    item brands from all orders, without rebuilding that list per search.
+    """
+
+    def __init__(self, orders=None):
+        self._counts = {}
+        for order in orders or []:
+            self.add_order(order)
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def __bool__(self):
+        return bool(self._counts)
+
+    def add_order(self, order):
+        """Counts the brand of every item in `order`."""
+        counts = self._counts
+        for item in order.get("items", []):
+            brand = item.get("brand")
+            if brand is not None:
+                counts[brand] = counts.get(brand, 0) + 1
+
+    def choice(self):
+        """Draws a brand with probability proportional to its item count, or None if empty."""
+        if not self._counts:
+            return None
+        return random.choices(list(self._counts), weights=list(self._counts.values()), k=1)[0]
+
+
+class Cart:
+    """
+    Shopping cart lines in insertion order, indexed by product_id.
+
+    A product can occupy several lines (a repeat add does not always merge).
+    Lookup and membership by product_id, adding or removing a line and a
+    uniform random line are O(1): besides the ordered lines, the cart keeps a
+    dense list of them with swap-remove for random choice. `to_list()` gives
+    back the plain list of item dicts the cart used to be.
+    """
+
+    def __init__(self, items=None):
+        self._lines = {} # id(item) -> item, in insertion order
+        self._dense = [] # The same lines, in arbitrary order (random choice)
+        self._positions = {} # id(item) -> index in _dense
+        self._by_product = {} # product_id -> its lines, in insertion order
+        for item in items or []:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __contains__(self, product_id):
+        return product_id in self._by_product
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __getstate__(self):
+        return self.to_list()
+
+    def __setstate__(self, items):
+        self.__init__(items) # Lines are indexed by object identity, so the indexes are rebuilt
+
+    def get(self, product_id):
+        """Returns the first cart line for `product_id`, or None."""
+        lines = self._by_product.get(product_id)
+        return lines[0] if lines else None
+
+    def add(self, item):
+        """Appends `item` as a new cart line."""
+        self._lines[id(item)] = item
+        self._positions[id(item)] = len(self._dense)
+        self._dense.append(item)
+        self._by_product.setdefault(item["product_id"], []).append(item)
+        return item
+
+    def discard(self, item):
+        """Removes the cart line `item` (the object itself), if present."""
+        if self._lines.pop(id(item), None) is None:
+            return
+        position = self._positions.pop(id(item))
+        last = self._dense.pop()
+        if last is not item: # Swap-remove: the last line takes the freed slot
+            self._dense[position] = last
+            self._positions[id(last)] = position
+        lines = self._by_product[item["product_id"]]
+        lines.remove(item)
+        if not lines:
+            del self._by_product[item["product_id"]]
+
+    def remove_many(self, product_ids):
+        """Removes every cart line whose product_id is in `product_ids`."""
+        for product_id in set(product_ids):
+            for item in list(self._by_product.get(product_id, ())):
+                self.discard(item)
+
+    def items(self):
+        """Returns the cart lines as a list, in insertion order."""
+        return list(self._lines.values())
+
+    def random_item(self):
+        """Returns a uniformly chosen cart line, or None if the cart is empty."""
+        if not self._dense:
+            return None
+        return random.choice(self._dense)
+
+    def to_list(self):
+        """Serializes the cart to the plain list-of-dicts shape."""
+        return [dict(item) for item in self._lines.values()]
+
+
+# --- Behavioral Parameters ---
+# Fixed slot for every parameter in BEHAVIORAL_PARAMS_CONFIG, in config order.
+PARAM_NAMES = tuple(config.BEHAVIORAL_PARAMS_CONFIG)
+PARAM_INDEX = {name: i for i, name in enumerate(PARAM_NAMES)}
+_INT_PARAM_INDICES = frozenset(i for i, name in enumerate(PARAM_NAMES) if config.BEHAVIORAL_PARAMS_CONFIG[name].get("type") == "int")
+
+
+def param_index(name):
+    """Returns the fixed array index of a behavioral parameter. Raises KeyError for unknown names."""
+    try:
+        return PARAM_INDEX[name]
+    except KeyError:
+        raise KeyError(f"Unknown behavioral parameter '{name}'. Check BEHAVIORAL_PARAMS_CONFIG in config.py.") from None
+
+
+class BehavioralParams:
+    """
+    Behavioral parameters stored in a fixed-index float array.
+
+    Hot paths read `values[index]` directly using indices from `param_index`;
+    everything else can keep using the mapping interface (`params["activity_level"]`,
+    `params.get(...)`, `in`, `items()`). Integer-typed parameters are stored as
+    floats and converted back on read.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values=None):
+        self.values = array("d", values) if values is not None else array("d", bytes(8 * len(PARAM_NAMES)))
+
+    @classmethod
+    def from_dict(cls, params, fill_missing=False):
+        """
+        Builds the array from a name -> value mapping. Every configured parameter must
+        be present unless `fill_missing` is set, in which case absent parameters take
+        the midpoint of their configured range (useful for hand-written test profiles).
+        """
+        params = dict(params)
+        missing = [name for name in PARAM_NAMES if params.get(name) is None]
+        if missing and not fill_missing:
+            raise KeyError(f"Missing behavioral parameters: {missing}")
+        for name in missing:
+            min_val, max_val = config.BEHAVIORAL_PARAMS_CONFIG[name].get("range", (0.0, 1.0))
+            params[name] = (min_val + max_val) / 2.0
+        return cls(float(params[name]) for name in PARAM_NAMES)
+
+    def _read(self, index):
+        value = self.values[index]
+        return int(value) if index in _INT_PARAM_INDICES else value
+
+    def __getitem__(self, name):
+        return self._read(param_index(name))
+
+    def __setitem__(self, name, value):
+        self.values[param_index(name)] = value
+
+    def __contains__(self, name):
+        return name in PARAM_INDEX
+
+    def __len__(self):
+        return len(PARAM_NAMES)
+
+    def __iter__(self):
+        return iter(PARAM_NAMES)
+
+    def __getstate__(self):
+        return self.values.tobytes()
+
+    def __setstate__(self, raw):
+        self.values = array("d")
+        self.values.frombytes(raw)
+
+    def get(self, name, default=None):
+        index = PARAM_INDEX.get(name)
+        return default if index is None else self._read(index)
+
+    def keys(self):
+        return list(PARAM_NAMES)
+
+    def items(self):
+        return [(name, self._read(i)) for i, name in enumerate(PARAM_NAMES)]
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+# --- Profile State ---
+_STATE_FIELDS = (
+    "current_timestamp", "current_age", "current_life_stage", "current_household_composition",
+    "current_income_bracket", "current_interests", "is_prime", "prime_start_date", "used_services",
+    "behavioral_params", "login_frequency", "devices", "primary_device",
+    # Dynamic state
+    "cart", "orders", "recent_orders", "order_brands", "order_status_counts", "wishlist", "viewed_products", "search_history",
+    "last_event_timestamp", "current_session_id", "session_start_time", "events_in_session",
+    "time_since_last_minor_event", "seasonal_boost", "active_promotions", "customer_service_interactions",
+    "brand_purchase_counts", "ids",
+)
+_STATE_FIELD_SET = frozenset(_STATE_FIELDS)
+_STATE_DEFAULTS = {
+    "current_interests": set, "used_services": set, "devices": list, "is_prime": bool,
+    "cart": Cart, "orders": list, "recent_orders": RecentOrdersWindow, "order_brands": BrandMultiset, "order_status_counts": dict,
+    "wishlist": set, "viewed_products": list, "search_history": list, "events_in_session": int,
+    "time_since_last_minor_event": int, "seasonal_boost": lambda: 1.0, "active_promotions": dict,
+    "customer_service_interactions": int, "brand_purchase_counts": dict,
+}
+# Config tables referenced by identity from the state; pickled as indices.
+_LIFE_STAGE_REFS = {id(ls): i for i, ls in enumerate(config.LIFE_STAGES)}
+_DEVICE_REFS = {id(d): i for i, d in enumerate(config.DEVICE_TYPES)}
+
+
+def _to_ref(obj, refs):
+    index = refs.get(id(obj))
+    return ("ref", index) if index is not None else obj
+
+
+def _from_ref(obj, table):
+    return table[obj[1]] if isinstance(obj, tuple) and len(obj) == 2 and obj[0] == "ref" else obj
+
+
+class ProfileState:
+    """
+    Typed, slotted replacement for the profile's '_internal_state' dict.
+
+    Simulation hot paths use attribute access (`state.cart`, `state.behavioral_params`);
+    existing dict-style code (`state["cart"]`, `state.get(...)`, `state.setdefault(...)`)
+    keeps working. Keys outside the known fields are kept in a small side dict.
+    Pickling stores config-table entries (life stage, devices) as indices.
+    """
+
+    __slots__ = _STATE_FIELDS + ("_extras",)
+
+    def __init__(self, **fields):
+        for name in _STATE_FIELDS:
+            if name in fields:
+                value = fields.pop(name)
+            else:
+                factory = _STATE_DEFAULTS.get(name)
+                value = factory() if factory else None
+            setattr(self, name, value)
+        if isinstance(self.behavioral_params, dict):
+            self.behavioral_params = BehavioralParams.from_dict(self.behavioral_params)
+        if isinstance(self.cart, list):
+            self.cart = Cart(self.cart)
+        self._extras = fields
+
+    @classmethod
+    def from_dict(cls, state):
+        """Builds a ProfileState from a legacy '_internal_state' dict, indexing any existing orders."""
+        fields = dict(state)
+        orders = fields.get("orders") or []
+        fields.setdefault("recent_orders", RecentOrdersWindow(orders))
+        fields.setdefault("order_brands", BrandMultiset(orders))
+        fields.setdefault("order_status_counts", count_order_statuses(orders))
+        return cls(**fields)
+
+    def to_dict(self):
+        """Returns a plain dict view (params and cart converted to their plain shapes)."""
+        result = {name: getattr(self, name) for name in _STATE_FIELDS}
+        result["behavioral_params"] = self.behavioral_params.to_dict()
+        result["cart"] = self.cart.to_list()
+        result.update(self._extras)
+        return result
+
+    # --- Dict-style access for existing code ---
+    def __getitem__(self, key):
+        if key in _STATE_FIELD_SET:
+            return getattr(self, key)
+        return self._extras[key]
+
+    def __setitem__(self, key, value):
+        if key in _STATE_FIELD_SET:
+            setattr(self, key, value)
+        else:
+            self._extras[key] = value
+
+    def __delitem__(self, key):
+        if key in _STATE_FIELD_SET:
+            raise KeyError(f"Cannot delete fixed ProfileState field '{key}'")
+        del self._extras[key]
+
+    def __contains__(self, key):
+        return key in _STATE_FIELD_SET or key in self._extras
+
+    def get(self, key, default=None):
+        if key in _STATE_FIELD_SET:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self._extras.get(key, default)
+
+    def setdefault(self, key, default=None):
+        if key in _STATE_FIELD_SET:
+            value = getattr(self, key)
+            if value is None:
+                setattr(self, key, default)
+                value = default
+            return value
+        return self._extras.setdefault(key, default)
+
+    # --- Pickling ---
+    def __getstate__(self):
+        fields = {name: getattr(self, name) for name in _STATE_FIELDS}
+        fields["current_life_stage"] = _to_ref(self.current_life_stage, _LIFE_STAGE_REFS)
+        fields["primary_device"] = _to_ref(self.primary_device, _DEVICE_REFS)
+        fields["devices"] = [_to_ref(d, _DEVICE_REFS) for d in self.devices]
+        return fields, self._extras
+
+    def __setstate__(self, pickled):
+        fields, extras = pickled
+        for name in _STATE_FIELDS:
+            setattr(self, name, fields.get(name))
+        self.current_life_stage = _from_ref(self.current_life_stage, config.LIFE_STAGES)
+        self.primary_device = _from_ref(self.primary_device, config.DEVICE_TYPES)
+        self.devices = [_from_ref(d, config.DEVICE_TYPES) for d in self.devices or []]
+        if self.order_status_counts is None: # Pickled before the counts were kept
+            self.order_status_counts = count_order_statuses(self.orders or [])
+        self._extras = extras
+
+    def __repr__(self):
+        return (f"ProfileState(current_timestamp={self.current_timestamp!r}, cart={len(self.cart)} items, "
+                f"orders={len(self.orders)}, is_prime={self.is_prime})")
+
+
+def count_order_statuses(orders):
+    """Returns a status -> number of orders mapping for `orders`."""
+    counts = {}
+    for order in orders:
+        status = order.get("status")
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def record_order(state, order):
+    """Appends a new order to the state and keeps the order indexes in sync."""
+    state.setdefault("orders", []).append(order)
+    state.setdefault("recent_orders", RecentOrdersWindow()).append(order)
+    state.setdefault("order_brands", BrandMultiset()).add_order(order)
+    counts = state.setdefault("order_status_counts", {})
+    counts[order.get("status")] = counts.get(order.get("status"), 0) + 1
+
+
+def set_order_status(state, order, status):
+    """Changes an order's status and keeps the per-status order counts in sync."""
+    counts = state.setdefault("order_status_counts", {})
+    previous = order.get("status")
+    if counts.get(previous, 0) > 1:
+        counts[previous] -= 1
+    else:
+        counts.pop(previous, None)
+    counts[status] = counts.get(status, 0) + 1
+    order["status"] = status
+
+
+def has_order_with_status(state, status):
+    """True if any of the profile's orders currently has `status` (O(1), no scan over the orders)."""
+    return status in state.order_status_counts
@@ -0,0 +1,204 @@
+# profiling.py - Sampled cProfile / tracemalloc Profiling of Generation Runs
+
+import os
+import io
+import json
+import glob
+import pstats
+import cProfile
+import logging
+import tracemalloc
+import contextlib
+
+# Import necessary components from other modules
+try:
+    import config
+except ImportError as e:
+    logging.error(f"Error importing modules in profiling.py: {e}. Ensure config.py exists.")
+    raise
+
+# Only every Nth profile runs under cProfile (and optionally tracemalloc); the
+# samples are merged into one pstats profile, so the result covers many
+# profiles at a fraction of the cost of profiling the whole run.
+
+COMBINED_STATS_NAME = "combined.prof"
+STATS_SUMMARY_NAME = "combined_top.txt"
+ALLOCATIONS_NAME = "allocations_top.json"
+
+
+class SampledProfiler:
+    """
+    Profiles every `every_n`-th sample key and merges the results.
+
+    Args:
+        every_n (int): Sampling period (key % every_n == 0 is profiled).
+        trace_memory (bool): Also trace allocations with tracemalloc while sampling.
+        top_n (int): Entries kept in the text summary and allocation list.
+    """
+
+    def __init__(self, every_n=None, trace_memory=None, top_n=None):
+        self.every_n = every_n or config.PROFILING_EVERY_N
+        self.trace_memory = config.PROFILING_TRACE_MEMORY if trace_memory is None else trace_memory
+        self.top_n = top_n or config.PROFILING_TOP_N
+        self.stats = None
+        self.samples = 0
+        self.allocations = {} # "file:line" -> [bytes, blocks] still allocated at the end of a sample
+        self._profiler = None
+
+    def is_sampled(self, key):
+        return key % self.every_n == 0
+
+    def start(self, key):
+        """Starts profiling if `key` is sampled. Returns True if it did; pair with stop()."""
+        if not self.is_sampled(key):
+            return False
+        if self.trace_memory:
+            tracemalloc.start()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return True
+
+    def stop(self):
+        """Ends the current sample (a no-op if start() did not sample) and merges it."""
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return
+        profiler.disable()
+        if self.trace_memory:
+            self._record_allocations(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+        self._add(pstats.Stats(profiler))
+        self.samples += 1
+
+    @contextlib.contextmanager
+    def sample(self, key):
+        """Profiles the enclosed block if `key` is sampled; otherwise does nothing."""
+        self.start(key)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def _add(self, stats):
+        if self.stats is None:
+            self.stats = stats
+        else:
+            self.stats.add(stats)
+
+    def _record_allocations(self, snapshot):
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        for stat in snapshot.statistics('lineno'):
+            frame = stat.traceback[0]
+            entry = self.allocations.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            entry[0] += stat.size
+            entry[1] += stat.count
+
+    def top_allocations(self, limit=None):
+        """Top allocation sites by bytes still held at the end of the sampled work (all sites if limit is 0)."""
+        return _allocation_rows(self.allocations, self.top_n if limit is None else limit)
+
+    def write(self, output_dir=None, worker_id=None):
+        """
+        Writes the merged profile (pstats file), a text summary of the top functions by
+        cumulative time, and the top allocation sites.
+
+        Args:
+            output_dir (str, optional): Target directory. Defaults to config.PROFILING_OUTPUT_DIR.
+            worker_id (str, optional): Suffix for per-worker files (merged later with merge_outputs).
+
+        Returns:
+            str: Path of the pstats file, or None if nothing was sampled.
+        """
+        if self.stats is None:
+            return None
+        output_dir = output_dir or config.PROFILING_OUTPUT_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        suffix = f".{worker_id}" if worker_id is not None else ""
+        stats_path = os.path.join(output_dir, COMBINED_STATS_NAME + suffix)
+        self.stats.dump_stats(stats_path)
+        if worker_id is None:
+            _write_summary(self.stats, os.path.join(output_dir, STATS_SUMMARY_NAME), self.top_n, f"Merged profile of {self.samples} sampled units (every {self.every_n})")
+        if self.trace_memory:
+            # Worker files keep every site so the merged ranking is exact
+            sites = self.top_allocations(0 if worker_id is not None else None)
+            with open(os.path.join(output_dir, ALLOCATIONS_NAME + suffix), 'w', encoding='utf-8') as f:
+                json.dump({"samples": self.samples, "sites": sites}, f, indent=2)
+        return stats_path
+
+
+def _allocation_rows(allocations, limit):
+    rows = sorted(allocations.items(), key=lambda item: item[1][0], reverse=True)
+    if limit:
+        rows = rows[:limit]
+    return [{"site": site, "bytes": size, "blocks": count} for site, (size, count) in rows]
+
+
+def _write_summary(stats, path, top_n, header):
+    buffer = io.StringIO()
+    stats.stream = buffer
+    buffer.write(header + "\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    buffer.write("\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(buffer.getvalue())
+
+
+def clear_worker_outputs(output_dir=None):
+    """Removes per-worker outputs left by an earlier run, so merge_outputs only sees this run's."""
+    output_dir = output_dir or config.PROFILING_OUTPUT_DIR
+    for path in glob.glob(os.path.join(output_dir, COMBINED_STATS_NAME + ".*")) + glob.glob(os.path.join(output_dir, ALLOCATIONS_NAME + ".*")):
+        os.remove(path)
+
+
+def merge_outputs(output_dir=None, top_n=None):
+    """
+    Merges per-worker outputs (written with worker_id) in `output_dir` into the
+    combined profile, its summary and the combined top allocation sites.
+
+    Returns:
+        str: Path of the combined pstats file, or None if there were no worker files.
+    """
+    output_dir = output_dir or config.PROFILING_OUTPUT_DIR
+    top_n = top_n or config.PROFILING_TOP_N
+    stats_paths = sorted(glob.glob(os.path.join(output_dir, COMBINED_STATS_NAME + ".*")))
+    if not stats_paths:
+        return None
+    stats = pstats.Stats(*stats_paths)
+    combined_path = os.path.join(output_dir, COMBINED_STATS_NAME)
+    stats.dump_stats(combined_path)
+
+    allocations, samples = {}, 0
+    for path in sorted(glob.glob(os.path.join(output_dir, ALLOCATIONS_NAME + ".*"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            worker = json.load(f)
+        samples += worker["samples"]
+        for row in worker["sites"]:
+            entry = allocations.setdefault(row["site"], [0, 0])
+            entry[0] += row["bytes"]
+            entry[1] += row["blocks"]
+    _write_summary(stats, os.path.join(output_dir, STATS_SUMMARY_NAME), top_n, f"Merged profile of {len(stats_paths)} worker profiles")
+    if allocations:
+        with open(os.path.join(output_dir, ALLOCATIONS_NAME), 'w', encoding='utf-8') as f:
+            json.dump({"samples": samples, "sites": _allocation_rows(allocations, top_n)}, f, indent=2)
+    return combined_path
+
+
+if __name__ == '__main__':
+    # Example usage/test: profile every 2nd of a few simulated profiles
+    import sys
+    import datetime
+    import personas
+    import simulation
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else config.PROFILING_OUTPUT_DIR
+    profiler = SampledProfiler(every_n=2, trace_memory=True, top_n=15)
+    start_date = datetime.datetime(2020, 1, 1)
+    for index in range(1, 7):
+        with profiler.sample(index):
+            simulation.simulate_activity(personas.create_base_profile(index, start_date))
+    profiler.write(output_dir)
+    print(f"Profiled {profiler.samples} of 6 profiles; wrote {os.path.join(output_dir, COMBINED_STATS_NAME)}")
+    for row in profiler.top_allocations()[:5]:
+        print(f"  {row['bytes']:>10} bytes  {row['blocks']:>6} blocks  {row['site']}")
@@ -0,0 +1,353 @@
+# replay.py - Real-Time Replay of the Event Stream to a Sink (Load Testing)
+
+import os
+import sys
+import json
+import time
+import glob
+import queue
+import random
+import socket
+import zlib
+import datetime
+import logging
+import threading
+import http.client
+from urllib.parse import urlparse
+
+# Import necessary components from other modules
+try:
+    import config
+    import event_store
+    import event_stream
+except ImportError as e:
+    logging.error("Error importing modules in replay.py: %s. Ensure config.py, event_store.py, and event_stream.py exist.", e)
+    raise
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _timestamp_seconds(timestamp):
+    """Seconds since the epoch for a "YYYY-MM-DDTHH:MM:SSZ" event timestamp (faster than strptime)."""
+    ts = timestamp
+    dt = datetime.datetime(int(ts[0:4]), int(ts[5:7]), int(ts[8:10]), int(ts[11:13]), int(ts[14:16]), int(ts[17:19]))
+    return (dt - _EPOCH).total_seconds()
+
+
+# --- Sinks ---
+# A sink receives each event as a record plus its encoded JSON line. `send` may
+# block when the consumer is slow; that is the backpressure the pacer measures.
+
+class StdoutSink:
+    """Writes JSON Lines to stdout."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, record, line):
+        self.stream.write(line)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class PipeSink:
+    """Writes JSON Lines to a named pipe (created if missing). Opening blocks until a reader attaches."""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        logging.info("Waiting for a reader on named pipe %s...", path)
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def send(self, record, line):
+        self.file.write(line)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class TcpSink:
+    """Sends newline-delimited JSON over one TCP connection."""
+
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self._buffer = []
+
+    def send(self, record, line):
+        self._buffer.append(line.encode('utf-8'))
+        if len(self._buffer) >= config.REPLAY_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.sock.sendall(b"".join(self._buffer)) # Blocks while the receiver's window is full
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        self.sock.close()
+
+
+class HttpSink:
+    """POSTs batches of JSON Lines to a local HTTP endpoint over a keep-alive connection."""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.path = parsed.path or "/"
+        self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        self._buffer = []
+
+    def send(self, record, line):
+        self._buffer.append(line)
+        if len(self._buffer) >= config.REPLAY_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        body = "".join(self._buffer).encode('utf-8')
+        self._buffer = []
+        self.conn.request("POST", self.path, body=body, headers={"Content-Type": "application/x-ndjson"})
+        response = self.conn.getresponse() # Waiting for the reply is the backpressure
+        response.read()
+        if response.status >= 400:
+            logging.warning("Replay endpoint returned HTTP %s for a batch", response.status)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class LocalBroker:
+    """
+    In-process stand-in for a message broker: a topic of bounded partitions.
+
+    Messages are routed by key (the event's session_id, so a session stays in
+    order on one partition). `publish` blocks while the partition is full.
+    """
+
+    def __init__(self, partitions=None, capacity=None):
+        self.partitions = [queue.Queue(maxsize=capacity or config.REPLAY_BROKER_CAPACITY)
+                           for _ in range(partitions or config.REPLAY_BROKER_PARTITIONS)]
+
+    def partition_for(self, key):
+        return zlib.crc32((key or "").encode('utf-8')) % len(self.partitions)
+
+    def publish(self, key, value):
+        self.partitions[self.partition_for(key)].put((key, value))
+
+    def consume(self, partition, timeout=None):
+        """Returns the next (key, value) of a partition, or None on timeout."""
+        try:
+            return self.partitions[partition].get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class BrokerSink:
+    """Publishes events to a LocalBroker keyed by session_id."""
+
+    def __init__(self, broker=None):
+        self.broker = broker or LocalBroker()
+
+    def send(self, record, line):
+        self.broker.publish(record.get("details", {}).get("session_id"), line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_sink(spec):
+    """
+    Creates a sink from a spec string: "stdout", "pipe:PATH", "tcp:HOST:PORT",
+    "http://HOST:PORT/PATH" or "broker".
+    """
+    if spec == "stdout":
+        return StdoutSink()
+    if spec == "broker":
+        return BrokerSink()
+    if spec.startswith("pipe:"):
+        return PipeSink(spec[len("pipe:"):])
+    if spec.startswith("tcp:"):
+        host, port = spec[len("tcp:"):].rsplit(":", 1)
+        return TcpSink(host, int(port))
+    if spec.startswith("http://"):
+        return HttpSink(spec)
+    raise ValueError(f"Unknown replay sink '{spec}' (expected stdout, pipe:PATH, tcp:HOST:PORT, http://HOST:PORT/PATH or broker)")
+
+
+# --- Metrics ---
+
+class ReplayMetrics:
+    """
+    Achieved throughput and lag behind the paced schedule.
+
+    Lag is the time between an event's scheduled wall-clock send time and the
+    moment the sink accepted it; blocked time is how long sinks held the sender
+    (backpressure). Lag percentiles come from a fixed-size reservoir sample.
+    """
+
+    _RESERVOIR_SIZE = 10000
+
+    def __init__(self):
+        self.events = 0
+        self.bytes = 0
+        self.blocked_seconds = 0.0
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+        self._lags = []
+        self._rng = random.Random(0)
+        self.start = time.perf_counter()
+        self.end = None
+
+    def record(self, lag, blocked, nbytes):
+        self.events += 1
+        self.bytes += nbytes
+        self.blocked_seconds += blocked
+        self._lag_total += lag
+        if lag > self.max_lag: self.max_lag = lag
+        if len(self._lags) < self._RESERVOIR_SIZE:
+            self._lags.append(lag)
+        else:
+            slot = self._rng.randrange(self.events)
+            if slot < self._RESERVOIR_SIZE: self._lags[slot] = lag
+
+    def lag_percentile(self, q):
+        if not self._lags:
+            return 0.0
+        ordered = sorted(self._lags)
+        return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+    def summary(self):
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return {
+            "events": self.events,
+            "bytes": self.bytes,
+            "elapsed_seconds": round(elapsed, 3),
+            "events_per_second": round(self.events / elapsed, 1) if elapsed > 0 else 0.0,
+            "lag_mean_seconds": round(self._lag_total / self.events, 6) if self.events else 0.0,
+            "lag_p50_seconds": round(self.lag_percentile(50), 6),
+            "lag_p99_seconds": round(self.lag_percentile(99), 6),
+            "lag_max_seconds": round(self.max_lag, 6),
+            "sink_blocked_seconds": round(self.blocked_seconds, 3),
+        }
+
+
+# --- Replay ---
+
+def replay(records, sink, speedup=None, limit=None, report_interval=None):
+    """
+    Emits records to a sink, paced by their simulated timestamps.
+
+    The first event is sent immediately; every later event is scheduled at
+    (simulated offset from the first event) / speedup seconds of wall-clock
+    time. When the sender falls behind (slow sink), events go out back to back
+    and the lag is recorded rather than hidden.
+
+    Args:
+        records (iterable): Time-ordered stream records (see event_stream.py).
+        sink: A sink from open_sink (or any object with send/flush).
+        speedup (float, optional): Simulated seconds per wall-clock second; 0 or None
+            means as fast as possible. Defaults to config.REPLAY_SPEEDUP.
+        limit (int, optional): Stop after this many events.
+        report_interval (float, optional): Seconds between progress logs. Defaults to
+            config.REPLAY_REPORT_INTERVAL_SECONDS.
+
+    Returns:
+        ReplayMetrics: Achieved throughput and lag.
+    """
+    speedup = config.REPLAY_SPEEDUP if speedup is None else speedup
+    report_interval = report_interval or config.REPLAY_REPORT_INTERVAL_SECONDS
+    metrics = ReplayMetrics()
+    clock = time.perf_counter
+    first_sim = None
+    next_report = metrics.start + report_interval
+    for record in records:
+        if limit is not None and metrics.events >= limit:
+            break
+        sim_seconds = _timestamp_seconds(record["timestamp"])
+        if first_sim is None:
+            first_sim = sim_seconds
+        line = json.dumps(record, ensure_ascii=False, default=event_store.json_default) + "\n"
+        now = clock()
+        if speedup:
+            scheduled = metrics.start + (sim_seconds - first_sim) / speedup
+            if scheduled > now:
+                sink.flush() # Don't hold buffered events while idle
+                time.sleep(scheduled - now)
+                now = clock()
+        else:
+            scheduled = now
+        sink.send(record, line)
+        sent = clock()
+        metrics.record(sent - scheduled, sent - now, len(line.encode('utf-8')))
+        if sent >= next_report:
+            s = metrics.summary()
+            logging.info("Replay: %s events, %s events/s, lag p50 %ss / max %ss", s['events'], s['events_per_second'], s['lag_p50_seconds'], s['lag_max_seconds'])
+            next_report = sent + report_interval
+    sink.flush()
+    metrics.end = clock()
+    return metrics
+
+
+# --- Sources ---
+
+def recorded_event_stream(source=None):
+    """
+    Time-ordered stream from generated data: a directory of sorted shard files
+    (shard_*.jsonl) or of profile JSON files. Defaults to config.EVENT_STREAM_SHARD_DIR
+    if it holds shards, else config.OUTPUT_DIR.
+    """
+    source = source or (config.EVENT_STREAM_SHARD_DIR if config.EVENT_STREAM_SHARD_DIR and glob.glob(os.path.join(config.EVENT_STREAM_SHARD_DIR, "shard_*.jsonl")) else config.OUTPUT_DIR)
+    shards = sorted(glob.glob(os.path.join(source, "shard_*.jsonl")))
+    if shards:
+        return event_stream.merge_shards(shards)
+    return event_stream.global_event_stream(source)
+
+
+def live_event_stream(num_profiles, start_index=None, simulation_start_date=None):
+    """
+    Generates and simulates `num_profiles` profiles in memory and returns their
+    merged, time-ordered event stream.
+    """
+    import population
+    import simulation
+    start_index = config.START_PROFILE_INDEX if start_index is None else start_index
+    simulation_start_date = simulation_start_date or datetime.datetime.now() - datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
+    batch = population.sample_population(start_index, num_profiles, simulation_start_date)
+    profiles = [p for p in (simulation.simulate_activity(profile) for profile in batch) if p]
+    return event_stream.merge_profiles(profiles)
+
+
+if __name__ == '__main__':
+    # Example usage/test: replay generated data (or a small live run) to a sink
+    #   python replay.py [SINK] [SPEEDUP] [SOURCE_DIR | live:N]
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    sink_spec = sys.argv[1] if len(sys.argv) > 1 else config.REPLAY_SINK
+    speedup = float(sys.argv[2]) if len(sys.argv) > 2 else config.REPLAY_SPEEDUP
+    source = sys.argv[3] if len(sys.argv) > 3 else None
+    records = live_event_stream(int(source[len("live:"):])) if source and source.startswith("live:") else recorded_event_stream(source)
+
+    sink = open_sink(sink_spec)
+    if isinstance(sink, BrokerSink):
+        # Stand-in consumers draining each partition
+        def drain(partition):
+            while True:
+                sink.broker.consume(partition, timeout=1.0)
+        for partition in range(len(sink.broker.partitions)):
+            threading.Thread(target=drain, args=(partition,), daemon=True).start()
+    try:
+        metrics = replay(records, sink, speedup=speedup)
+    finally:
+        sink.close()
+    print(json.dumps(metrics.summary(), indent=2), file=sys.stderr)
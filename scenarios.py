@@ -0,0 +1,303 @@
+# scenarios.py - Common-Random-Numbers Scenario Sweeps Over a Cached Base Population
+
+import os
+import copy
+import json
+import time
+import pickle
+import random
+import hashlib
+import datetime
+import logging
+import argparse
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import utils
+    import event_store
+    import profile_state
+    import population
+    import simulation
+    import scheduler
+    import worker_pool
+except ImportError as e:
+    logging.error("Error importing modules in scenarios.py: %s. Ensure config.py, utils.py, event_store.py, profile_state.py, population.py, simulation.py, scheduler.py, and worker_pool.py exist.", e)
+    raise
+
+# The base population is sampled once per (config, size, seed) and cached on
+# disk. Every scenario then simulates the same base profiles, and profile i
+# draws from streams seeded by (SWEEP_SEED, i) in every scenario (common random
+# numbers), so two scenarios differ only through their config overrides and
+# paired per-profile differences have far less noise than independent runs.
+
+_base_rows = None # [(batch, row), ...] per profile; set in the parent before forking workers
+
+
+def _canonical(value):
+    """Order-independent text form of a config value (dict keys and set members sorted)."""
+    if isinstance(value, dict):
+        return "{" + ",".join(sorted(f"{k!r}:{_canonical(v)}" for k, v in value.items())) + "}"
+    if isinstance(value, (set, frozenset)):
+        return "set(" + ",".join(sorted(_canonical(v) for v in value)) + ")"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_canonical(v) for v in value) + "]"
+    return repr(value)
+
+
+def _config_snapshot():
+    """Text form of every public config setting, for the population cache key."""
+    return _canonical({name: getattr(config, name) for name in dir(config) if name.isupper() and not name.startswith("SWEEP_")})
+
+
+def _simulation_start_date():
+    return datetime.datetime.fromisoformat(config.SWEEP_SIMULATION_START)
+
+
+def population_cache_path(num_profiles, seed, cache_dir=None):
+    """Cache file of the base population for the current config, size and seed."""
+    key = hashlib.sha1(f"{num_profiles}:{seed}:{config.SWEEP_SIMULATION_START}:{_config_snapshot()}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir or config.SWEEP_CACHE_DIR, f"base_population_{key}.pkl")
+
+
+def load_base_population(num_profiles, seed=None, cache_dir=None):
+    """
+    Returns the base population (list of population batches), building and
+    caching it on the first call for this config, size and seed.
+
+    Returns:
+        tuple: (list of PopulationBatch, cache path, whether it was loaded from the cache).
+    """
+    seed = config.SWEEP_SEED if seed is None else seed
+    path = population_cache_path(num_profiles, seed, cache_dir)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            batches = pickle.load(f)
+        for batch in batches: # Caches written before batches carried their ID seed
+            batch.id_seed = seed
+        return batches, path, True
+    start_date = _simulation_start_date()
+    batches = []
+    for index in range(0, num_profiles, config.POPULATION_BATCH_SIZE):
+        size = min(config.POPULATION_BATCH_SIZE, num_profiles - index)
+        batches.append(population.sample_population(index, size, start_date, rng=np.random.default_rng([seed, index]), seed=seed))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(batches, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return batches, path, False
+
+
+def _merge(original, override):
+    """Nested dicts are merged key by key; anything else is replaced."""
+    if isinstance(original, dict) and isinstance(override, dict):
+        merged = dict(original)
+        for key, value in override.items():
+            merged[key] = _merge(original.get(key), value)
+        return merged
+    return copy.deepcopy(override)
+
+
+def apply_overrides(overrides):
+    """
+    Applies a scenario's config overrides in this process.
+
+    Dict settings (BASE_EVENT_WEIGHTS, SHOPPING_PATTERNS, ...) are merged, so a
+    scenario only lists what it changes. SIMULATION_DURATION_DAYS follows an
+    overridden SIMULATION_DURATION_YEARS unless it is overridden itself.
+
+    Returns:
+        dict: The previous values, for restore_overrides.
+    """
+    saved = {}
+    if "SIMULATION_DURATION_YEARS" in overrides and "SIMULATION_DURATION_DAYS" not in overrides:
+        overrides = dict(overrides, SIMULATION_DURATION_DAYS=overrides["SIMULATION_DURATION_YEARS"] * 365)
+    for name, value in overrides.items():
+        if not hasattr(config, name):
+            raise ValueError(f"Scenario overrides unknown config setting '{name}'")
+        saved[name] = getattr(config, name)
+        setattr(config, name, _merge(saved[name], value))
+    return saved
+
+
+def restore_overrides(saved):
+    for name, value in saved.items():
+        setattr(config, name, value)
+
+
+# --- Worker Side ---
+
+def _init_worker(cache_path):
+    """Pool initializer: spawned workers load the cached population (forked ones inherit it)."""
+    global _base_rows
+    random.seed()
+    np.random.seed()
+    if _base_rows is None:
+        with open(cache_path, 'rb') as f:
+            _base_rows = [(batch, row) for batch in pickle.load(f) for row in range(len(batch))]
+
+
+def _run_scenario_chunk(scenario, positions, options):
+    """
+    Simulates base profiles `positions` under one scenario and writes their JSON files.
+
+    Returns:
+        dict: {"scenario", "pid", "busy_seconds", "profiles": [(index, events, seconds, error), ...]}.
+    """
+    start = time.perf_counter()
+    saved = apply_overrides(scenario.get("overrides", {}))
+    rows = []
+    try:
+        start_date = _simulation_start_date()
+        end_date = start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
+        period_end = utils.format_iso_timestamp(end_date)
+        output_dir = os.path.join(options["output_dir"], scenario["name"])
+        for position in positions:
+            profile_start = time.perf_counter()
+            try:
+                batch, row = _base_rows[position]
+                profile = batch.profile(row)
+                profile["simulation_period_end"] = period_end
+                # Common random numbers: the same streams for this profile in every scenario
+                random.seed(f"{options['seed']}:{position}")
+                np.random.seed([options['seed'], position])
+                result = simulation.simulate_activity(profile, end_date=end_date)
+                if not result:
+                    raise ValueError("Simulation failed to produce a final profile.")
+                file_name = f"{config.FILENAME_PREFIX}{position:0{config.FILENAME_DIGITS}d}.json"
+                with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=2, ensure_ascii=False, default=event_store.json_default)
+                rows.append((position, len(result["activity_log"]), time.perf_counter() - profile_start, None))
+            except Exception as e:
+                rows.append((position, 0, time.perf_counter() - profile_start, str(e)))
+    finally:
+        restore_overrides(saved)
+    return {"scenario": scenario["name"], "pid": os.getpid(), "busy_seconds": time.perf_counter() - start, "profiles": rows}
+
+
+# --- Parent Side ---
+
+def run_sweep(scenarios, num_profiles=None, output_dir=None, workers=None, seed=None):
+    """
+    Simulates every scenario over one shared, cached base population in parallel.
+
+    Args:
+        scenarios (list): [{"name": str, "overrides": {CONFIG_NAME: value, ...}}, ...].
+            The first scenario is the reference for the paired comparison.
+        num_profiles (int, optional): Population size. Defaults to config.SWEEP_NUM_PROFILES.
+        output_dir (str, optional): Root directory; each scenario writes to <output_dir>/<name>/.
+        workers (int, optional): Worker processes. Defaults to worker_pool.worker_count().
+        seed (int, optional): Seed of the population and the per-profile streams. Defaults to config.SWEEP_SEED.
+
+    Returns:
+        dict: {"population_cached", "seconds", "scenarios": {name: summary}} (see summarize).
+    """
+    global _base_rows
+    num_profiles = num_profiles or config.SWEEP_NUM_PROFILES
+    output_dir = output_dir or config.SWEEP_OUTPUT_DIR
+    seed = config.SWEEP_SEED if seed is None else seed
+    names = [scenario["name"] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names must be unique: {names}")
+    for scenario in scenarios:
+        restore_overrides(apply_overrides(scenario.get("overrides", {}))) # Fail on unknown settings before any work
+        os.makedirs(os.path.join(output_dir, scenario["name"]), exist_ok=True)
+
+    start = time.perf_counter()
+    batches, cache_path, cached = load_base_population(num_profiles, seed)
+    logging.info("%s base population of %d profiles (%s)", "Loaded cached" if cached else "Built and cached", num_profiles, cache_path)
+    _base_rows = [(batch, row) for batch in batches for row in range(len(batch))]
+    activity = np.concatenate([batch.params[:, profile_state.param_index("activity_level")] for batch in batches])
+    start_date = _simulation_start_date()
+
+    # Chunks of every scenario go into one largest-first queue, each costed under its
+    # own overrides (duration and seasonal peaks change the expected event counts)
+    workers = worker_pool.worker_count(workers)
+    tasks = []
+    for scenario in scenarios:
+        saved = apply_overrides(scenario.get("overrides", {}))
+        try:
+            expected = scheduler.estimate_events(activity, start_date, start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS))
+        finally:
+            restore_overrides(saved)
+        for chunk in scheduler.plan_chunks(expected, workers * len(scenarios)):
+            tasks.append((float(expected[chunk].sum()), scenario, chunk))
+    tasks.sort(key=lambda task: task[0], reverse=True)
+    options = {"seed": seed, "output_dir": output_dir}
+
+    results = []
+    pending = set()
+    next_task = 0
+    with worker_pool.create_pool(workers, initializer=_init_worker, initargs=(cache_path,)) as pool:
+        while next_task < len(tasks) or pending:
+            while next_task < len(tasks) and len(pending) < 2 * workers:
+                _, scenario, chunk = tasks[next_task]
+                pending.add(pool.submit(_run_scenario_chunk, scenario, chunk, options))
+                next_task += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results.append(future.result())
+    return {"population_cached": cached, "seconds": time.perf_counter() - start, "scenarios": summarize(names, results, num_profiles)}
+
+
+def summarize(names, results, num_profiles):
+    """
+    Per-scenario totals, plus the paired difference in events per profile against
+    the first scenario. Under common random numbers the paired standard error is
+    much smaller than the unpaired one, which is reported alongside for comparison.
+    """
+    events = {name: np.zeros(num_profiles) for name in names}
+    failed = {name: 0 for name in names}
+    for result in results:
+        for position, event_count, _, error in result["profiles"]:
+            events[result["scenario"]][position] = event_count
+            if error:
+                failed[result["scenario"]] += 1
+                logging.error("Scenario '%s', profile %d: %s", result["scenario"], position, error)
+    reference = events[names[0]]
+    summary = {}
+    for name in names:
+        diff = events[name] - reference
+        summary[name] = {
+            "profiles": num_profiles - failed[name],
+            "failed": failed[name],
+            "events": int(events[name].sum()),
+            "mean_events": float(events[name].mean()),
+            "diff_vs_reference": float(diff.mean()),
+            "paired_se": float(diff.std(ddof=1) / np.sqrt(num_profiles)) if num_profiles > 1 else 0.0,
+            "unpaired_se": float(np.sqrt((events[name].var(ddof=1) + reference.var(ddof=1)) / num_profiles)) if num_profiles > 1 else 0.0,
+        }
+    return summary
+
+
+def format_summary(summary, reference_name):
+    lines = [f"{'scenario':<28} {'profiles':>8} {'events':>10} {'mean':>8} {'diff vs ' + reference_name:>22} {'paired se':>10} {'unpaired se':>12}"]
+    for name, entry in summary.items():
+        lines.append(f"{name:<28} {entry['profiles']:>8} {entry['events']:>10} {entry['mean_events']:>8.1f} "
+                     f"{entry['diff_vs_reference']:>+22.2f} {entry['paired_se']:>10.2f} {entry['unpaired_se']:>12.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    # Example usage/test:
+    #   python scenarios.py [--scenarios FILE.json] [--profiles N] [--workers W] [--output DIR]
+    # FILE.json holds a list of {"name": ..., "overrides": {...}}; defaults to config.SWEEP_SCENARIOS.
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Run config scenarios over one shared base population with common random numbers.")
+    parser.add_argument("--scenarios", help="JSON file with the scenario list")
+    parser.add_argument("--profiles", type=int, help=f"Population size (default {config.SWEEP_NUM_PROFILES})")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--output", help=f"Output root (default {config.SWEEP_OUTPUT_DIR})")
+    args = parser.parse_args()
+    if args.scenarios:
+        with open(args.scenarios, 'r', encoding='utf-8') as f:
+            scenario_list = json.load(f)
+    else:
+        scenario_list = config.SWEEP_SCENARIOS
+    sweep = run_sweep(scenario_list, args.profiles, args.output, args.workers)
+    print(f"Swept {len(scenario_list)} scenarios in {sweep['seconds']:.1f}s (base population {'from cache' if sweep['population_cached'] else 'built and cached'}).")
+    print(format_summary(sweep["scenarios"], scenario_list[0]["name"]))
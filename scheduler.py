@@ -0,0 +1,423 @@
+# scheduler.py - Cost-Model-Based Parallel Scheduling of Skewed Profiles
+
+import os
+import sys
+import json
+import time
+import random
+import datetime
+import logging
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import utils
+    import event_store
+    import profile_state
+    import population
+    import simulation
+    import event_stream
+    import snapshots
+    import instrumentation
+    import profiling
+    import worker_pool
+except ImportError as e:
+    logging.error(f"Error importing modules in scheduler.py: {e}. Ensure config.py, utils.py, event_store.py, profile_state.py, population.py, simulation.py, event_stream.py, snapshots.py, instrumentation.py, profiling.py, and worker_pool.py exist.")
+    raise
+
+# A profile's cost is roughly its event count, and calculate_event_time_delta
+# makes the mean gap 72h / (activity_level * seasonal_boost). Base profiles are
+# sampled up front, each gets an expected event count from that rate, and
+# chunks are dispatched largest-first with sizes shrinking as the remaining
+# work shrinks (guided self-scheduling), so no core sits idle behind one long
+# static chunk at the end of the run.
+
+MEAN_GAP_HOURS = 72.0 # Mirrors utils.calculate_event_time_delta
+MIN_ACTIVITY = 0.05
+_ACTIVITY_LEVEL_INDEX = profile_state.param_index("activity_level")
+
+
+def boosted_hours(start_date, end_date):
+    """
+    Hours in [start_date, end_date) weighted by the seasonal boost of each day,
+    i.e. the integral of utils.get_seasonal_boost_from_config over the window.
+    """
+    hours = 0.0
+    day = datetime.datetime(start_date.year, start_date.month, start_date.day)
+    while day < end_date:
+        next_day = day + datetime.timedelta(days=1)
+        covered = (min(next_day, end_date) - max(day, start_date)).total_seconds() / 3600.0
+        hours += covered * utils.get_seasonal_boost_from_config(day)
+        day = next_day
+    return hours
+
+
+def estimate_events(activity_levels, start_date, end_date):
+    """
+    Expected events per profile over the window from the event-rate model.
+
+    Args:
+        activity_levels (array-like): Each profile's activity_level parameter.
+        start_date, end_date (datetime.datetime): The simulated window.
+
+    Returns:
+        np.ndarray: Expected event counts.
+    """
+    return np.maximum(MIN_ACTIVITY, np.asarray(activity_levels, dtype=float)) * (boosted_hours(start_date, end_date) / MEAN_GAP_HOURS)
+
+
+def plan_chunks(costs, workers, chunks_per_worker=None, min_chunk=None, max_chunk=None):
+    """
+    Orders work largest-first and cuts it into decreasing chunks.
+
+    Each chunk takes the next profiles until its cost reaches the remaining cost
+    divided by (workers * chunks_per_worker), within [min_chunk, max_chunk] profiles.
+
+    Args:
+        costs (array-like): Estimated cost per item.
+        workers (int): Worker processes the chunks are spread over.
+
+    Returns:
+        list: Chunks as lists of positions into `costs`, in dispatch order.
+    """
+    chunks_per_worker = chunks_per_worker or config.SCHEDULER_CHUNKS_PER_WORKER
+    min_chunk = min_chunk or config.SCHEDULER_MIN_CHUNK
+    max_chunk = max_chunk or config.SCHEDULER_MAX_CHUNK
+    costs = np.asarray(costs, dtype=float)
+    order = np.argsort(-costs, kind="stable").tolist()
+    remaining = float(costs.sum())
+    chunks = []
+    position = 0
+    while position < len(order):
+        target = remaining / (workers * chunks_per_worker)
+        chunk, chunk_cost = [], 0.0
+        while position < len(order) and len(chunk) < max_chunk and (len(chunk) < min_chunk or chunk_cost < target):
+            chunk.append(order[position])
+            chunk_cost += costs[order[position]]
+            position += 1
+        chunks.append(chunk)
+        remaining -= chunk_cost
+    return chunks
+
+
+# --- Worker Side ---
+
+_worker_profiler = None # This worker's SampledProfiler; its samples accumulate over all of its chunks
+
+
+def _reseed_worker():
+    """Pool initializer: forked workers inherit the parent's generator state, so give each its own stream."""
+    random.seed()
+    np.random.seed()
+
+
+def _write_profile(profile, file_path):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False, default=event_store.json_default)
+
+
+def _run_chunk(profiles, options, chunk_id=0):
+    """
+    Simulates and writes one chunk of profiles (one-row population batches) in a worker, with the same
+    optional outputs as the sequential loop: end-of-run snapshots, event shards
+    (one set per chunk), instrumentation and sampled profiling.
+
+    Returns:
+        dict: {"pid", "busy_seconds", "profiles": [(index, events, seconds, error), ...],
+            "instrumentation": report or None, "profile_samples", "profile_path", "shard_paths"}.
+    """
+    global _worker_profiler
+    start = time.perf_counter()
+    seed = options["seed"]
+    snapshot_dir = options["snapshot_dir"]
+    rows = []
+
+    def write(index, profile):
+        file_name = f"{options['prefix']}{index:0{options['digits']}d}.json"
+        _write_profile(profile, os.path.join(options["output_dir"], file_name))
+
+    collector = instrumentation.enable() if options["instrumentation"] else None
+    profiler = None
+    if options["profiling"]:
+        if _worker_profiler is None:
+            _worker_profiler = profiling.SampledProfiler(**options["profiling"])
+        profiler = _worker_profiler
+    samples_before = profiler.samples if profiler else 0
+    shard_writer = event_stream.ShardWriter(options["shard_dir"], name_prefix=f"shard_c{chunk_id:05d}_") if options["shard_dir"] else None
+    try:
+        for item in profiles:
+            index = item["profile_id_index"]
+            profile_start = time.perf_counter()
+            if profiler:
+                profiler.start(index) # Same profiles are sampled as in the sequential loop
+            try:
+                if seed is not None:
+                    # Per-profile streams: the output does not depend on chunking or worker count
+                    population.seed_profile(seed, index)
+                result = simulation.simulate_activity(item["batch"].profile(0), finalize=not snapshot_dir)
+                if not result:
+                    raise ValueError("Simulation failed to produce a final profile.")
+                if snapshot_dir:
+                    snapshots.save_profile(result, snapshot_dir, index, options["simulation_end_date"])
+                    result = simulation.finalize_profile(result)
+                write(index, result)
+                if shard_writer:
+                    shard_writer.add(result)
+                rows.append((index, len(result["activity_log"]), time.perf_counter() - profile_start, None))
+            except Exception as e:
+                rows.append((index, 0, time.perf_counter() - profile_start, str(e)))
+            if profiler:
+                profiler.stop()
+        shard_paths = shard_writer.close() if shard_writer else []
+    finally:
+        if collector:
+            instrumentation.disable() # A fresh collector per chunk; the parent adds the reports up
+
+    profile_path = None
+    if profiler and profiler.samples > samples_before:
+        # Rewritten after every sampled chunk, so the file always holds all of this worker's samples
+        profile_path = profiler.write(options["profiling_dir"], worker_id=os.getpid())
+    return {
+        "pid": os.getpid(), "busy_seconds": time.perf_counter() - start, "profiles": rows,
+        "instrumentation": collector.report() if collector else None,
+        "profile_samples": (profiler.samples - samples_before) if profiler else 0,
+        "profile_path": profile_path,
+        "shard_paths": shard_paths,
+    }
+
+
+# --- Parent Side ---
+
+def sample_workload(start_index, num_profiles, simulation_start_date, simulation_end_date=None):
+    """
+    Samples all base profiles (as population batches) and estimates each one's event count.
+
+    Returns:
+        tuple: (list of (batch, row) per profile in index order, np.ndarray of expected events).
+    """
+    simulation_end_date = simulation_end_date or simulation_start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
+    rows, activity = [], []
+    index = start_index
+    while index < start_index + num_profiles:
+        batch = population.sample_population(index, min(config.POPULATION_BATCH_SIZE, start_index + num_profiles - index), simulation_start_date)
+        rows.extend((batch, row) for row in range(len(batch)))
+        activity.append(batch.params[:, _ACTIVITY_LEVEL_INDEX])
+        index += len(batch)
+    expected = estimate_events(np.concatenate(activity) if activity else [], simulation_start_date, simulation_end_date)
+    return rows, expected
+
+
+def generate_parallel(start_index, num_profiles, simulation_start_date, output_dir, workers=None):
+    """
+    Generates profiles across worker processes with cost-model-based scheduling.
+
+    Base profiles are sampled in the parent; workers simulate and write each
+    profile's JSON file exactly as the sequential loop in generate_profiles.py does,
+    including snapshots (config.SNAPSHOT_DIR; the parent writes the manifest),
+    event shards (config.EVENT_STREAM_SHARD_DIR), instrumentation
+    (config.INSTRUMENTATION_ENABLED) and sampled profiling (config.PROFILING_EVERY_N).
+    With config.RANDOM_SEED set, profiles are seeded per profile, so
+    the output does not depend on the worker count or chunking.
+
+    Returns:
+        dict: {"generated", "failed", "errors": {index: message}, "load_balance": report,
+            "instrumentation": merged report or None, "profile_path", "profile_samples", "shard_paths"}.
+    """
+    workers = worker_pool.worker_count(workers)
+    wall_start = time.perf_counter()
+    simulation_end_date = simulation_start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
+    rows, expected = sample_workload(start_index, num_profiles, simulation_start_date, simulation_end_date)
+    chunks = plan_chunks(expected, workers)
+    logging.info("Scheduled %d profiles in %d chunks over %d workers (largest first; expected events %.0f..%.0f per profile)",
+                 num_profiles, len(chunks), workers, float(expected.min()) if len(expected) else 0.0, float(expected.max()) if len(expected) else 0.0)
+    options = {
+        "seed": config.RANDOM_SEED, "output_dir": output_dir,
+        "prefix": config.FILENAME_PREFIX, "digits": config.FILENAME_DIGITS,
+        "snapshot_dir": config.SNAPSHOT_DIR, "simulation_end_date": simulation_end_date,
+        "shard_dir": config.EVENT_STREAM_SHARD_DIR,
+        "instrumentation": config.INSTRUMENTATION_ENABLED,
+        "profiling": {"every_n": config.PROFILING_EVERY_N, "trace_memory": config.PROFILING_TRACE_MEMORY, "top_n": config.PROFILING_TOP_N} if config.PROFILING_EVERY_N else None,
+        "profiling_dir": config.PROFILING_OUTPUT_DIR,
+    }
+    if options["snapshot_dir"]:
+        os.makedirs(options["snapshot_dir"], exist_ok=True)
+    if options["profiling"]:
+        profiling.clear_worker_outputs(options["profiling_dir"])
+
+    def build(chunk):
+        items = []
+        for position in chunk:
+            batch, row = rows[position]
+            # Split out in the worker: a pickled profile's sets can iterate in another order, which would
+            # change the seeded draws that pick from them
+            items.append({"profile_id_index": start_index + position, "batch": batch.row(row)})
+            rows[position] = None # The parent keeps no reference once dispatched
+        return items
+
+    results = []
+    pending = set()
+    next_chunk = 0
+    with worker_pool.create_pool(workers, initializer=_reseed_worker) as pool:
+        # Two chunks in flight per worker: workers never wait on the parent, and the
+        # dispatch order (largest first) is kept rather than pre-queued wholesale
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < 2 * workers:
+                pending.add(pool.submit(_run_chunk, build(chunks[next_chunk]), options, next_chunk))
+                next_chunk += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results.append(future.result())
+    wall_seconds = time.perf_counter() - wall_start
+
+    errors = {index: error for result in results for index, _, _, error in result["profiles"] if error}
+    for index, error in sorted(errors.items()):
+        logging.error("Error processing profile %d: %s", index, error)
+    reports = [result["instrumentation"] for result in results if result["instrumentation"] is not None]
+    profile_samples = sum(result["profile_samples"] for result in results)
+    return {
+        "generated": num_profiles - len(errors),
+        "failed": len(errors),
+        "errors": errors,
+        "load_balance": load_balance_report(results, expected, start_index, workers, wall_seconds),
+        "instrumentation": instrumentation.merge_reports(reports) if options["instrumentation"] else None,
+        "profile_path": profiling.merge_outputs(options["profiling_dir"]) if profile_samples else None,
+        "profile_samples": profile_samples,
+        "shard_paths": sorted(path for result in results for path in result["shard_paths"]),
+    }
+
+
+def load_balance_report(results, expected, start_index, workers, wall_seconds):
+    """
+    Summarizes how evenly the work was spread.
+
+    balance is mean / max busy time per worker (1.0 = perfectly even); static_balance
+    is the same figure for contiguous equal-count chunks over the measured
+    per-profile times, i.e. what naive static chunking would have achieved.
+    prediction_r is the correlation of expected and actual event counts.
+    """
+    busy = {}
+    seconds = np.zeros(len(expected))
+    events = np.zeros(len(expected))
+    for result in results:
+        busy[result["pid"]] = busy.get(result["pid"], 0.0) + result["busy_seconds"]
+        for index, event_count, profile_seconds, _ in result["profiles"]:
+            seconds[index - start_index] = profile_seconds
+            events[index - start_index] = event_count
+    busy_times = list(busy.values()) + [0.0] * max(0, workers - len(busy)) # Workers that never got a chunk
+    static_blocks = [block.sum() for block in np.array_split(seconds, workers)] if len(seconds) else [0.0]
+    correlated = len(expected) > 1 and expected.std() > 0 and events.std() > 0
+    return {
+        "workers": workers,
+        "profiles": len(expected),
+        "wall_seconds": wall_seconds,
+        "busy_seconds": sorted(busy_times, reverse=True),
+        "balance": float(np.mean(busy_times) / max(busy_times)) if max(busy_times) > 0 else 1.0,
+        "utilization": float(sum(busy_times) / (workers * wall_seconds)) if wall_seconds > 0 else 0.0,
+        "static_balance": float(np.mean(static_blocks) / max(static_blocks)) if max(static_blocks) > 0 else 1.0,
+        "prediction_r": float(np.corrcoef(expected, events)[0, 1]) if correlated else None,
+        "expected_events": float(expected.sum()),
+        "actual_events": float(events.sum()),
+    }
+
+
+def format_load_balance(report):
+    """One-paragraph text version of load_balance_report()."""
+    r = "n/a" if report["prediction_r"] is None else f"{report['prediction_r']:.2f}"
+    return (f"Load balance over {report['workers']} workers: balance {report['balance']:.2f} "
+            f"(static chunking would have been {report['static_balance']:.2f}), utilization {report['utilization']:.2f}, "
+            f"busy {min(report['busy_seconds']):.1f}-{max(report['busy_seconds']):.1f}s of {report['wall_seconds']:.1f}s wall; "
+            f"events expected {report['expected_events']:.0f} vs actual {report['actual_events']:.0f} (r = {r})")
+
+
+# --- Sequential/Parallel Determinism Check ---
+
+CHECK_START_DATE = "2020-01-01"
+
+
+def _generate_for_check(mode, num_profiles, output_dir, seed, days, workers):
+    """Child side of compare_with_sequential: one generate_profiles.py run with the check's settings."""
+    import generate_profiles # Imported here: generate_profiles imports this module
+    config.NUM_PROFILES_TO_GENERATE = num_profiles
+    config.OUTPUT_DIR = output_dir
+    config.RANDOM_SEED = seed
+    config.SIMULATION_START_DATE = CHECK_START_DATE
+    config.SIMULATION_DURATION_DAYS = days
+    config.PARALLEL_GENERATION = mode == "parallel"
+    config.WORKER_COUNT = workers
+    config.SNAPSHOT_DIR = config.EVENT_STREAM_SHARD_DIR = None
+    config.INSTRUMENTATION_ENABLED = False
+    config.PROFILING_EVERY_N = 0
+    generate_profiles.main()
+
+
+def _load_outputs(output_dir):
+    outputs = {}
+    for file_name in sorted(os.listdir(output_dir)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(output_dir, file_name), 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+            profile.pop("generation_timestamp", None) # Wall clock, not simulated
+            outputs[file_name] = profile
+    return outputs
+
+
+def compare_with_sequential(num_profiles=20, output_dir="scheduler_check", seed=7, days=90, workers=None):
+    """
+    Checks that a seeded parallel run writes the same profiles as a sequential one.
+
+    Each run is a separate interpreter with its own PYTHONHASHSEED, so the check
+    also catches draws that depend on set iteration order.
+
+    Returns:
+        tuple: (file names that differ or exist in only one run, number of files compared).
+    """
+    import subprocess
+    runs = {}
+    for hash_seed, mode in enumerate(("sequential", "parallel"), start=1):
+        run_dir = os.path.join(output_dir, mode)
+        os.makedirs(run_dir, exist_ok=True)
+        for file_name in os.listdir(run_dir): # Files of an earlier, larger check would compare as missing
+            if file_name.endswith(".json"):
+                os.remove(os.path.join(run_dir, file_name))
+        env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+        command = [sys.executable, os.path.abspath(__file__), "generate", mode, str(num_profiles), run_dir, str(seed), str(days), str(workers or 0)]
+        subprocess.run(command, env=env, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        runs[mode] = _load_outputs(run_dir)
+    sequential, parallel = runs["sequential"], runs["parallel"]
+    mismatched = sorted(name for name in set(sequential) | set(parallel) if sequential.get(name) != parallel.get(name))
+    return mismatched, len(set(sequential) | set(parallel))
+
+
+if __name__ == '__main__':
+    # Example usage/test: generate a small population in parallel and print the load balance
+    #   python scheduler.py [NUM_PROFILES] [WORKERS] [OUTPUT_DIR]
+    # Check that sequential and parallel runs (separate interpreters, different PYTHONHASHSEED) match:
+    #   python scheduler.py compare [NUM_PROFILES] [WORKERS] [OUTPUT_DIR]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger().setLevel(logging.WARNING)
+    if len(sys.argv) > 1 and sys.argv[1] == "generate":
+        mode, num_profiles, output_dir, seed, days, workers = sys.argv[2:8]
+        _generate_for_check(mode, int(num_profiles), output_dir, int(seed), int(days), int(workers) or None)
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        num_profiles = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        output_dir = sys.argv[4] if len(sys.argv) > 4 else "scheduler_check"
+        mismatched, compared = compare_with_sequential(num_profiles, output_dir, workers=workers)
+        if mismatched or not compared:
+            print(f"FAIL: {len(mismatched)} of {compared} profiles differ between sequential and parallel runs: {mismatched[:10]}")
+            sys.exit(1)
+        print(f"PASS: {compared} profiles identical between sequential and parallel runs.")
+        sys.exit(0)
+    num_profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else "scheduler_output"
+    os.makedirs(output_dir, exist_ok=True)
+    start_date = datetime.datetime(2020, 1, 1)
+    summary = generate_parallel(0, num_profiles, start_date, output_dir, workers)
+    print(f"Generated {summary['generated']} profiles ({summary['failed']} failed) in '{output_dir}'.")
+    print(format_load_balance(summary["load_balance"]))
@@ -11,10 +11,22 @@ try:
     import config
     import utils
     import event_generator
+    import profile_state
+    import event_store
+    import param_samplers
 except ImportError as e:
-    logging.error(f"Error importing modules in simulation.py: {e}. Ensure config.py, utils.py, and event_generator.py exist.")
+    logging.error(f"Error importing modules in simulation.py: {e}. Ensure config.py, utils.py, event_generator.py, profile_state.py, event_store.py, and param_samplers.py exist.")
     raise
 
+# Behavioral parameters read on every event-type draw, resolved to their fixed array indices once
+_EVENT_WEIGHT_PARAM_INDICES = tuple(profile_state.param_index(name) for name in (
+    "activity_level", "deal_seeking_propensity", "review_read_propensity", "review_write_propensity",
+    "cart_abandon_propensity", "return_propensity", "wishlist_usage_propensity", "prime_video_engagement",
+    "amazon_music_engagement", "kindle_engagement", "audible_engagement", "alexa_shopping_propensity",
+    "subscribe_save_propensity",
+))
+_ACTIVITY_LEVEL_INDEX = profile_state.param_index("activity_level")
+
 def check_for_minor_life_event(profile, days_since_last_event):
     """
     Checks if a minor life event occurs and updates profile state, potentially
@@ -27,126 +39,146 @@ def check_for_minor_life_event(profile, days_since_last_event):
     Returns:
         bool: True if an event occurred, False otherwise.
     """
-    state = profile["_internal_state"]
-    # Probability increases slightly over time
-    daily_prob = (config.MINOR_EVENT_YEARLY_PROB / 365.0) * (1 + days_since_last_event / (365 * 2.5)) # Slower increase
-
-    if random.random() < daily_prob:
-        if not config.MINOR_LIFE_EVENT_TYPES: return False
-
-        chosen_event = random.choice(config.MINOR_LIFE_EVENT_TYPES)
-        event_timestamp = state["current_timestamp"]
-        current_age = state["current_age"]
-        profile_id = profile.get("profile_id", "N/A")
-        logging.info(f"Profile {profile_id} experienced minor life event: {chosen_event['name']} at age {current_age:.1f}")
-
-        # Apply effects
-        effect = chosen_event["effect"]
-        behavioral_params = state.get("behavioral_params", {})
-
-        # 1. Adjust Behavioral Parameters
-        if "param_adjust" in effect:
-            for param, adjustment in effect["param_adjust"].items():
-                if param in behavioral_params:
-                    current_value = behavioral_params[param]
-                    # Apply adjustment (can be additive or multiplicative based on config if needed)
-                    new_value = current_value + adjustment # Simple additive adjustment
-                    # Clamp the value back to its original range defined in config, if range exists
-                    param_config = config.BEHAVIORAL_PARAMS_CONFIG.get(param)
-                    if param_config and "range" in param_config:
-                        min_val, max_val = param_config["range"]
-                        if new_value is not None: # Ensure value is not None before clamping
-                            new_value = max(min_val, min(max_val, new_value))
-                    behavioral_params[param] = new_value
-                    logging.debug(f"  Param '{param}' adjusted to: {new_value:.3f}")
-                else:
-                    logging.warning(f"  Attempted to adjust non-existent param '{param}' for profile {profile_id}")
-
-        # 2. Shift Interests
-        if "interest_shift" in effect:
-            new_interests = set()
-            # Handle placeholder for hobby dynamically
-            if "Related Hobby Supplies" in effect["interest_shift"]:
-                # Pick a random hobby category if not already present
-                hobby_cats = [i for i in config.BASE_INTEREST_CATEGORIES if any(h in i.lower() for h in ["hobby", "craft", "sport", "outdoor", "music", "collectible", "game"])]
-                available_hobbies = [h for h in hobby_cats if h not in state["current_interests"]]
-                if available_hobbies:
-                    new_interests.add(random.choice(available_hobbies))
-                # Add other specified interests
-                new_interests.update(i for i in effect["interest_shift"] if i != "Related Hobby Supplies")
-            else:
-                new_interests.update(effect["interest_shift"])
-
-            if new_interests:
-                state["current_interests"].update(new_interests)
-                # Optional: Prune oldest interests if list gets too long?
-                max_interests = 25 # Example limit
-                if len(state["current_interests"]) > max_interests:
-                     # Simple pruning: remove random interests beyond the new ones
-                     interests_to_prune = list(state["current_interests"] - new_interests)
-                     num_to_remove = len(state["current_interests"]) - max_interests
-                     if num_to_remove > 0 and len(interests_to_prune) >= num_to_remove:
-                          removed = random.sample(interests_to_prune, num_to_remove)
-                          state["current_interests"].difference_update(removed)
-
-                logging.debug(f"  Minor interest shift. Added: {new_interests}. New count: {len(state['current_interests'])}")
-
-        # Record the minor event
-        profile.setdefault("life_events", []).append({
-            "timestamp": utils.format_iso_timestamp(event_timestamp),
-            "event_name": chosen_event["name"],
-            "age_at_event": round(current_age, 1),
-            "details": {"type": "minor"} # Could add params before/after if needed
-        })
-        return True # Event occurred
+    if random.random() < minor_life_event_probability(days_since_last_event):
+        return apply_minor_life_event(profile)
     return False # No event
 
 
+def minor_life_event_probability(days_since_last_event):
+    """Daily chance of a minor life event; increases slightly with time since the last one (works on NumPy arrays too)."""
+    return (config.MINOR_EVENT_YEARLY_PROB / 365.0) * (1 + days_since_last_event / (365 * 2.5)) # Slower increase
+
+
+def apply_minor_life_event(profile):
+    """
+    Picks a minor life event and applies its effects (parameter adjustments,
+    interest shifts) to the profile state, recording it in 'life_events'.
+
+    Args:
+        profile (dict): The customer profile dictionary.
+
+    Returns:
+        bool: True if an event was applied.
+    """
+    state = profile["_internal_state"]
+    if not config.MINOR_LIFE_EVENT_TYPES: return False
+
+    chosen_event = random.choice(config.MINOR_LIFE_EVENT_TYPES)
+    event_timestamp = state["current_timestamp"]
+    current_age = state["current_age"]
+    profile_id = profile.get("profile_id", "N/A")
+    logging.debug("Profile %s experienced minor life event: %s at age %.1f", profile_id, chosen_event["name"], current_age)
+
+    # Apply effects
+    effect = chosen_event["effect"]
+    behavioral_params = state.get("behavioral_params", {})
+
+    # 1. Adjust Behavioral Parameters (pre-resolved at startup; unknown params already reported there)
+    for param, _, adjustment, min_val, max_val in param_samplers.MINOR_EVENT_ADJUSTMENTS.get(chosen_event["name"], ()):
+        new_value = max(min_val, min(max_val, behavioral_params[param] + adjustment)) # Simple additive adjustment, clamped to range
+        behavioral_params[param] = new_value
+        logging.debug("  Param '%s' adjusted to: %.3f", param, new_value)
+
+    # 2. Shift Interests
+    if "interest_shift" in effect:
+        new_interests = set()
+        # Handle placeholder for hobby dynamically
+        if "Related Hobby Supplies" in effect["interest_shift"]:
+            # Pick a random hobby category if not already present
+            hobby_cats = [i for i in config.BASE_INTEREST_CATEGORIES if any(h in i.lower() for h in ["hobby", "craft", "sport", "outdoor", "music", "collectible", "game"])]
+            available_hobbies = [h for h in hobby_cats if h not in state["current_interests"]]
+            if available_hobbies:
+                new_interests.add(random.choice(available_hobbies))
+            # Add other specified interests
+            new_interests.update(i for i in effect["interest_shift"] if i != "Related Hobby Supplies")
+        else:
+            new_interests.update(effect["interest_shift"])
+
+        if new_interests:
+            state["current_interests"].update(new_interests)
+            # Optional: Prune oldest interests if list gets too long?
+            max_interests = 25 # Example limit
+            if len(state["current_interests"]) > max_interests:
+                 # Simple pruning: remove random interests beyond the new ones
+                 interests_to_prune = sorted(state["current_interests"] - new_interests) # Hash-order independent, so seeded runs reproduce
+                 num_to_remove = len(state["current_interests"]) - max_interests
+                 if num_to_remove > 0 and len(interests_to_prune) >= num_to_remove:
+                      removed = random.sample(interests_to_prune, num_to_remove)
+                      state["current_interests"].difference_update(removed)
+
+            logging.debug("  Minor interest shift. Added: %s. New count: %d", new_interests, len(state["current_interests"]))
+
+    # Record the minor event
+    profile.setdefault("life_events", []).append({
+        "timestamp": utils.format_iso_timestamp(event_timestamp),
+        "event_name": chosen_event["name"],
+        "age_at_event": round(current_age, 1),
+        "details": {"type": "minor"} # Could add params before/after if needed
+    })
+    return True # Event occurred
+
+
+# State flags that gate event weights, in the order returned by event_context_flags
+EVENT_CONTEXT_FLAGS = (
+    "has_cart", "has_shipped_order", "has_delivered_order", "is_prime", "has_music_access", "has_kindle_access",
+    "has_audible_access", "has_echo", "has_wholefoods_service", "has_subscribesave_service", "has_pharmacy_service",
+    "has_photos_service", "has_aws_service",
+)
+
+def event_context_flags(state):
+    """
+    Evaluates the contextual state flags used to weight event types.
+
+    Args:
+        state (profile_state.ProfileState): The '_internal_state' of the profile.
+
+    Returns:
+        tuple: Booleans in EVENT_CONTEXT_FLAGS order.
+    """
+    used_services = state.used_services
+    current_interests = state.current_interests
+    return (
+        bool(state.cart),
+        profile_state.has_order_with_status(state, "shipped"), # Status counts, not a scan over every order
+        profile_state.has_order_with_status(state, "delivered"),
+        bool(state.is_prime),
+        any(s in used_services for s in ["Amazon Music Unlimited", "Prime Music (Bundled)"]),
+        any(s in used_services for s in ["Kindle Unlimited", "Prime Reading"]) or any(i in current_interests for i in ["Kindle Store", "Books (Physical)"]),
+        "Audible Membership (Premium Plus/Plus)" in used_services or "Audible Books & Originals" in current_interests,
+        any("Echo" in d for d in state.devices),
+        "Amazon Fresh/Whole Foods Delivery" in used_services,
+        "Subscribe & Save" in used_services,
+        "Amazon Pharmacy" in used_services,
+        "Amazon Photos" in used_services,
+        "AWS Usage (Free/Paid)" in used_services,
+    )
+
+
 def determine_next_event_type(profile_state):
     """
     Determines the next event type based on weighted probabilities derived
     from the profile's behavioral parameters and base weights.
 
     Args:
-        profile_state (dict): The '_internal_state' of the profile.
+        profile_state (profile_state.ProfileState): The '_internal_state' of the profile.
 
     Returns:
         str: The chosen event type, or None if no events are possible.
     """
     event_weights = defaultdict(float)
     base_weights = config.BASE_EVENT_WEIGHTS
-    params = profile_state.get("behavioral_params", {})
+    params = profile_state.behavioral_params.values
 
     # --- Get key parameters ---
-    activity_level = params.get("activity_level", 0.5)
-    deal_propensity = params.get("deal_seeking_propensity", 0.5)
-    review_read_propensity = params.get("review_read_propensity", 0.5)
-    review_write_propensity = params.get("review_write_propensity", 0.1)
-    cart_abandon_propensity = params.get("cart_abandon_propensity", 0.3)
-    return_propensity = params.get("return_propensity", 0.1)
-    wishlist_propensity = params.get("wishlist_usage_propensity", 0.3)
-    prime_video_engagement = params.get("prime_video_engagement", 0.5)
-    music_engagement = params.get("amazon_music_engagement", 0.5)
-    kindle_engagement = params.get("kindle_engagement", 0.5)
-    audible_engagement = params.get("audible_engagement", 0.4)
-    alexa_shopping_propensity = params.get("alexa_shopping_propensity", 0.1)
-    subscribe_save_propensity = params.get("subscribe_save_propensity", 0.2)
+    (activity_level, deal_propensity, review_read_propensity, review_write_propensity,
+     cart_abandon_propensity, return_propensity, wishlist_propensity, prime_video_engagement,
+     music_engagement, kindle_engagement, audible_engagement, alexa_shopping_propensity,
+     subscribe_save_propensity) = [params[i] for i in _EVENT_WEIGHT_PARAM_INDICES]
 
     # --- Contextual state ---
-    is_prime = profile_state.get("is_prime", False)
-    has_echo = any("Echo" in d for d in profile_state.get("devices", []))
-    has_kindle_access = any(s in profile_state.get("used_services", set()) for s in ["Kindle Unlimited", "Prime Reading"]) or any(i in profile_state.get("current_interests", set()) for i in ["Kindle Store", "Books (Physical)"])
-    has_audible_access = "Audible Membership (Premium Plus/Plus)" in profile_state.get("used_services", set()) or "Audible Books & Originals" in profile_state.get("current_interests", set())
-    has_music_access = any(s in profile_state.get("used_services", set()) for s in ["Amazon Music Unlimited", "Prime Music (Bundled)"])
-    has_cart = bool(profile_state.get("cart", []))
-    has_orders = bool(profile_state.get("orders", []))
-    has_shipped_order = any(o.get("status") == "shipped" for o in profile_state.get("orders", []))
-    has_delivered_order = any(o.get("status") == "delivered" for o in profile_state.get("orders", []))
-    has_subscribesave_service = "Subscribe & Save" in profile_state.get("used_services", set())
-    has_wholefoods_service = "Amazon Fresh/Whole Foods Delivery" in profile_state.get("used_services", set())
-    has_pharmacy_service = "Amazon Pharmacy" in profile_state.get("used_services", set())
-    has_photos_service = "Amazon Photos" in profile_state.get("used_services", set())
-    has_aws_service = "AWS Usage (Free/Paid)" in profile_state.get("used_services", set())
+    (has_cart, has_shipped_order, has_delivered_order, is_prime, has_music_access, has_kindle_access,
+     has_audible_access, has_echo, has_wholefoods_service, has_subscribesave_service, has_pharmacy_service,
+     has_photos_service, has_aws_service) = event_context_flags(profile_state)
 
 
     # --- Adjust weights based on parameters and state ---
@@ -207,7 +239,7 @@ def determine_next_event_type(profile_state):
     weights = list(event_weights.values())
 
     if not possible_events:
-        logging.warning(f"No possible events could be determined for profile {profile_state.get('profile_id', 'N/A')}. State: {profile_state}")
+        logging.warning("No possible events could be determined for profile %s; falling back to browse_category.", profile_state.get("profile_id", "N/A"))
         return "browse_category" # Fallback to browse if nothing else fits
 
     # Normalize weights before choosing? Optional, random.choices handles unnormalized.
@@ -219,116 +251,142 @@ def determine_next_event_type(profile_state):
     return chosen_event
 
 
-def simulate_activity(profile):
+def simulate_activity(profile, end_date=None, resume=False, finalize=True):
     """
     Simulates user activity over the defined period using behavioral parameters.
 
     Args:
         profile (dict): The base customer profile dictionary with '_internal_state'.
+        end_date (datetime.datetime, optional): End of the simulated window. Defaults to
+            SIMULATION_DURATION_DAYS after the state's current timestamp.
+        resume (bool): Continue a state saved at the end of an earlier run (see snapshots.py).
+            That run stopped with its next event already scheduled at `current_timestamp`,
+            so that event is generated first instead of drawing a new gap.
+        finalize (bool): Sort the log and drop '_internal_state' (finalize_profile). Pass
+            False to keep the end state, e.g. to snapshot it.
 
     Returns:
-        dict: The profile dictionary updated with 'activity_log', 'life_events',
-              and final state summaries. Returns None if simulation fails critically.
+        dict: The profile dictionary updated with 'activity_log' (an event_store.EventStore,
+              materialized to plain dicts at output), 'life_events', and final state
+              summaries. Returns None if simulation fails critically.
     """
     if "_internal_state" not in profile or "behavioral_params" not in profile["_internal_state"]:
         logging.error(f"Profile {profile.get('profile_id', 'N/A')} missing '_internal_state' or 'behavioral_params'. Cannot simulate.")
         return None
 
     state = profile["_internal_state"]
-    sim_start_date = state["current_timestamp"]
-    end_date = sim_start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
+    activity_log = profile.setdefault("activity_log", event_store.EventStore())
+    sim_start_date = state.current_timestamp
+    if end_date is None:
+        end_date = sim_start_date + datetime.timedelta(days=config.SIMULATION_DURATION_DAYS)
     start_sim_time = time.time()
     event_count = 0
     profile_id = profile.get("profile_id", "N/A")
 
-    logging.info(f"Simulating profile {profile_id} from {sim_start_date} to {end_date}")
+    logging.debug("Simulating profile %s from %s to %s", profile_id, sim_start_date, end_date)
 
-    while state["current_timestamp"] < end_date:
-        # 1. Calculate Time Delta to Next Event (using activity_level param)
-        time_delta_hours = utils.calculate_event_time_delta(
-            state["behavioral_params"]["activity_level"],
-            state["seasonal_boost"]
-        )
-
-        # 2. Advance Time
-        next_event_timestamp = state["current_timestamp"] + datetime.timedelta(hours=time_delta_hours)
-
-        # 3. Handle Session Timeouts
-        if (next_event_timestamp - state["last_event_timestamp"]).total_seconds() > 30 * 60:
-            state["current_session_id"] = utils.generate_session_id()
-            state["session_start_time"] = next_event_timestamp
-            state["events_in_session"] = 0
-            # logging.debug(f"New session {state['current_session_id']} started for profile {profile_id}") # Can be verbose
-
-        # 4. Check for Day Change & Daily/Periodic Updates
-        if next_event_timestamp.date() > state["current_timestamp"].date():
-            days_passed = (next_event_timestamp.date() - state["current_timestamp"].date()).days
-            state["time_since_last_minor_event"] = state.get("time_since_last_minor_event", 0) + days_passed
-            state["current_age"] += days_passed / 365.0
-            state["seasonal_boost"] = utils.get_seasonal_boost_from_config(next_event_timestamp)
-            # Check for minor life events that might perturb parameters
-            if check_for_minor_life_event(profile, state["time_since_last_minor_event"]):
-                state["time_since_last_minor_event"] = 0
-
-        # --- Update timestamp AFTER daily checks ---
-        state["current_timestamp"] = next_event_timestamp
-        if state["current_timestamp"] > end_date: break
+    pending_event = resume and state.current_timestamp <= end_date
+    while pending_event or state.current_timestamp < end_date:
+        if pending_event:
+            pending_event = False # Time, session and daily updates were applied before the earlier run stopped
+        else:
+            # 1. Calculate Time Delta to Next Event (using activity_level param)
+            time_delta_hours = utils.calculate_event_time_delta(
+                state.behavioral_params.values[_ACTIVITY_LEVEL_INDEX],
+                state.seasonal_boost
+            )
+
+            # 2. Advance Time
+            next_event_timestamp = state.current_timestamp + datetime.timedelta(hours=time_delta_hours)
+
+            # 3. Handle Session Timeouts
+            if (next_event_timestamp - state.last_event_timestamp).total_seconds() > 30 * 60:
+                state.current_session_id = state.ids.session_id()
+                state.session_start_time = next_event_timestamp
+                state.events_in_session = 0
+                # logging.debug(f"New session {state.current_session_id} started for profile {profile_id}") # Can be verbose
+
+            # 4. Check for Day Change & Daily/Periodic Updates
+            if next_event_timestamp.date() > state.current_timestamp.date():
+                days_passed = (next_event_timestamp.date() - state.current_timestamp.date()).days
+                state.time_since_last_minor_event += days_passed
+                state.current_age += days_passed / 365.0
+                state.seasonal_boost = utils.get_seasonal_boost_from_config(next_event_timestamp)
+                state.recent_orders.expire(next_event_timestamp) # Drop orders past the return/review windows
+                # Check for minor life events that might perturb parameters
+                if check_for_minor_life_event(profile, state.time_since_last_minor_event):
+                    state.time_since_last_minor_event = 0
+
+            # --- Update timestamp AFTER daily checks ---
+            state.current_timestamp = next_event_timestamp
+            if state.current_timestamp > end_date: break
 
         # 5. Determine Next Event Type (using refactored function)
         chosen_event_type = determine_next_event_type(state)
         if chosen_event_type is None:
-            # logging.warning(f"Could not determine next event for profile {profile_id} at {state['current_timestamp']}. Skipping step.")
-            state["last_event_timestamp"] = state["current_timestamp"]
+            # logging.warning(f"Could not determine next event for profile {profile_id} at {state.current_timestamp}. Skipping step.")
+            state.last_event_timestamp = state.current_timestamp
             continue
 
         # 6. Generate Event Details & Update State
         details = event_generator.generate_event_details(
             chosen_event_type,
             profile,
-            state["current_timestamp"]
+            state.current_timestamp
         )
 
-        # 7. Record Event
+        # 7. Record Event (copied into the columnar store; formatted only at output)
         if details:
-            event = {
-                "timestamp": utils.format_iso_timestamp(state["current_timestamp"]),
-                "event_type": chosen_event_type,
-                "details": details
-            }
-            profile["activity_log"].append(event)
+            activity_log.append(state.current_timestamp, chosen_event_type, details)
             event_count += 1
-            state["events_in_session"] += 1
-            state["last_event_timestamp"] = state["current_timestamp"]
+            state.events_in_session += 1
+            state.last_event_timestamp = state.current_timestamp
 
             # Log progress periodically (less frequently for longer sims)
             if event_count % 1000 == 0: # Log every 1000 events
                  elapsed = time.time() - start_sim_time
-                 time_elapsed_sim = state["current_timestamp"] - sim_start_date
+                 time_elapsed_sim = state.current_timestamp - sim_start_date
                  total_sim_duration = end_date - sim_start_date
                  percent_done = (time_elapsed_sim / total_sim_duration) * 100 if total_sim_duration.total_seconds() > 0 else 0
-                 logging.debug(f"  Profile {profile_id}: {event_count} events. Sim Time: {state['current_timestamp'].date()}. Progress: {percent_done:.1f}%. Elapsed Real: {elapsed:.1f}s")
+                 logging.debug("  Profile %s: %d events. Sim Time: %s. Progress: %.1f%%. Elapsed Real: %.1fs", profile_id, event_count, state.current_timestamp.date(), percent_done, elapsed)
         else:
              # logging.debug(f"Could not generate details for event '{chosen_event_type}' for profile {profile_id}. Skipping.")
-             state["last_event_timestamp"] = state["current_timestamp"]
+             state.last_event_timestamp = state.current_timestamp
 
     # --- Simulation End ---
     end_sim_time = time.time()
-    logging.info(f"Finished simulating profile {profile_id}. Generated {event_count} events in {end_sim_time - start_sim_time:.2f} seconds.")
+    logging.debug("Finished simulating profile %s. Generated %d events in %.2f seconds.", profile_id, event_count, end_sim_time - start_sim_time)
 
     # 8. Finalize Profile
-    profile["activity_log"].sort(key=lambda x: x["timestamp"])
+    return finalize_profile(profile) if finalize else profile
+
+
+def finalize_profile(profile):
+    """
+    Sorts the activity log, copies end-of-simulation state into the output
+    fields and drops '_internal_state'.
+
+    Args:
+        profile (dict): A simulated profile still holding '_internal_state'.
+
+    Returns:
+        dict: The finalized profile.
+    """
+    state = profile["_internal_state"]
+    profile_id = profile.get("profile_id", "N/A")
+    profile["activity_log"].sort_by_timestamp()
 
     # Update final demographic/status fields based on end state
-    profile["demographics"]["age_at_simulation_end"] = round(state["current_age"], 1)
-    profile["amazon_status"]["is_prime_member_final"] = state["is_prime"]
-    profile["amazon_status"]["used_services_final"] = sorted(list(state["used_services"]))
-    profile["interests_final"] = sorted(list(state["current_interests"]))
+    profile["demographics"]["age_at_simulation_end"] = round(state.current_age, 1)
+    profile["amazon_status"]["is_prime_member_final"] = state.is_prime
+    profile["amazon_status"]["used_services_final"] = sorted(list(state.used_services))
+    profile["interests_final"] = sorted(list(state.current_interests))
 
     # Remove internal state before saving
     try:
         del profile["_internal_state"]
     except KeyError:
-        logging.warning(f"'_internal_state' key not found during finalization for profile {profile_id}.")
+        logging.warning("'_internal_state' key not found during finalization for profile %s.", profile_id)
 
     return profile
 
@@ -354,7 +412,7 @@ if __name__ == '__main__':
                 # Print a small sample of the final profile
                 sample_output = {k: v for k, v in simulated_profile.items() if k != 'activity_log'}
                 sample_output['activity_log_sample_size'] = len(simulated_profile['activity_log'])
-                print(json.dumps(sample_output, indent=2, default=str))
+                print(json.dumps(sample_output, indent=2, default=event_store.json_default))
             else:
                 print("Simulation failed.")
         else:
@@ -0,0 +1,321 @@
+# snapshots.py - Saved Simulation State for Incremental Dataset Extension
+
+import os
+import glob
+import json
+import pickle
+import random
+import zlib
+import tempfile
+import datetime
+import logging
+import hashlib
+
+import numpy as np
+
+# Import necessary components from other modules
+try:
+    import config
+    import utils
+    import event_store
+    import event_stream
+    import profile_state
+    import population
+    import simulation
+except ImportError as e:
+    logging.error("Error importing modules in snapshots.py: %s. Ensure config.py, utils.py, event_store.py, event_stream.py, profile_state.py, population.py, and simulation.py exist.", e)
+    raise
+
+# Bump whenever the pickled state layout changes; older snapshots are then rejected.
+SNAPSHOT_VERSION = 2 # 2: generator state moved from the manifest into each profile's snapshot
+SNAPSHOT_SUFFIX = ".snapshot"
+STAGED_SUFFIX = ".staged" # Advanced snapshots of an extension, swapped in once its manifest is saved
+MANIFEST_NAME = "manifest.pkl" # Window end and extension history
+MANIFEST_SUMMARY_NAME = "manifest.json" # Human-readable copy
+
+
+def config_fingerprint():
+    """
+    Hash of the config tables a snapshot refers to by position: life stages and
+    devices are pickled as indices, behavioral parameters as a raw float array in
+    PARAM_NAMES order. Editing any of them invalidates existing snapshots.
+    """
+    tables = {
+        "life_stages": [ls["name"] for ls in config.LIFE_STAGES],
+        "devices": [d["name"] for d in config.DEVICE_TYPES],
+        "params": list(profile_state.PARAM_NAMES),
+    }
+    return hashlib.sha1(json.dumps(tables).encode('utf-8')).hexdigest()[:16]
+
+
+def _atomic_write(path, data):
+    """Writes bytes to `path` via a temporary file, so a crash never leaves a partial snapshot."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def snapshot_path(snapshot_dir, profile_index):
+    return os.path.join(snapshot_dir, f"{config.FILENAME_PREFIX}{profile_index:0{config.FILENAME_DIGITS}d}{SNAPSHOT_SUFFIX}")
+
+
+# --- Per-Profile Snapshots ---
+
+def save_profile(profile, snapshot_dir, profile_index, sim_end, staged=False):
+    """
+    Saves a simulated, not yet finalized profile (still holding '_internal_state')
+    as a compressed snapshot. The activity log is not included: an extension only
+    emits new events. Call it right after the profile's simulation: the current
+    position of the global `random` / `np.random` generators is saved with it, so
+    an extension continues this profile's own streams.
+
+    Args:
+        profile (dict): Profile returned by simulate_activity(..., finalize=False).
+        snapshot_dir (str): Directory for the snapshot files.
+        profile_index (int): Index of the profile (names the file).
+        sim_end (datetime.datetime): End of the window the profile was simulated to.
+        staged (bool): Write it under the staging name (see extend_dataset) instead.
+
+    Returns:
+        str: Path of the written snapshot.
+    """
+    skeleton = {k: v for k, v in profile.items() if k != "activity_log"}
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": config_fingerprint(),
+        "profile_index": profile_index,
+        "sim_end": sim_end,
+        "random_state": random.getstate(),
+        "numpy_state": np.random.get_state(),
+        "profile": skeleton,
+    }
+    path = snapshot_path(snapshot_dir, profile_index) + (STAGED_SUFFIX if staged else "")
+    _atomic_write(path, zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)))
+    return path
+
+
+def load_profile(path, restore_rng=False):
+    """
+    Loads a snapshot written by save_profile and, with `restore_rng`, restores the
+    generators to the position saved with it.
+
+    Returns:
+        tuple: (profile dict with '_internal_state' and an empty activity log, profile index, sim_end).
+
+    Raises:
+        ValueError: If the snapshot has another version or was written under different config tables.
+    """
+    with open(path, 'rb') as f:
+        payload = pickle.loads(zlib.decompress(f.read()))
+    if payload.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot {path} has version {payload.get('version')}, expected {SNAPSHOT_VERSION}")
+    if payload.get("fingerprint") != config_fingerprint():
+        raise ValueError(f"Snapshot {path} was written with different LIFE_STAGES/DEVICE_TYPES/behavioral parameters; regenerate it")
+    if restore_rng:
+        random.setstate(payload["random_state"])
+        np.random.set_state(payload["numpy_state"])
+    profile = payload["profile"]
+    profile["activity_log"] = event_store.EventStore()
+    return profile, payload["profile_index"], payload["sim_end"]
+
+
+# --- Run Manifest (window end and extensions) ---
+
+def save_manifest(snapshot_dir, sim_end, extensions=None):
+    """
+    Records the simulated window end and the extensions applied so far. Generator
+    state is per profile (see save_profile): in a parallel run the parent's
+    generators never drive a simulation.
+    """
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": config_fingerprint(),
+        "sim_end": sim_end,
+        "extensions": extensions or [],
+    }
+    _atomic_write(os.path.join(snapshot_dir, MANIFEST_NAME), pickle.dumps(manifest, protocol=pickle.HIGHEST_PROTOCOL))
+    summary = {k: manifest[k] for k in ("version", "fingerprint", "extensions")}
+    summary["sim_end"] = utils.format_iso_timestamp(sim_end)
+    _atomic_write(os.path.join(snapshot_dir, MANIFEST_SUMMARY_NAME), json.dumps(summary, indent=2).encode('utf-8'))
+
+
+def load_manifest(snapshot_dir):
+    """Loads the run manifest."""
+    with open(os.path.join(snapshot_dir, MANIFEST_NAME), 'rb') as f:
+        manifest = pickle.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("fingerprint") != config_fingerprint():
+        raise ValueError(f"Snapshot manifest in {snapshot_dir} does not match this version/config; regenerate the snapshots")
+    return manifest
+
+
+# --- Extension ---
+
+def _staged_paths(snapshot_dir):
+    return sorted(glob.glob(os.path.join(snapshot_dir, f"{config.FILENAME_PREFIX}*{SNAPSHOT_SUFFIX}{STAGED_SUFFIX}")))
+
+
+def _promote_staged(snapshot_dir):
+    """Swaps every staged snapshot in over its current one."""
+    for path in _staged_paths(snapshot_dir):
+        os.replace(path, path[:-len(STAGED_SUFFIX)])
+
+
+def _recover_staged(snapshot_dir, sim_end):
+    """
+    Resolves staged snapshots left by an interrupted extension: if the manifest was
+    already advanced to their window end, the swap is finished; otherwise the
+    extension never committed and they are discarded.
+    """
+    paths = _staged_paths(snapshot_dir)
+    if not paths:
+        return
+    if load_profile(paths[0])[2] == sim_end:
+        logging.warning("Finishing an interrupted extension: promoting %d staged snapshots in %s.", len(paths), snapshot_dir)
+        _promote_staged(snapshot_dir)
+    else:
+        logging.warning("Discarding %d staged snapshots of an uncommitted extension in %s.", len(paths), snapshot_dir)
+        for path in paths:
+            os.remove(path)
+
+
+def extend_dataset(snapshot_dir=None, days=None, output_dir=None, shard_dir=None):
+    """
+    Continues every snapshotted profile for `days` more days and writes only the
+    new events and life events (delta profile files), then advances the snapshots.
+
+    Each profile resumes from its saved state with the generators at the position
+    saved with it, so a seeded run extended by N days matches a run simulated over
+    the whole window in one go (see check_extension). The advanced snapshots are
+    written under staging names and only swapped in after the new manifest is
+    saved, so an interrupted extension leaves the snapshot set consistent (the
+    next call finishes or discards the staged files).
+
+    Args:
+        snapshot_dir (str, optional): Snapshot directory. Defaults to config.SNAPSHOT_DIR.
+        days (int, optional): Days to add. Defaults to config.SNAPSHOT_EXTEND_DAYS.
+        output_dir (str, optional): Where to write the delta profiles. Defaults to
+            <snapshot_dir>/delta_<days>d (delta files share the full profiles' names).
+        shard_dir (str, optional): If set, the delta events are also written as sorted shards.
+
+    Returns:
+        int: Number of profiles extended.
+    """
+    snapshot_dir = snapshot_dir or config.SNAPSHOT_DIR
+    days = days or config.SNAPSHOT_EXTEND_DAYS
+    output_dir = output_dir or os.path.join(snapshot_dir, f"delta_{days}d")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(snapshot_dir)
+    _recover_staged(snapshot_dir, manifest["sim_end"])
+    old_end = manifest["sim_end"]
+    new_end = old_end + datetime.timedelta(days=days)
+    logging.info("Extending snapshots in %s from %s to %s (%d days)", snapshot_dir, old_end, new_end, days)
+
+    shard_writer = event_stream.ShardWriter(shard_dir) if shard_dir else None
+    extended = 0
+    event_count = 0
+    for path in sorted(glob.glob(os.path.join(snapshot_dir, f"{config.FILENAME_PREFIX}*{SNAPSHOT_SUFFIX}"))):
+        profile, profile_index, sim_end = load_profile(path, restore_rng=True)
+        if sim_end != old_end:
+            logging.warning("Snapshot %s ends at %s, not at the manifest's %s. Skipping.", path, sim_end, old_end)
+            continue
+        known_life_events = len(profile.get("life_events", []))
+        profile = simulation.simulate_activity(profile, end_date=new_end, resume=True, finalize=False)
+        if not profile:
+            logging.error("Extension failed for snapshot %s.", path)
+            continue
+        save_profile(profile, snapshot_dir, profile_index, new_end, staged=True)
+
+        # Delta output: same profile layout, only what happened after old_end
+        delta = simulation.finalize_profile(profile)
+        delta["life_events"] = delta["life_events"][known_life_events:]
+        delta["simulation_period_start"] = utils.format_iso_timestamp(old_end)
+        delta["simulation_period_end"] = utils.format_iso_timestamp(new_end)
+        file_path = os.path.join(output_dir, f"{config.FILENAME_PREFIX}{profile_index:0{config.FILENAME_DIGITS}d}.json")
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(delta, f, indent=2, ensure_ascii=False, default=event_store.json_default)
+        if shard_writer:
+            shard_writer.add(delta)
+        extended += 1
+        event_count += len(delta["activity_log"])
+
+    if shard_writer:
+        shard_writer.close()
+    # The manifest is the commit point; the staged snapshots are swapped in after it
+    save_manifest(snapshot_dir, new_end, manifest["extensions"] + [{"from": utils.format_iso_timestamp(old_end), "to": utils.format_iso_timestamp(new_end), "profiles": extended}])
+    _promote_staged(snapshot_dir)
+    logging.info("Extended %d profiles by %d days: %d new events written to '%s'.", extended, days, event_count, os.path.abspath(output_dir))
+    return extended
+
+
+# --- Split vs. Continuous Check ---
+
+def _events_json(profile):
+    return [json.dumps(event, sort_keys=True, default=event_store.json_default) for event in profile["activity_log"].to_list()]
+
+
+def check_extension(num_profiles=10, days=200, extra_days=30, seed=7, start_date=None):
+    """
+    Checks that a seeded run snapshotted after `days` and extended by `extra_days`
+    produces the same events and life events as a run over the whole window.
+
+    Returns:
+        list: Indices of the profiles whose split run differs from the continuous one.
+    """
+    start_date = start_date or datetime.datetime(2020, 1, 1)
+    split_end = start_date + datetime.timedelta(days=days)
+    full_end = split_end + datetime.timedelta(days=extra_days)
+    batch = population.sample_population(0, num_profiles, start_date, seed=seed)
+    mismatched = []
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        first_parts = {}
+        for index in range(num_profiles):
+            population.seed_profile(seed, index)
+            profile = simulation.simulate_activity(batch.profile(index), end_date=split_end, finalize=False)
+            save_profile(profile, snapshot_dir, index, split_end)
+            profile = simulation.finalize_profile(profile)
+            first_parts[index] = (_events_json(profile), profile["life_events"])
+        save_manifest(snapshot_dir, split_end)
+        random.seed() # The extension must not depend on where the generators happen to be
+        np.random.seed()
+        delta_dir = os.path.join(snapshot_dir, "delta")
+        extend_dataset(snapshot_dir, extra_days, delta_dir)
+        for index in range(num_profiles):
+            population.seed_profile(seed, index)
+            continuous = simulation.simulate_activity(batch.profile(index), end_date=full_end)
+            with open(os.path.join(delta_dir, f"{config.FILENAME_PREFIX}{index:0{config.FILENAME_DIGITS}d}.json"), 'r', encoding='utf-8') as f:
+                delta = json.load(f)
+            events, life_events = first_parts[index]
+            events = events + [json.dumps(event, sort_keys=True) for event in delta["activity_log"]]
+            life_events = json.loads(json.dumps(life_events + delta["life_events"], default=event_store.json_default))
+            if (events != _events_json(continuous)
+                    or life_events != json.loads(json.dumps(continuous["life_events"], default=event_store.json_default))):
+                mismatched.append(index)
+    return mismatched
+
+
+if __name__ == '__main__':
+    # Example usage/test: extend the snapshots of a previous run by N days
+    #   python snapshots.py [SNAPSHOT_DIR] [DAYS] [OUTPUT_DIR]
+    # Check that a split seeded run matches a continuous one:
+    #   python snapshots.py check [NUM_PROFILES] [DAYS] [EXTRA_DAYS]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        logging.getLogger().setLevel(logging.WARNING)
+        num_profiles = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        days = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+        extra_days = int(sys.argv[4]) if len(sys.argv) > 4 else 30
+        mismatched = check_extension(num_profiles, days, extra_days)
+        if mismatched:
+            print(f"FAIL: {len(mismatched)} of {num_profiles} profiles differ between the split and the continuous run: {mismatched}")
+            sys.exit(1)
+        print(f"PASS: {days} + {extra_days} days matches a continuous {days + extra_days}-day run for {num_profiles} profiles.")
+        sys.exit(0)
+    snapshot_dir = sys.argv[1] if len(sys.argv) > 1 else config.SNAPSHOT_DIR
+    if not snapshot_dir:
+        print("No snapshot directory given (set config.SNAPSHOT_DIR and run generate_profiles.py first).")
+        sys.exit(1)
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else config.SNAPSHOT_EXTEND_DAYS
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else None # <snapshot_dir>/delta_<days>d
+    extend_dataset(snapshot_dir, days, output_dir)
@@ -0,0 +1,105 @@
+# startup.py - Lazy Imports and Import-Time Budget for Fast Process Start
+
+import os
+import sys
+import time
+import importlib.util
+import logging
+
+# Import necessary components from other modules
+try:
+    import config
+except ImportError as e:
+    logging.error(f"Error importing modules in startup.py: {e}. Ensure config.py exists.")
+    raise
+
+# Modules that only use numpy for sampling bind it with lazy_import, so tools
+# that never sample (shard merging, replay, report tooling) start without paying
+# for the numpy import; the first attribute access loads it.
+
+
+def lazy_import(name):
+    """
+    Returns module `name`, deferring its execution until first attribute access.
+
+    An already imported module is returned as is; otherwise a lazy module is put
+    in sys.modules so later plain `import name` statements share it.
+
+    Args:
+        name (str): Absolute module name (e.g. "numpy").
+
+    Returns:
+        module: The (possibly not yet executed) module.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def _time_import(statement, runs):
+    """Fastest wall time (seconds) of `runs` fresh interpreters running `statement`."""
+    import subprocess # Imported here: only measuring needs it, and startup.py is imported by every worker
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=here, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return min(timings) # Startup noise only ever adds time
+
+
+def measure_import_times(modules=None, runs=None):
+    """
+    Measures the cold import cost of each module in a fresh interpreter.
+
+    The cost is the fastest start-to-exit time of `python -c "import <module>"`
+    minus that of an empty interpreter, so it covers everything a spawned worker
+    or a short CLI call pays before doing work.
+
+    Args:
+        modules (iterable, optional): Module names. Defaults to the keys of config.IMPORT_TIME_BUDGETS_MS.
+        runs (int, optional): Interpreter starts per module. Defaults to config.IMPORT_TIME_RUNS.
+
+    Returns:
+        dict: module -> import cost in milliseconds.
+    """
+    modules = list(modules or config.IMPORT_TIME_BUDGETS_MS)
+    runs = runs or config.IMPORT_TIME_RUNS
+    interpreter = _time_import("pass", runs)
+    return {module: max(0.0, (_time_import(f"import {module}", runs) - interpreter) * 1000.0) for module in modules}
+
+
+def check_import_budget(times, budgets=None):
+    """
+    Compares measured import costs to their budgets.
+
+    Returns:
+        list: Rows {"module", "ms", "budget_ms", "over"} in measurement order.
+    """
+    budgets = budgets or config.IMPORT_TIME_BUDGETS_MS
+    return [{"module": module, "ms": ms, "budget_ms": budgets.get(module), "over": module in budgets and ms > budgets[module]}
+            for module, ms in times.items()]
+
+
+if __name__ == '__main__':
+    # Example usage/test: measure entry-point import costs against their budgets
+    #   python startup.py [MODULE ...]
+    rows = check_import_budget(measure_import_times(sys.argv[1:] or None))
+    for row in rows:
+        budget = f"{row['budget_ms']:.0f}" if row["budget_ms"] is not None else "-"
+        print(f"{row['module']:<24} {row['ms']:>8.1f} ms  (budget {budget} ms){'  OVER BUDGET' if row['over'] else ''}")
+    over = [row["module"] for row in rows if row["over"]]
+    if over:
+        print(f"{len(over)} module(s) over their import-time budget: {', '.join(over)}")
+        sys.exit(1)
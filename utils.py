@@ -4,7 +4,10 @@ import random
 import datetime
 import uuid
 import math
-import numpy as np
+import bisect
+import heapq
+import itertools
+import functools
 import logging
 import json # &lt;-- Add this import
 
@@ -23,8 +26,20 @@ except ImportError:
         NOUNS = ['Device', 'Item', 'Accessory']
         BRANDS = ['OmniCorp', 'Acme', 'GenericBrand']
         PRODUCT_MODIFIERS = ['for Home', '']
+        PRICE_RANGES = {"default": (5, 500)}
+        PRICE_DISTRIBUTION = "uniform"
+        PRICE_LOGNORMAL_SIGMA_FRACTION = 0.25
+        PRICE_ENDINGS = [0.99, 0.95, 0.49, 0.79, 0.00]
+        PRICE_ENDING_PROB = 0.75
+        PRICE_WHOLE_NUMBER_PROB = 0.1
+        MIN_PRICE = 0.50
     config = MockConfig()
 
+import product_names # Compiled per-category name templates (imports config only)
+import startup
+
+np = startup.lazy_import("numpy") # Loaded on first sampling call, not at import
+
 
 # --- Date & Time Functions ---
 
@@ -36,7 +51,7 @@ def generate_random_date(start_date, end_date):
         return datetime.datetime.now()
 
     if start_date > end_date:
-        logging.warning(f"generate_random_date start_date {start_date} is after end_date {end_date}. Swapping.")
+        logging.warning("generate_random_date start_date %s is after end_date %s. Swapping.", start_date, end_date)
         start_date, end_date = end_date, start_date
 
     time_between_dates = end_date - start_date
@@ -58,7 +73,7 @@ def format_iso_timestamp(dt):
     if dt is None:
         return None
     if not isinstance(dt, datetime.datetime):
-        logging.warning(f"format_iso_timestamp received non-datetime object: {dt}. Returning None.")
+        logging.warning("format_iso_timestamp received non-datetime object: %r. Returning None.", dt)
         return None
     # Ensure timezone is UTC if not already set (or handle timezone conversion)
     # For simplicity, assume generated dates are meant to be UTC for the 'Z'
@@ -68,6 +83,7 @@ def format_iso_timestamp(dt):
 
 
 # --- ID Generation Functions ---
+# Unscoped random IDs. The simulation issues collision-free IDs through id_service.ProfileIds.
 
 def generate_product_id():
     """Generates a fake product ID (ASIN-like). B0 + 9 hex digits."""
@@ -147,122 +163,206 @@ def sample_zipf(exponent, size=1, min_val=None, max_val=None):
         value = min(max_val, value)
     return value
 
+# --- Weighted Sampling ---
+
+class WeightedSampler:
+    """
+    Reusable weighted choice over a fixed item list.
+
+    The cumulative weights are computed once (and rebuilt lazily after `add`), so
+    a draw is one random number plus a bisect. `draw` consumes the global `random`
+    state exactly like `random.choices(items, weights, k=1)`; `draw_many` takes a
+    NumPy Generator. Items with zero weight are never drawn unless every weight is
+    zero, in which case draws fall back to a uniform choice.
+    """
+
+    __slots__ = ("items", "weights", "_cum_weights", "_index")
+
+    def __init__(self, items=(), weights=()):
+        self.items = list(items)
+        self.weights = [float(w) for w in weights]
+        if len(self.items) != len(self.weights):
+            raise ValueError(f"WeightedSampler needs one weight per item ({len(self.items)} items, {len(self.weights)} weights)")
+        if any(w < 0 for w in self.weights):
+            raise ValueError("WeightedSampler weights must be non-negative")
+        self._cum_weights = None
+        self._index = None # item -> position, built on first `add` (items need not be hashable otherwise)
+
+    @classmethod
+    def from_pairs(cls, items_with_weights):
+        """Builds a sampler from (item, weight) tuples."""
+        return cls((item for item, _ in items_with_weights), (w for _, w in items_with_weights))
+
+    @classmethod
+    def from_dict(cls, distribution_dict):
+        """Builds a sampler over the keys of an item -> weight mapping."""
+        return cls(distribution_dict.keys(), distribution_dict.values())
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def total(self):
+        return self.cum_weights[-1] if self.items else 0.0
+
+    @property
+    def cum_weights(self):
+        if self._cum_weights is None:
+            self._cum_weights = list(itertools.accumulate(self.weights))
+        return self._cum_weights
+
+    def add(self, item, weight=1.0):
+        """Adds `weight` to `item` (appending it if new). Items must be hashable to use this."""
+        if weight < 0:
+            raise ValueError("WeightedSampler weights must be non-negative")
+        if self._index is None:
+            self._index = {existing: i for i, existing in enumerate(self.items)}
+        i = self._index.get(item)
+        if i is None:
+            self._index[item] = len(self.items)
+            self.items.append(item)
+            self.weights.append(float(weight))
+        else:
+            self.weights[i] += weight
+        self._cum_weights = None
+
+    def draw(self):
+        """Draws one item, or None if the sampler is empty."""
+        items = self.items
+        if not items:
+            return None
+        cum_weights = self.cum_weights
+        total = cum_weights[-1]
+        if total <= 0:
+            return random.choice(items)
+        return items[bisect.bisect(cum_weights, random.random() * total, 0, len(items) - 1)]
+
+    def draw_indices(self, n, rng=None):
+        """Draws `n` item positions (with replacement) as an int array."""
+        rng = np.random if rng is None else rng
+        if not self.items:
+            raise ValueError("Cannot draw from an empty WeightedSampler")
+        total = self.total
+        if total <= 0: # Uniform fallback, as in `draw`
+            indices = (rng.random(n) * len(self.items)).astype(np.int64)
+        else:
+            indices = np.searchsorted(np.asarray(self.cum_weights), rng.random(n) * total, side="right")
+        return np.minimum(indices, len(self.items) - 1)
+
+    def draw_many(self, n, rng=None):
+        """
+        Draws `n` items with replacement.
+
+        Args:
+            n (int): Number of draws.
+            rng (np.random.Generator, optional): Source of randomness. Defaults to the global np.random state.
+
+        Returns:
+            list: The drawn items.
+        """
+        items = self.items
+        return [items[i] for i in self.draw_indices(n, rng).tolist()]
+
+    def sample(self, k):
+        """
+        Draws up to `k` distinct items without replacement, in draw order.
+
+        Equivalent to repeated weighted draws with each chosen item removed
+        (Efraimidis-Spirakis keys: one random number per positive-weight item).
+        Uses the global `random` state.
+
+        Returns:
+            list: min(k, number of positive-weight items) items.
+        """
+        keys = [(random.random() ** (1.0 / w), i) for i, w in enumerate(self.weights) if w > 0]
+        return [self.items[i] for _, i in heapq.nlargest(k, keys)]
+
+
 # Weighted random selection from distribution dictionary
 def sample_from_distribution(distribution_dict):
-    """Sample a key from a distribution dictionary where values are probabilities"""
-    items = list(distribution_dict.items())
-    keys = [item[0] for item in items]
-    probabilities = [item[1] for item in items]
-    return random.choices(keys, weights=probabilities, k=1)[0]
+    """Sample a key from a distribution dictionary where values are probabilities (hold a WeightedSampler for repeated draws)."""
+    return WeightedSampler.from_dict(distribution_dict).draw()
 
 # --- Product & Pricing Functions ---
 
-def get_plausible_price(category):
-    """Generates a somewhat plausible price based on category."""
-    price = 19.99 # Default
-    if category is None: category = "Unknown"
-    category_lower = category.lower()
-
-    # Define price ranges per category (adjust as needed)
-    price_ranges = {
-        "luxury": (200, 5000), "high-end": (200, 5000),
-        "electronics": (30, 3000), "computers": (100, 4000), "appliances": (50, 2500), "furniture": (100, 3000), "smart home": (20, 500),
-        "clothing": (15, 500), "shoes": (20, 600), "jewelry": (25, 5000), "watches": (50, 10000),
-        "tools": (10, 800), "automotive": (5, 1000), "sports": (10, 1500), "outdoors": (15, 2000),
-        "toys": (5, 300), "baby": (5, 400), "pet supplies": (3, 200),
-        "books": (5, 150), "kindle": (1, 30), "audible": (5, 50), "music": (1, 50), "movies": (3, 60), "software": (10, 1000), "video games": (10, 100),
-        "grocery": (0.5, 100), "health": (2, 200), "beauty": (3, 300), "pharmacy": (5, 500),
-        "office": (1, 300), "crafts": (2, 150), "hobbies": (5, 500),
-        "default": (5, 500)
-    }
-
-    chosen_range = price_ranges["default"]
-    for key, price_range in price_ranges.items():
+@functools.lru_cache(maxsize=None)
+def _price_model(category):
+    """Resolves a category to (min, max, log-mean, log-sigma). Memoized: categories come from a fixed config set."""
+    category_lower = (category or "Unknown").lower()
+    min_p, max_p = config.PRICE_RANGES["default"]
+    for key, price_range in config.PRICE_RANGES.items():
         if key in category_lower:
-            chosen_range = price_range
+            min_p, max_p = price_range
             break # Take first match
+    log_min, log_max = math.log(min_p), math.log(max_p)
+    return min_p, max_p, (log_min + log_max) / 2, (log_max - log_min) * config.PRICE_LOGNORMAL_SIGMA_FRACTION
 
-    # Generate price within the range, potentially skewed
-    min_p, max_p = chosen_range
-    # Skew towards lower end for most items? Use power law or similar?
-    # Simple approach: uniform within range
-    price = random.uniform(min_p, max_p)
+def get_plausible_price(category):
+    """Generates a somewhat plausible price based on category."""
+    min_p, max_p, mu, sigma = _price_model(category)
+
+    # Generate price within the range, uniform or log-normal (truncated to the range)
+    if config.PRICE_DISTRIBUTION == "lognormal":
+        price = random.lognormvariate(mu, sigma)
+        while not min_p <= price <= max_p:
+            price = random.lognormvariate(mu, sigma)
+    else:
+        price = random.uniform(min_p, max_p)
 
     # Apply common price endings (e.g., .99, .95)
-    if random.random() < 0.75:
-        price = math.floor(price) + random.choice([0.99, 0.95, 0.49, 0.79, 0.00])
-    elif random.random() < 0.1: # Occasional whole numbers
+    if random.random() < config.PRICE_ENDING_PROB:
+        price = math.floor(price) + random.choice(config.PRICE_ENDINGS)
+    elif random.random() < config.PRICE_WHOLE_NUMBER_PROB: # Occasional whole numbers
          price = round(price)
 
-    return round(max(0.50, price), 2) # Ensure minimum price
+    return round(max(config.MIN_PRICE, price), 2) # Ensure minimum price
+
+def get_plausible_prices(category, n, rng=None):
+    """
+    Draws `n` plausible prices for one category at once with NumPy.
+
+    Same model as get_plausible_price, with price endings, whole-number rounding
+    and the minimum clamp applied across the whole batch.
+
+    Args:
+        category (str): Product category name.
+        n (int): Number of prices to draw.
+        rng (np.random.Generator, optional): Source of randomness. Defaults to the global np.random state.
+
+    Returns:
+        np.ndarray: `n` prices rounded to cents.
+    """
+    rng = np.random if rng is None else rng
+    min_p, max_p, mu, sigma = _price_model(category)
+
+    if config.PRICE_DISTRIBUTION == "lognormal":
+        prices = np.exp(rng.normal(mu, sigma, n))
+        outside = (prices < min_p) | (prices > max_p)
+        while outside.any(): # Redraw the out-of-range tail (about 5% per pass)
+            prices[outside] = np.exp(rng.normal(mu, sigma, int(outside.sum())))
+            outside = (prices < min_p) | (prices > max_p)
+    else:
+        prices = rng.uniform(min_p, max_p, n)
+
+    with_ending = rng.random(n) < config.PRICE_ENDING_PROB
+    whole = ~with_ending & (rng.random(n) < config.PRICE_WHOLE_NUMBER_PROB)
+    endings = rng.choice(np.asarray(config.PRICE_ENDINGS), n)
+    prices = np.where(with_ending, np.floor(prices) + endings, np.where(whole, np.round(prices), prices))
+    return np.round(np.maximum(config.MIN_PRICE, prices), 2)
 
 def generate_product_name(category):
-    """Generates a more descriptive fake product name using config constants."""
-    if category is None: category = "Unknown"
-    cat_lower = category.lower()
-
-    # Select components from config lists
-    adj1 = random.choice(config.ADJECTIVES1)
-    adj2 = random.choice(config.ADJECTIVES2)
-    noun = random.choice(config.NOUNS)
-    brand = random.choice(config.BRANDS)
-    modifier = random.choice(config.PRODUCT_MODIFIERS)
-    num = random.choice([f"{random.randint(100, 999)}", f"{random.randint(1, 9)}000", f"X{random.randint(1, 25)}", ''])
-
-    # --- Category-Specific Naming ---
-    if "clothing" in cat_lower or "shoes" in cat_lower or "apparel" in cat_lower:
-        noun = random.choice(['Shirt', 'T-Shirt', 'Sweater', 'Hoodie', 'Jacket', 'Coat', 'Pants', 'Jeans', 'Shorts', 'Dress', 'Skirt', 'Sneakers', 'Boots', 'Sandals', 'Hat', 'Scarf', 'Gloves', 'Socks'])
-        adj1 = random.choice(['Cotton', 'Wool', 'Silk', 'Leather', 'Denim', 'Casual', 'Formal', 'Vintage', 'Modern', 'Slim Fit', 'Relaxed Fit', 'Performance'])
-        brand = random.choice(['Urban Threads', 'Summit Gear', 'Coastal Co.', 'Heritage Brand', 'Nova Fashion', brand]) # Add clothing specific brands
-    elif "book" in cat_lower or "kindle" in cat_lower or "audible" in cat_lower:
-        genre_adj = random.choice(['Lost', 'Secret', 'Forgotten', 'Hidden', 'Last', 'Eternal', 'Silent', 'Burning', 'Crystal', 'Shadow', 'Gilded', 'Crimson'])
-        genre_noun = random.choice(['City', 'Garden', 'Key', 'Chronicle', 'Journey', 'Legacy', 'Witness', 'Page', 'Throne', 'River', 'Truth', 'Empire', 'Code', 'Cipher'])
-        author_first = random.choice(['Jane', 'John', 'Alex', 'Sam', 'Jordan', 'Casey', 'Morgan', 'Taylor', 'Jamie', 'Riley', 'Chris', 'Pat'])
-        author_last = random.choice(['Doe', 'Smith', 'Reed', 'Morgan', 'Bell', 'Hayes', 'Black', 'White', 'Green', 'Gray', 'Miller', 'Davis'])
-        return f"'{random.choice(['The', 'A', 'An'])} {genre_adj} {genre_noun}' by {author_first} {author_last}"
-    elif "electronics" in cat_lower or "computer" in cat_lower or "smart home" in cat_lower:
-        noun = random.choice(['Laptop', 'Smartphone', 'Tablet', 'Monitor', 'Keyboard', 'Mouse', 'Headphones', 'Speaker', 'Router', 'Camera', 'Webcam', 'Printer', 'Scanner', 'Projector', 'Smart Plug', 'Smart Bulb', 'Security Camera', 'Thermostat'])
-        adj1 = random.choice(['Wireless', 'Bluetooth', 'Gaming', '4K', 'HD', 'Curved', 'Mechanical', 'Noise-Cancelling', 'Portable', 'High-Performance', 'NextGen'])
-        brand = random.choice(['TechCore', 'Innovate Inc.', 'Apex Devices', 'Quantum Systems', 'ElectroGadget', brand])
-    elif "home" in cat_lower or "kitchen" in cat_lower or "furniture" in cat_lower:
-        noun = random.choice(['Blender', 'Mixer', 'Toaster', 'Kettle', 'Coffee Maker', 'Microwave', 'Air Fryer', 'Lamp', 'Chair', 'Table', 'Sofa', 'Bookshelf', 'Desk', 'Bed Frame', 'Mattress', 'Nightstand', 'Dresser', 'Shelf', 'Organizer', 'Cookware Set', 'Bakeware Set', 'Cutlery Set', 'Dinnerware Set', 'Vacuum Cleaner', 'Air Purifier'])
-        adj1 = random.choice(['Stainless Steel', 'Non-stick', 'Cast Iron', 'Wooden', 'Modern', 'Minimalist', 'Industrial', 'Farmhouse', 'Mid-Century', 'Adjustable', 'Ergonomic'])
-        brand = random.choice(['HomeSphere', 'KitchenWiz', 'ComfortLiving', 'DesignHaus', 'UrbanFurnish', brand])
-    elif "grocery" in cat_lower:
-         noun = random.choice(['Coffee Beans', 'Tea Bags', 'Pasta', 'Rice', 'Cereal', 'Granola Bar', 'Snack Mix', 'Chocolate Bar', 'Olive Oil', 'Vinegar', 'Spice Blend', 'Canned Soup', 'Frozen Vegetables', 'Yogurt', 'Milk', 'Cheese', 'Bread'])
-         adj1 = random.choice(['Organic', 'Gluten-Free', 'Non-GMO', 'Fair Trade', 'Artisanal', 'Gourmet', 'Family Size', 'Single Origin'])
-         brand = random.choice(['Nature\'s Best', 'FarmFresh', 'Pantry Staples', 'Gourmet Select', 'Healthy Harvest', brand])
-    elif "toys" in cat_lower or "games" in cat_lower:
-        noun = random.choice(['Action Figure', 'Doll', 'Building Blocks', 'Board Game', 'Card Game', 'Puzzle', 'Plush Toy', 'RC Car', 'Drone', 'Video Game', 'Educational Toy'])
-        adj1 = random.choice(['Interactive', 'Collectible', 'Remote Control', 'STEM', 'Creative', 'Strategy', 'Cooperative', 'Award-Winning'])
-        brand = random.choice(['ToyWorld', 'PlayFun', 'KidzKraft', 'GameMasters', 'BrainyBuilders', brand])
-
-    # Construct the name
-    name_parts = [brand, adj1, category, noun, adj2, num, modifier]
-    # Filter out empty parts and join
-    full_name = " ".join(part for part in name_parts if part).replace("  ", " ").strip()
-
-    # Prevent overly long names
-    return (full_name[:150] + '...') if len(full_name) > 150 else full_name
+    """Generates a more descriptive fake product name using config constants (see product_names.py)."""
+    return product_names.generate_product_name(category)
 
 
 # --- Persona & Profile Helpers ---
 
 def select_weighted_item(items_with_weights):
-    """Selects an item from a list of (item, weight) tuples."""
-    total_weight = sum(w for _, w in items_with_weights)
-    if total_weight <= 0:
-        # Fallback: return a random item if weights are zero or invalid
-        return random.choice([item for item, _ in items_with_weights]) if items_with_weights else None
-
-    r = random.uniform(0, total_weight)
-    upto = 0
-    for item, weight in items_with_weights:
-        if upto + weight >= r:
-            return item
-        upto += weight
-    # Should not reach here if total_weight > 0, but as a fallback:
-    return items_with_weights[-1][0] if items_with_weights else None
+    """Selects an item from a list of (item, weight) tuples (one-off; hold a WeightedSampler for repeated draws)."""
+    return WeightedSampler.from_pairs(items_with_weights).draw()
 
 def get_seasonal_boost_from_config(current_date):
     """Applies a boost to activity/spending around holidays/seasons."""
@@ -328,6 +428,9 @@ if __name__ == '__main__':
     print(f"Plausible Price (Electronics): {get_plausible_price('Electronics')}")
     print(f"Plausible Price (Grocery): {get_plausible_price('Grocery')}")
     print(f"Plausible Price (Luxury Watch): {get_plausible_price('Luxury Watch')}")
+    print(f"Plausible Prices (Books, batch of 5): {get_plausible_prices('Books', 5).tolist()}")
+    sampler = WeightedSampler(["A", "B", "C"], [1, 2, 7])
+    print(f"Weighted Draw: {sampler.draw()}, batch: {sampler.draw_many(5)}, without replacement: {sampler.sample(2)}")
     print(f"Product Name (Clothing): {generate_product_name('Clothing')}")
     print(f"Product Name (Books): {generate_product_name('Books')}")
     print(f"Product Name (Smart Home): {generate_product_name('Smart Home')}")